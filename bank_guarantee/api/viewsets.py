@@ -12,6 +12,7 @@ from rest_framework.response import Response
 from bank_guarantee.actions import RequestActionHandler
 from bank_guarantee.commission_logic import OfferCalculateCommissionLogic
 from bank_guarantee.export_data import ExportRequest
+from bank_guarantee.helpers.discuss_counters import DiscussCounters
 from bank_guarantee.models import (
     Request as BGRequest, ClientDocument, RequestDocument, Request, Offer, OfferDocument,
     OfferPrintForm, ContractType, OfferAdditionalDataField
@@ -25,6 +26,7 @@ from base_request.discuss_logic import (
     get_discuss_messages, get_discuss
 )
 from base_request.serializers import PrintFormSerializer
+from cabinet.base_logic.helpers.files import delete_file_if_unused
 from cabinet.base_logic.printing_forms.generate import OfferPrintGenerator
 from cabinet.constants.constants import FederalLaw
 from cabinet.serializers import FileSerializer
@@ -215,6 +217,7 @@ class BGRequestsViewSet(MixinRequestViewSet, viewsets.ModelViewSet):
                                                                    many=True).data
         discuss_title = get_discuss_title(discuss=discuss, current_user=self.request.user)
         mark_user_read_messages(discuss=discuss, current_user=self.request.user)
+        DiscussCounters.refresh(discuss.id)
         return Response({
             'discuss': DiscussSerializer(discuss).data,
             'messages': get_discuss_messages(
@@ -286,8 +289,7 @@ class BGRequestsViewSet(MixinRequestViewSet, viewsets.ModelViewSet):
                     file=file, author_id=request.client_id
                 )
                 base_file.save()
-                if RequestDocument.objects.filter(file_id=old_file.id).count() == 0:
-                    old_file.delete()
+                delete_file_if_unused(old_file)
                 return Response({
                     'result': True
                 }, status=200)
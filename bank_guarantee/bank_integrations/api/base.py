@@ -1,11 +1,11 @@
 import os
 import traceback
 
-import requests
 import ujson
 from django.conf import settings
 from django.utils.functional import cached_property
 
+from bank_guarantee.bank_integrations.http_client import BankHttpClient
 from bank_guarantee.models import ExternalRequest
 from base_request.helpers import BeforeSendToBankResult
 from base_request.logic.request_log import RequestLogger
@@ -17,7 +17,7 @@ from utils.helpers import equal_obj
 def push_rocket_chat(text):
     url = os.environ.get('ROCKET_CHAT_HOST_FOR_INTEGRATION_BANK')
     if url:
-        requests.post(
+        BankHttpClient.get_client('rocket_chat', retries=1).post(
             url=url,
             json={
                 'text': text,
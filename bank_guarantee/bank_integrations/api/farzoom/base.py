@@ -10,6 +10,7 @@ from django.db.models import Q
 from django.utils.functional import cached_property
 
 from bank_guarantee.bank_integrations.api.base import BaseSendRequest, push_error
+from bank_guarantee.bank_integrations.http_client import BankHttpClient
 from bank_guarantee.models import RequestPrintForm, ExternalRequest, RequestedCategory, \
     OfferDocument
 from base_request.helpers import BeforeSendToBankResult
@@ -18,7 +19,7 @@ from cabinet.base_logic.printing_forms.generate import RequestPrintFormGenerator
 from common.helpers import generate_password
 from files.models import BaseFile
 from users.models import Role
-from utils.helpers import requests_retry_session, download_file
+from utils.helpers import download_file
 
 
 class FarzoomSendRequest(BaseSendRequest):
@@ -42,8 +43,12 @@ class FarzoomSendRequest(BaseSendRequest):
     def get_headers(self):
         return {}
 
+    @property
+    def http_client(self) -> BankHttpClient:
+        return BankHttpClient.get_client(self.bank_code)
+
     def send_data_in_bank(self, url, data, method='POST', as_params=False):
-        client = requests_retry_session()
+        client = self.http_client
 
         data_key = 'params' if as_params else 'json'
         kwargs = {
@@ -75,7 +80,7 @@ class FarzoomSendRequest(BaseSendRequest):
         return output_data
 
     def get_data_from_bank(self, url, params=None):
-        client = requests_retry_session()
+        client = self.http_client
         url = self.get_bank_endpoint() + url
         if not params:
             params = {}
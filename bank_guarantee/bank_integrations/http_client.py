@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+import time
+
+import requests
+from django.core.cache import cache
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger('django')
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    После failure_threshold ошибок подряд запросы к банку не отправляются
+    recovery_timeout секунд, затем пропускается один пробный запрос
+    """
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                raise CircuitOpenError(
+                    'Запросы в %s приостановлены после %s ошибок подряд' % (
+                        self.name, self.failures
+                    )
+                )
+            # пробный запрос, остальные отклоняются до его результата
+            self.opened_at = time.monotonic()
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning('Запросы в %s приостановлены на %s с' % (
+                        self.name, self.recovery_timeout
+                    ))
+                self.opened_at = time.monotonic()
+
+
+class HttpMetrics:
+    """
+    Счетчики запросов в банк за день в общем кеше: количество, ошибки,
+    суммарное и максимальное время ответа в мс
+    """
+    KEY = 'bank_http:%s:%s:%s'
+    TTL = 7 * 24 * 60 * 60
+    FIELDS = ['count', 'errors', 'time_ms']
+
+    @classmethod
+    def incr(cls, name, day, field, value):
+        key = cls.KEY % (name, day, field)
+        cache.add(key, 0, cls.TTL)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            cache.set(key, value, cls.TTL)
+
+    @classmethod
+    def record(cls, name, elapsed_ms, error):
+        day = timezone.now().strftime('%Y-%m-%d')
+        try:
+            cls.incr(name, day, 'count', 1)
+            cls.incr(name, day, 'time_ms', elapsed_ms)
+            if error:
+                cls.incr(name, day, 'errors', 1)
+            max_key = cls.KEY % (name, day, 'max_ms')
+            if elapsed_ms > cache.get(max_key, 0):
+                cache.set(max_key, elapsed_ms, cls.TTL)
+        except Exception as error:
+            logger.exception(error)
+
+    @classmethod
+    def get(cls, name, day=None) -> dict:
+        day = day or timezone.now().strftime('%Y-%m-%d')
+        result = {
+            field: cache.get(cls.KEY % (name, day, field), 0)
+            for field in cls.FIELDS + ['max_ms']
+        }
+        result['avg_ms'] = result['time_ms'] // result['count'] if result['count'] else 0
+        return result
+
+
+class BankHttpClient:
+    """
+    HTTP клиент интеграции с банком, один на банк в процессе:
+    keep-alive пул соединений, таймауты connect/read, повторы с нарастающей
+    задержкой для ошибок соединения и ответов 5xx, circuit breaker и метрики.
+    Таймауты по умолчанию: BANK_HTTP_CONNECT_TIMEOUT, BANK_HTTP_READ_TIMEOUT
+    """
+    STATUS_FORCELIST = (500, 502, 503, 504)
+
+    _clients = {}
+    _lock = threading.Lock()
+
+    def __init__(self, name, verify=True, retries=3, backoff_factor=0.5,
+                 failure_threshold=5, recovery_timeout=30, pool_size=10):
+        self.name = name
+        self.verify = verify
+        self.timeout = (
+            float(os.environ.get('BANK_HTTP_CONNECT_TIMEOUT', 5)),
+            float(os.environ.get('BANK_HTTP_READ_TIMEOUT', 60)),
+        )
+        self.breaker = CircuitBreaker(name, failure_threshold, recovery_timeout)
+        self.session = requests.Session()
+        self.session.verify = verify
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries, connect=retries, read=retries, status=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=self.STATUS_FORCELIST,
+                raise_on_status=False,
+            )
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def get_client(cls, name, **kwargs) -> 'BankHttpClient':
+        if name not in cls._clients:
+            with cls._lock:
+                if name not in cls._clients:
+                    cls._clients[name] = cls(name, **kwargs)
+        return cls._clients[name]
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        # явный verify, иначе REQUESTS_CA_BUNDLE перекрывает session.verify
+        kwargs.setdefault('verify', self.verify)
+        self.breaker.before_request()
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as error:
+            elapsed_ms = int((time.monotonic() - started) * 1000)
+            self.breaker.failure()
+            HttpMetrics.record(self.name, elapsed_ms, error=True)
+            logger.warning('%s %s %s: %s за %s мс' % (
+                self.name, method, url, error.__class__.__name__, elapsed_ms
+            ))
+            raise
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        error = response.status_code >= 500
+        if error:
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+        HttpMetrics.record(self.name, elapsed_ms, error=error)
+        logger.info('%s %s %s: %s за %s мс' % (
+            self.name, method, url, response.status_code, elapsed_ms
+        ))
+        return response
+
+    def get(self, url, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
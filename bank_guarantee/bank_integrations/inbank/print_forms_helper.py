@@ -10,7 +10,6 @@ from cabinet.base_logic.contracts.base import ContractsLogic
 from cabinet.base_logic.printing_forms.helpers.base import BaseHelper
 from cabinet.base_logic.scoring.base import ScoringResult, ScoringLogic
 from cabinet.constants.constants import Target, FederalLaw
-from cabinet.models import EgrulData
 from clients.models import Bank
 from conclusions_app.conclusions.common import (
     HasArrearsOnPaymentOfTaxesConclusion
@@ -621,7 +620,7 @@ class InbankHelper(BaseHelper):
         return '%.2f %%' % self.request.suggested_price_percent
 
     def get_beneficiar_full_name(self):
-        egrul_data = EgrulData.get_info(self.request.tender.beneficiary_inn)
+        egrul_data = self.get_egrul_info(self.request.tender.beneficiary_inn)
         if egrul_data:
             return egrul_data.get(
                 'section-ur-lico', {}
@@ -706,7 +705,7 @@ class InbankHelper(BaseHelper):
         return search_data
 
     def getBenAddressFromEGRUL(self):
-        egrul_data = EgrulData.get_info(self.request.tender.beneficiary_inn)
+        egrul_data = self.get_egrul_info(self.request.tender.beneficiary_inn)
         if egrul_data:
             return egrul_data.get(
                 'section-ur-adress', {}
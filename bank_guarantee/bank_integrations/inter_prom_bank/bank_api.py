@@ -2,7 +2,6 @@ import json
 import logging
 import os
 
-import requests
 from django.conf import settings
 
 from bank_guarantee.models import Request, ExternalRequest, RequestDocument
@@ -10,6 +9,7 @@ from base_request.discuss_logic import get_discuss
 from base_request.helpers import BeforeSendToBankResult
 from base_request.models import BankDocumentType
 from bank_guarantee.bank_integrations.api.base import BaseSendRequest
+from bank_guarantee.bank_integrations.http_client import BankHttpClient
 from cabinet.constants.constants import Target, FederalLaw
 from settings.configs.banks import BankCode
 from settings.configs.interprom_documents import INTERPROM_DOCUMENTS
@@ -31,14 +31,18 @@ class SendRequest(BaseSendRequest):
     def get_headers(self):
         return {}
 
+    @property
+    def http_client(self) -> BankHttpClient:
+        return BankHttpClient.get_client(self.bank_code, verify=False)
+
     def send_data_in_bank(self, url, params, request_type='POST'):
         url = self.production_endpoint + url
         request_kwargs = {
             'headers': self.get_headers(),
             'params' if request_type == 'GET' else 'data': params
         }
-        response = requests.request(
-            method=request_type, url=url, verify=False, **request_kwargs
+        response = self.http_client.request(
+            method=request_type, url=url, **request_kwargs
         ).json()
         logger.info("Отправленные данные %s в %s" % (json.dumps(params), self.bank_code))
         logger.info("Полученные данные %s из %s" % (json.dumps(response), self.bank_code))
@@ -62,12 +66,13 @@ class SendRequest(BaseSendRequest):
         if not file['path']:
             return False
 
-        response = requests.post(
-            url=self.production_endpoint + url, data=data, verify=False,
-            files={
-                file['name']: open(file['path'], 'rb')
-            }
-        ).json()
+        with open(file['path'], 'rb') as content:
+            response = self.http_client.post(
+                url=self.production_endpoint + url, data=data,
+                files={
+                    file['name']: content
+                }
+            ).json()
         return response
 
     def order_attach(self, hash_id, ref_id):
@@ -11,11 +11,11 @@ from django.conf import settings
 from django.core.cache import cache
 from django.db.models import Q
 from django.utils import timezone
-from requests import Session
 
 from bank_guarantee.models import ExternalRequest, MessageFile
 from base_request.discuss_logic import get_discuss
 from bank_guarantee.bank_integrations.api.farzoom.base import FarzoomSendRequest
+from bank_guarantee.bank_integrations.http_client import BankHttpClient
 from cabinet.base_logic.printing_forms.adapters.base import get_temp_path
 from cabinet.base_logic.printing_forms.adapters.html import HTMLGenerator
 from clients.models import MoscombankDocument, BaseFile
@@ -85,13 +85,26 @@ class MoscombankApi(FarzoomSendRequest):
     def clear_token(self):
         cache.delete(self.TOKEN_CACHE_NAME)
 
+    @property
+    def http_client(self) -> BankHttpClient:
+        return BankHttpClient.get_client(self.bank_code, verify=False)
+
+    @property
+    def oauth_client(self) -> BankHttpClient:
+        """
+        Запросы OAuth2 без повторов и circuit breaker: токен приходит
+        в ошибке соединения при переходе на redirect_url, см. get_token
+        """
+        return BankHttpClient.get_client(
+            self.bank_code + '_oauth', verify=False, retries=0, failure_threshold=0
+        )
+
     @check_response
     def get_data(self, url, params=None, token=True):
         headers = self.get_headers(token=token)
         if not params:
             params = {}
-        client = Session()
-        client.verify = False
+        client = self.http_client if token else self.oauth_client
         url = self.get_url(url)
         self.print_log('url', url)
         self.print_log('params', params)
@@ -112,8 +125,7 @@ class MoscombankApi(FarzoomSendRequest):
         if not data:
             data = {}
         url = self.get_url(url)
-        client = Session()
-        client.verify = False
+        client = self.http_client
         self.print_log(url)
         self.print_log(data)
         self.print_log(headers)
@@ -132,8 +144,7 @@ class MoscombankApi(FarzoomSendRequest):
         headers = self.get_headers()
         if not data:
             data = {}
-        client = Session()
-        client.verify = False
+        client = self.http_client
         url = self.get_url(url)
         self.print_log('data:', data)
         response = client.post(url, json=data, headers=headers)
@@ -2,10 +2,9 @@ import json
 import logging
 import os
 
-import requests
-
 from bank_guarantee.bank_integrations.spb_bank.data_translators.offer_ready import \
     OfferReadyDataTranslator
+from bank_guarantee.bank_integrations.http_client import BankHttpClient
 from bank_guarantee.models import Request
 from bank_guarantee.bank_integrations.spb_bank.client_rating_calculator import (
     ClientRatingTranslator
@@ -24,6 +23,10 @@ logger = logging.getLogger('django')
 class SPBApi:
     url = os.getenv('TH_SPB_STUNNEL_OUT')
 
+    @property
+    def client(self) -> BankHttpClient:
+        return BankHttpClient.get_client('spb_bank')
+
     def get_url(self, path):
         return '%s%s' % (self.url, path)
 
@@ -96,7 +99,7 @@ class SPBApi:
         return data
 
     def get_request(self, request_id) -> dict:
-        response = requests.get(self.get_url('/order/%s' % request_id)).json()
+        response = self.client.get(self.get_url('/order/%s' % request_id)).json()
         return response
 
     def offer_ready_data(self, request: Request) -> dict:
@@ -109,7 +112,7 @@ class SPBApi:
                 self.clear_offer_ready_data_for_log(data),
                 generate_log_tags(request=request))
                         )
-            response = requests.post(self.get_url(
+            response = self.client.post(self.get_url(
                 '/counterparty/order/%s/message/contractReady' % request_id),
                 json=data)
 
@@ -135,7 +138,7 @@ class SPBApi:
             self.clear_offer_ready_data_for_log(data),
             generate_log_tags(request=request))
                     )
-        response = requests.post(
+        response = self.client.post(
             self.get_url('/counterparty/order/'),
             json=data
         )
@@ -162,7 +165,7 @@ class SPBApi:
         logger.info(
             self.get_url('/counterparty/order/%s/message/cancel' % request_id)
         )
-        response = requests.post(
+        response = self.client.post(
             self.get_url('/counterparty/order/%s/message/cancel' % request_id),
             json=data
         )
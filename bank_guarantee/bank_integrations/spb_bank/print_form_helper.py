@@ -9,7 +9,6 @@ from base_request.logic.request_log import RequestLogger
 from base_request.models import AbstractRequest
 from cabinet.base_logic.printing_forms.helpers.base import BaseHelper
 from cabinet.constants.constants import TaxationType, Target
-from cabinet.models import EgrulData
 from conclusions_app.conclusions.common import (
     RMSPConclusion, AddressOfManyRegistrationsConclusion
 )
@@ -182,7 +181,7 @@ class SPBHelper(BaseHelper):
 
     @cached_property
     def reg_organ(self):
-        data = EgrulData.get_info(self.profile.reg_inn)
+        data = self.egrul_data
         return data['section-other']['registrator_name']
 
     @cached_property
@@ -0,0 +1,112 @@
+import os
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+
+from bank_guarantee.models import Discuss, DiscussCounter, Message
+
+ROLES = ['agent', 'bank', 'client']
+
+
+class DiscussCounters:
+    """
+    Счетчики непрочитанных сообщений обсуждений заявок БГ по сторонам.
+    Строки DiscussCounter обсуждения пересчитываются целиком под блокировкой
+    обсуждения, после изменения поднимается версия счетчиков компании
+    стороны - по ней ожидают изменений клиенты (wait_changes)
+    """
+    VERSION_KEY = 'discuss_counters:%s:%s'
+    VERSION_TTL = 24 * 60 * 60
+
+    @staticmethod
+    def get_company_id(discuss, role):
+        if role == 'agent':
+            return discuss.agent_id
+        if role == 'bank':
+            return discuss.bank_id
+        return discuss.request.client_id
+
+    @classmethod
+    def refresh(cls, discuss_id):
+        with transaction.atomic():
+            discuss = Discuss.objects.select_for_update().select_related(
+                'request'
+            ).get(id=discuss_id)
+            totals = Message.objects.filter(discuss_id=discuss_id).aggregate(
+                message_count=Count('id'),
+                last_message=Max('created'),
+                **{role: Count('id', filter=Q(**{'%s_read' % role: 0}))
+                   for role in ROLES}
+            )
+            companies = []
+            for role in ROLES:
+                company_id = cls.get_company_id(discuss, role)
+                DiscussCounter.objects.update_or_create(
+                    discuss=discuss, role=role, defaults={
+                        'company_id': company_id,
+                        'message_count': totals['message_count'],
+                        'unread': totals[role],
+                        'last_message': totals['last_message'],
+                    }
+                )
+                companies.append((role, company_id))
+
+        def bump_versions():
+            for role, company_id in companies:
+                cls.bump_version(role, company_id)
+        transaction.on_commit(bump_versions)
+
+    @classmethod
+    def get_version(cls, role, company_id) -> int:
+        return cache.get(cls.VERSION_KEY % (role, company_id), 0)
+
+    @classmethod
+    def bump_version(cls, role, company_id):
+        key = cls.VERSION_KEY % (role, company_id)
+        cache.add(key, 0, cls.VERSION_TTL)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, cls.VERSION_TTL)
+
+    @staticmethod
+    def get_unread(role, company_id) -> int:
+        return DiscussCounter.objects.filter(
+            role=role, company_id=company_id, unread__gt=0
+        ).aggregate(unread=Sum('unread'))['unread'] or 0
+
+    @staticmethod
+    def get_wait_timeout() -> int:
+        return int(os.environ.get('DISCUSS_WAIT_TIMEOUT', 5))
+
+    @classmethod
+    def wait_changes(cls, role, company_id, version, timeout=None, interval=1) -> int:
+        """
+        Ожидание изменения версии счетчиков компании, возвращает версию.
+        Ожидание занимает поток воркера на время до timeout секунд
+        (DISCUSS_WAIT_TIMEOUT, по умолчанию 5): при синхронных воркерах
+        wait нужно обслуживать отдельным пулом потоковых/gevent воркеров
+        либо держать DISCUSS_WAIT_TIMEOUT=0, тогда ответ сразу
+        """
+        if timeout is None:
+            timeout = cls.get_wait_timeout()
+        deadline = time.monotonic() + timeout
+        current = cls.get_version(role, company_id)
+        while current == version and time.monotonic() < deadline:
+            time.sleep(interval)
+            current = cls.get_version(role, company_id)
+        return current
+
+    @classmethod
+    def rebuild(cls, stdout=None) -> int:
+        total = 0
+        for discuss_id in Discuss.objects.order_by('id').values_list(
+            'id', flat=True
+        ).iterator():
+            cls.refresh(discuss_id)
+            total += 1
+            if stdout and total % 1000 == 0:
+                stdout.write('%s обсуждений' % total)
+        return total
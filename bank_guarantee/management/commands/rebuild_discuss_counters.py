@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from bank_guarantee.helpers.discuss_counters import DiscussCounters
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков непрочитанных сообщений обсуждений заявок'
+
+    def handle(self, *args, **options):
+        total = DiscussCounters.rebuild(stdout=self.stdout)
+        self.stdout.write('Счетчики пересчитаны, обсуждений: %s' % total)
@@ -0,0 +1,28 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_guarantee', '0112_merge_20201211_1734'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscussCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(max_length=10)),
+                ('company_id', models.IntegerField(null=True)),
+                ('message_count', models.IntegerField(default=0)),
+                ('unread', models.IntegerField(default=0)),
+                ('last_message', models.DateTimeField(null=True)),
+                ('discuss', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='bank_guarantee.Discuss')),
+            ],
+            options={
+                'unique_together': {('discuss', 'role')},
+                'index_together': {('role', 'company_id', 'unread')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+from django.db.models import Count, Max, Q
+
+ROLES = [('agent', 'agent_id'), ('bank', 'bank_id'), ('client', 'request__client_id')]
+CHUNK_SIZE = 3000
+
+
+def backfill_discuss_counters(apps, schema_editor):
+    Discuss = apps.get_model('bank_guarantee', 'Discuss')
+    DiscussCounter = apps.get_model('bank_guarantee', 'DiscussCounter')
+    Message = apps.get_model('bank_guarantee', 'Message')
+
+    totals = {
+        row['discuss_id']: row
+        for row in Message.objects.values('discuss_id').annotate(
+            message_count=Count('id'),
+            last_message=Max('created'),
+            **{role: Count('id', filter=Q(**{'%s_read' % role: 0}))
+               for role, _ in ROLES}
+        ).order_by().iterator()
+    }
+    counters = []
+    for discuss in Discuss.objects.values(
+            'id', *[field for _, field in ROLES]
+    ).order_by('id').iterator():
+        total = totals.get(discuss['id'], {})
+        for role, field in ROLES:
+            counters.append(DiscussCounter(
+                discuss_id=discuss['id'],
+                role=role,
+                company_id=discuss[field],
+                message_count=total.get('message_count', 0),
+                unread=total.get(role, 0),
+                last_message=total.get('last_message'),
+            ))
+        if len(counters) >= CHUNK_SIZE:
+            DiscussCounter.objects.bulk_create(counters)
+            counters = []
+    DiscussCounter.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_guarantee', '0113_discusscounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_discuss_counters, migrations.RunPython.noop),
+    ]
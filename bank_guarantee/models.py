@@ -656,6 +656,27 @@ class Message(AbstractMessage):
                                 related_name='messages')
 
 
+class DiscussCounter(models.Model):
+    """
+    Сводка обсуждения для стороны (agent, bank, client): всего сообщений,
+    непрочитанных стороной и время последнего сообщения. company_id - агент,
+    банк или клиент стороны. Пересчитывается при сохранении сообщения
+    и при прочтении, см. bank_guarantee.helpers.discuss_counters
+    """
+    discuss = models.ForeignKey(
+        to=Discuss, on_delete=models.CASCADE, related_name='counters'
+    )
+    role = models.CharField(max_length=10)
+    company_id = models.IntegerField(null=True)
+    message_count = models.IntegerField(default=0)
+    unread = models.IntegerField(default=0)
+    last_message = models.DateTimeField(null=True)
+
+    class Meta:
+        unique_together = ('discuss', 'role')
+        index_together = [('role', 'company_id', 'unread')]
+
+
 class MessageFile(AbstractMessageFile):
     message = models.ForeignKey(to=Message, on_delete=models.CASCADE,
                                 related_name='files')
@@ -5,15 +5,13 @@ from cabinet.base_logic.printing_forms.generate import RequestPrintFormGenerator
 class PrintFormsGenerator:
     @staticmethod
     def _copy_document(document: RequestDocument, request: Request):
+        """
+        Копирование без копирования файла: документ дочерней заявки ссылается
+        на тот же BaseFile. При замене файла у заявки создается новый BaseFile
+        (см. change_print_form), удаление учитывает ссылки (delete_file_if_unused)
+        """
         document.id = None
         document.request = request
-
-        file = document.file
-        file.id = None
-        file.file.save(document.file.file.filename, document.file.file.open('rb'))
-        file.save()
-
-        document.file = file
         document.save()
 
     @classmethod
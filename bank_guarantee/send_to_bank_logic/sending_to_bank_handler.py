@@ -1,7 +1,12 @@
+import copy
 import logging
-from typing import List
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List
 
 from django.conf import settings
+from django.db import connection, transaction
 from django.utils import timezone
 
 
@@ -10,12 +15,19 @@ from bank_guarantee.send_to_bank_logic.helpers import get_request_model
 from base_request.models import AbstractRequest
 from base_request.tasks import task_send_to_bank
 from cabinet.base_logic.scoring.base import ScoringLogic, ScoringResult
+from cabinet.base_logic.scoring.facts import ScoringFacts
 from utils.helpers import generate_log_tags
 
 logger = logging.getLogger('django')
 
 
 class SendingToBanksHandler:
+    # количество потоков и таймаут (секунды) скоринга одного банка
+    # при параллельной отправке
+    scoring_workers = 8
+    scoring_timeout = 60
+    scoring_poll_interval = 0.5
+    scoring_timeout_error = 'Превышено время проверки скоринга'
 
     def fix_before_sending(self, request: AbstractRequest):
         now = timezone.now()
@@ -30,11 +42,13 @@ class SendingToBanksHandler:
         request.save()
         return request
 
-    def __init__(self, user):
+    def __init__(self, user, parallel_scoring=None):
         self.user = user
+        if parallel_scoring is None:
+            parallel_scoring = not settings.TESTING
+        self.parallel_scoring = parallel_scoring
 
     def send_to_many_banks(self, request: AbstractRequest, banks: List):
-        sending_result = []
         model = get_request_model(request)
 
         request = self.fix_before_sending(request)
@@ -44,65 +58,207 @@ class SendingToBanksHandler:
             base_request.base_request = base_request
             base_request.save()
 
-        for bank in banks:
-            logger.info(
-                'Отправка заявки в %s. %s' % (bank.short_name, generate_log_tags(
-                    request=base_request, user=self.user
-                ))
+        # факты (контракты, заключения) общие для скоринга во всех банках
+        scoring_facts = ScoringFacts()
+        if self.parallel_scoring:
+            sending_result = self.send_to_banks_parallel(
+                base_request, banks, model, scoring_facts
+            )
+        else:
+            sending_result = self.send_to_banks(
+                base_request, banks, model, scoring_facts
+            )
+        logger.info('Кеш фактов скоринга: %s. %s' % (
+            scoring_facts.get_stats(), generate_log_tags(
+                request=base_request, user=self.user
+            )
+        ))
+        base_request.refresh_from_db()
+        if model.objects.filter(base_request=base_request.base_request).count() == 1:
+            base_request.request_number = base_request.request_number.split('-')[0]
+            base_request.save()
+
+        if not settings.TESTING:
+            task_send_to_bank.delay(
+                request_id=base_request.id,
+                type='request' if isinstance(base_request, Request) else 'loan',
+                user_id=self.user.id
             )
+        return sending_result
+
+    def send_to_banks(self, base_request, banks, model, scoring_facts):
+        """ Последовательная отправка: скоринг и запись по каждому банку по очереди """
+        sending_result = []
+        for bank in banks:
+            self.log_sending(base_request, bank)
             current_request = model.objects.filter(
                 bank=bank, base_request=base_request
             ).first()
 
             if current_request:
-                if not current_request.request_number:
-                    current_request.request_number = current_request.generate_request_number()  # noqa
-                    current_request.save()
+                self.fix_request_number(current_request)
             else:
-                if not bank.settings.enable:
-                    logger.info('Принятие заявок в банк %s выключено. %s' % (
-                        bank.short_name, generate_log_tags(request=current_request)))
+                if not self.is_bank_enabled(bank, base_request):
                     continue
-                scoring = ScoringLogic(bank=bank, request=request)
-                if bank.settings.scoring_enable:
-                    result = scoring.check(use_common_rules=True)
-                else:
-                    result = ScoringResult()
-
+                result = self.check_scoring(bank, base_request, scoring_facts)
                 if result.is_fail:
-                    logger.info(
-                        'Результат проверки скоринг в банк %s - false (%s). %s' % (
-                        bank.short_name, result.get_errors(), generate_log_tags(
-                            request=base_request, user=self.user
-                        ))
-                    )
+                    self.log_scoring_fail(base_request, bank, result)
                     continue
-                else:
-                    current_request = self.get_request_for_send_to_bank(base_request)
+                current_request = self.get_request_for_send_to_bank(base_request)
 
             sending_to_bank_request = self.start_send_in_bank(current_request, bank)
             sending_result.append(sending_to_bank_request)
-        base_request.refresh_from_db()
-        if model.objects.filter(base_request=base_request.base_request).count() == 1:
-            base_request.request_number = base_request.request_number.split('-')[0]
-            base_request.save()
+        return sending_result
 
-        if not settings.TESTING:
-            task_send_to_bank.delay(
-                request_id=base_request.id,
-                type='request' if isinstance(base_request, Request) else 'loan',
-                user_id=self.user.id
+    def send_to_banks_parallel(self, base_request, banks, model, scoring_facts):
+        """
+        Параллельная отправка: скоринг всех банков выполняется одновременно,
+        затем заявки клонируются и переводятся в статус в порядке переданных
+        банков, каждый банк в своей транзакции
+        """
+        banks = list(banks)
+        current_requests = {
+            current_request.bank_id: current_request
+            for current_request in model.objects.filter(
+                bank__in=banks, base_request=base_request
             )
+        }
+        scoring_results = self.score_banks(base_request, [
+            bank for bank in banks
+            if bank.id not in current_requests and self.is_bank_enabled(bank, base_request)
+        ], scoring_facts)
+
+        sending_result = []
+        for bank in banks:
+            self.log_sending(base_request, bank)
+            current_request = current_requests.get(bank.id)
+            if not current_request:
+                result = scoring_results.get(bank.id)
+                if result is None:
+                    continue
+                if result.is_fail:
+                    self.log_scoring_fail(base_request, bank, result)
+                    continue
+            with transaction.atomic():
+                if current_request:
+                    self.fix_request_number(current_request)
+                else:
+                    current_request = self.get_request_for_send_to_bank(
+                        base_request
+                    )
+                sending_to_bank_request = self.start_send_in_bank(
+                    current_request, bank
+                )
+            sending_result.append(sending_to_bank_request)
         return sending_result
 
+    def score_banks(self, request, banks, scoring_facts) -> Dict[int, ScoringResult]:
+        """
+        Скоринг заявки сразу в нескольких банках на пуле потоков.
+        Банк, скоринг которого не уложился в scoring_timeout, считается
+        не прошедшим скоринг. Каждый поток получает свою копию заявки:
+        потоки, не уложившиеся в таймаут, продолжают работать после возврата
+        и не должны видеть изменения заявки при отправке в банки
+        """
+        if not banks:
+            return {}
+        workers = min(self.scoring_workers, len(banks))
+        # задачи, которые не смогли начаться из-за зависших потоков,
+        # тоже должны завершиться по таймауту
+        deadline = time.monotonic() + self.scoring_timeout * math.ceil(
+            len(banks) / workers
+        )
+        started = {}
+        results = {}
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                executor.submit(
+                    self.check_scoring_in_thread, bank, copy.deepcopy(request),
+                    scoring_facts, started
+                ): bank for bank in banks
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(
+                    pending,
+                    timeout=self.scoring_poll_interval,
+                    return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    results[futures[future].id] = future.result()
+
+                now = time.monotonic()
+                for future in list(pending):
+                    bank = futures[future]
+                    start = started.get(bank.id)
+                    expired = start is not None and now - start > self.scoring_timeout
+                    if expired or now > deadline:
+                        future.cancel()
+                        pending.discard(future)
+                        results[bank.id] = ScoringResult(self.scoring_timeout_error)
+                        logger.warning('Таймаут скоринга в банк %s. %s' % (
+                            bank.short_name, generate_log_tags(
+                                request=request, user=self.user
+                            )
+                        ))
+        finally:
+            executor.shutdown(wait=False)
+        return results
+
+    def check_scoring_in_thread(self, bank, request, scoring_facts, started):
+        started[bank.id] = time.monotonic()
+        try:
+            return self.check_scoring(bank, request, scoring_facts)
+        finally:
+            # у каждого потока свое соединение с БД
+            connection.close()
+
+    def check_scoring(self, bank, request, scoring_facts) -> ScoringResult:
+        if not bank.settings.scoring_enable:
+            return ScoringResult()
+        scoring = ScoringLogic(bank=bank, request=request, facts=scoring_facts)
+        # при отправке достаточно первой ошибки, дорогие проверки - в конце
+        return scoring.check(use_common_rules=True, fail_fast=True)
+
+    def is_bank_enabled(self, bank, request):
+        if not bank.settings.enable:
+            logger.info('Принятие заявок в банк %s выключено. %s' % (
+                bank.short_name, generate_log_tags(request=request)))
+            return False
+        return True
+
+    @staticmethod
+    def fix_request_number(request):
+        if not request.request_number:
+            request.request_number = request.generate_request_number()
+            request.save()
+
+    def log_sending(self, request, bank):
+        logger.info(
+            'Отправка заявки в %s. %s' % (bank.short_name, generate_log_tags(
+                request=request, user=self.user
+            ))
+        )
+
+    def log_scoring_fail(self, request, bank, result):
+        logger.info(
+            'Результат проверки скоринг в банк %s - false (%s). %s' % (
+                bank.short_name, result.get_errors(), generate_log_tags(
+                    request=request, user=self.user
+                ))
+        )
+
     def get_request_for_send_to_bank(self, request):
-        if not request.bank:
-            work_request = request
-            work_request.base_request = request
+        # заявка перечитывается из БД: общий экземпляр base_request
+        # используется при отправке в остальные банки и не должен меняться
+        work_request = type(request).objects.get(pk=request.pk)
+        if not work_request.bank_id:
+            work_request.base_request_id = request.pk
             if '-' not in str(work_request.request_number):
-                work_request.request_number = request.generate_request_number()
+                work_request.request_number = work_request.generate_request_number()
         else:
-            work_request = request.clone_request()
+            work_request = work_request.clone_request()
 
         return work_request
 
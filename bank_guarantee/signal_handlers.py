@@ -4,14 +4,23 @@ from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 
 from bank_guarantee.models import (
-    Request, RequestDocument, ClientDocument, RequestHistory, RequestStatus
+    Request, RequestDocument, ClientDocument, RequestHistory, RequestStatus, Offer,
+    Message
 )
 from base_request.models import RequestTender
 from clients.models import BankRating, BankPackage, MFOPackage
 
+from cabinet.base_logic.helpers.files import get_file_references
+from cabinet.base_logic.helpers.previous import forget_previous, is_changed, track_fields
+from cabinet.base_logic.package.base import PackageLogic
+from cabinet.base_logic.reports.rollup import FACT_FIELDS, RequestRollup
+from cabinet.base_logic.search.index import REQUEST_SOURCE_FIELDS, SearchIndex
+from cabinet.models import SearchDocument
 from common.helpers import delete_file_doc
 from files.models import BaseFile
 
+track_fields(Request, REQUEST_SOURCE_FIELDS + FACT_FIELDS)
+
 
 @receiver(post_save, sender=Request)
 def create_rating_post_save(sender, instance, created, **kwargs):
@@ -37,8 +46,43 @@ def post_save_request(sender, instance, created, **kwargs):
 
 @receiver(pre_save, sender=Request)
 def request_package_update(sender, instance, **kwargs):
-    """ Перед сохранением объекта обновляем пакет документов """
-    instance.check_package(force=True, auto_save=False)
+    """
+    Перед сохранением объекта обновляем пакет документов,
+    если изменились данные, от которых он зависит
+    """
+    PackageLogic.update_package_if_changed(instance)
+
+
+@receiver(post_save, sender=Request)
+def request_package_fingerprint(sender, instance, **kwargs):
+    PackageLogic.save_fingerprint(instance)
+
+
+@receiver(pre_save, sender=Request)
+def check_search_fields_changed(sender, instance, **kwargs):
+    instance.search_fields_changed = is_changed(instance, REQUEST_SOURCE_FIELDS)
+
+
+@receiver(post_save, sender=Request)
+def forget_previous_request(sender, instance, **kwargs):
+    forget_previous(instance)
+
+
+@receiver(post_save, sender=Request)
+def update_request_search_document(sender, instance, **kwargs):
+    if getattr(instance, 'search_fields_changed', True):
+        SearchIndex.on_changed(SearchDocument.TYPE_BG, [instance.id])
+
+
+@receiver(post_delete, sender=Request)
+def delete_request_search_document(sender, instance, **kwargs):
+    SearchIndex.on_changed(SearchDocument.TYPE_BG, [instance.id])
+
+
+@receiver(post_save, sender=RequestTender)
+def update_tender_search_documents(sender, instance, created, **kwargs):
+    if not created:
+        SearchIndex.on_tender_changed(instance.id)
 
 
 @receiver(pre_save, sender=Request)
@@ -57,7 +101,9 @@ def request_status_changed_update(sender, instance, **kwargs):
 @receiver(post_delete, sender=RequestDocument)
 def pre_delete_request_document(sender, instance, **kwargs):
     try:
-        delete_file_doc(instance.file)
+        # файл может использоваться документами других заявок
+        if not get_file_references(instance.file):
+            delete_file_doc(instance.file)
     except BaseFile.DoesNotExist:
         pass
 
@@ -65,7 +111,8 @@ def pre_delete_request_document(sender, instance, **kwargs):
 @receiver(post_delete, sender=ClientDocument)
 def pre_delete_client_document(sender, instance, **kwargs):
     try:
-        delete_file_doc(instance.file)
+        if not get_file_references(instance.file):
+            delete_file_doc(instance.file)
     except BaseFile.DoesNotExist:
         pass
 
@@ -79,6 +126,41 @@ def update_client_last_action(sender, instance=None, **kwargs):
         client.save()
 
 
+@receiver(pre_save, sender=Request)
+def check_statistics_fields_changed(sender, instance, **kwargs):
+    instance.statistics_fields_changed = is_changed(instance, FACT_FIELDS)
+
+
+@receiver(post_save, sender=Request)
+def update_request_statistics_request(sender, instance, **kwargs):
+    if getattr(instance, 'statistics_fields_changed', True):
+        RequestRollup.on_request_changed(instance.id)
+
+
+@receiver(post_delete, sender=Request)
+def delete_request_statistics(sender, instance, **kwargs):
+    RequestRollup.on_request_changed(instance.id)
+
+
+@receiver(post_save, sender=RequestHistory)
+def update_request_statistics(sender, instance, created, **kwargs):
+    """ Обновление дневной сводки по заявкам при смене статуса """
+    if created:
+        RequestRollup.on_request_changed(instance.request_id)
+
+
+@receiver(post_save, sender=Offer)
+@receiver(post_delete, sender=Offer)
+def update_request_statistics_offer(sender, instance, **kwargs):
+    RequestRollup.on_request_changed(instance.request_id)
+
+
+@receiver(post_save, sender=Message)
+def update_discuss_counters(sender, instance, **kwargs):
+    from bank_guarantee.helpers.discuss_counters import DiscussCounters
+    DiscussCounters.refresh(instance.discuss_id)
+
+
 @receiver(post_save, sender=ClientDocument)
 def post_save_client_document(sender, instance, **kwargs):
     """ изменения черновиков БГ """
@@ -0,0 +1,29 @@
+from bank_guarantee.helpers.discuss_counters import DiscussCounters
+from bank_guarantee.models import Discuss
+
+
+def test_discuss_counters_version():
+    version = DiscussCounters.get_version('agent', 100500)
+    DiscussCounters.bump_version('agent', 100500)
+    assert DiscussCounters.get_version('agent', 100500) == version + 1
+    assert DiscussCounters.get_version('bank', 100500) == 0
+
+    # версия уже изменилась - ответ без ожидания
+    assert DiscussCounters.wait_changes(
+        'agent', 100500, version, timeout=5
+    ) == version + 1
+    assert DiscussCounters.wait_changes(
+        'agent', 100500, version + 1, timeout=0
+    ) == version + 1
+
+
+def test_discuss_counters_company_id():
+    discuss = Discuss(agent_id=1, bank_id=2)
+    assert DiscussCounters.get_company_id(discuss, 'agent') == 1
+    assert DiscussCounters.get_company_id(discuss, 'bank') == 2
+
+
+def test_discuss_counters_wait_timeout(monkeypatch):
+    monkeypatch.setenv('DISCUSS_WAIT_TIMEOUT', '0')
+    version = DiscussCounters.get_version('client', 100500)
+    assert DiscussCounters.wait_changes('client', 100500, version) == version
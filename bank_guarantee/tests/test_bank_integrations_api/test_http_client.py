@@ -0,0 +1,57 @@
+import pytest
+import requests
+
+from bank_guarantee.bank_integrations.http_client import (
+    BankHttpClient, CircuitBreaker, CircuitOpenError, HttpMetrics
+)
+
+
+class Response:
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker('test', failure_threshold=2, recovery_timeout=30)
+    breaker.before_request()
+    breaker.failure()
+    breaker.before_request()
+    breaker.failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    breaker.success()
+    breaker.before_request()
+
+
+def test_circuit_breaker_disabled():
+    breaker = CircuitBreaker('test', failure_threshold=0)
+    for _ in range(10):
+        breaker.failure()
+    breaker.before_request()
+
+
+def test_bank_http_client_request(mocker):
+    client = BankHttpClient('test_bank', verify=False, failure_threshold=2)
+    session_request = mocker.patch.object(
+        client.session, 'request', return_value=Response(200)
+    )
+    record = mocker.patch.object(HttpMetrics, 'record')
+
+    assert client.get('https://bank.test/status').status_code == 200
+    session_request.assert_called_once_with(
+        'GET', 'https://bank.test/status', timeout=client.timeout, verify=False
+    )
+    assert record.call_args[1] == {'error': False}
+
+    session_request.side_effect = requests.exceptions.ConnectTimeout()
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectTimeout):
+            client.post('https://bank.test/order', json={})
+    assert record.call_args[1] == {'error': True}
+
+    # после двух ошибок подряд запросы не отправляются
+    with pytest.raises(CircuitOpenError):
+        client.get('https://bank.test/status')
+    assert session_request.call_count == 3
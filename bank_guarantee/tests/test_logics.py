@@ -1,3 +1,5 @@
+import time
+
 import pytest
 from django.core.cache import cache
 from django.utils import timezone
@@ -7,9 +9,14 @@ from bank_guarantee.actions import (
     SendToBankAction, RequestActionHandler, RequestDenyByVerifier
 )
 from bank_guarantee.models import Request, RequestStatus
+from bank_guarantee.send_to_bank_logic.sending_to_bank_handler import (
+    SendingToBanksHandler
+)
 from base_request.logic.user_stories import get_banks_for_send
 from base_request.models import RequestTender
 from base_request.tasks import task_send_to_bank, task_send_to_bank_from_verification
+from cabinet.base_logic.scoring.base import ScoringResult
+from cabinet.base_logic.scoring.facts import ScoringFacts
 from clients.models import Bank
 from settings.configs.banks import BankCode
 from users.models import User, Role
@@ -285,3 +292,63 @@ def test_sent_to_bank_with_disabled_banks_as_agent(initial_data_db, rm):
         'list': [],
         'send_to': 18
     }
+
+
+def test_parallel_score_banks_timeout():
+    def check_scoring(bank, request, scoring_facts):
+        if bank.id == 2:
+            time.sleep(1)
+        if bank.id == 3:
+            return ScoringResult('fail')
+        return ScoringResult()
+
+    helper = SendingToBanksHandler(User(), parallel_scoring=True)
+    helper.scoring_timeout = 0.3
+    helper.scoring_poll_interval = 0.05
+    helper.check_scoring = check_scoring
+    results = helper.score_banks(
+        Request(), [Bank(id=1), Bank(id=2), Bank(id=3)], ScoringFacts()
+    )
+    assert results[1].is_success
+    assert results[2].get_first_error() == helper.scoring_timeout_error
+    assert results[3].is_fail
+
+
+@patch('conclusions_app.settings.CONCLUSIONS', [])
+@pytest.mark.django_db(transaction=True)
+def test_send_to_many_banks_parallel(setup_db):
+    """ Параллельная отправка в несколько банков с копией заявки в потоках """
+    client = setup_db['client']
+    banks = [setup_db['bank']] + list(
+        Bank.objects.exclude(id=setup_db['bank'].id)[:1]
+    )
+    for bank in banks:
+        bank.settings.enable = True
+        bank.settings.save()
+    request = Request.objects.create(
+        client=client,
+        required_amount=100000,
+        tender=RequestTender.objects.create(),
+        interval_from=timezone.now().date()
+    )
+    scored = []
+
+    def check_scoring(bank, scoring_request, scoring_facts):
+        scored.append(scoring_request)
+        return ScoringResult()
+
+    helper = SendingToBanksHandler(client.user_set.first(), parallel_scoring=True)
+    helper.check_scoring = check_scoring
+    result = helper.send_to_many_banks(request, banks)
+
+    assert len(scored) == len(banks)
+    assert all(scoring_request is not request for scoring_request in scored)
+    assert all(sent is not request for sent in result)
+    assert [sent.bank_id for sent in result] == [bank.id for bank in banks]
+    assert result[0].id == request.id
+    sent_requests = Request.objects.filter(base_request=request)
+    assert sent_requests.count() == len(banks)
+    for sent in sent_requests:
+        assert sent.status.code == RequestStatus.CODE_SENDING_IN_BANK
+    request.refresh_from_db()
+    assert request.bank_id == banks[0].id
@@ -17,6 +17,7 @@ from cabinet.api.viewsets.calculator import CalculateBGViewSet
 from cabinet.api.viewsets.discuss import DiscussViewSet, TemplateChatViewSet
 from cabinet.api.viewsets.notifications import NotificationsViewSet
 from cabinet.api.viewsets.reports import ReportViewSet
+from cabinet.api.viewsets.scoring import ScoringViewSet
 from cabinet.api.viewsets.requests_common import (
     RequestsViewSet, RequestTenderViewSet, TendersViewSet, LoanDocumentsViewSet,
     RequestDocumentsViewSet
@@ -37,6 +38,7 @@ router.register(r'tenders', TendersViewSet, basename='tenders')
 router.register(r'notifications', NotificationsViewSet, basename='notification')
 router.register(r'calculator_bg', CalculateBGViewSet, basename='calculator_bg')
 router.register(r'reports', ReportViewSet, basename='reports')
+router.register(r'scoring', ScoringViewSet, basename='scoring')
 router.register(r'template_chat', TemplateChatViewSet, basename='template_chat')
 router.register(r'requests/tender_loans', LoanRequestViewSet, basename='tender_loans')
 router.register(r'requests/bank_guarantee', BGRequestsViewSet, basename='bank_guarantee')
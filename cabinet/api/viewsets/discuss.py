@@ -4,7 +4,8 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action as drf_action
 from rest_framework.response import Response
 
-from bank_guarantee.models import Message, Discuss
+from bank_guarantee.helpers.discuss_counters import DiscussCounters
+from bank_guarantee.models import Discuss
 from bank_guarantee.serializers import BaseShortDiscussSerializer
 from base_request.models import AbstractRequest
 from clients.models import TemplateChatBank, MFO, Bank, Agent, Client, BaseFile, \
@@ -168,10 +169,10 @@ class DiscussViewSet(viewsets.ViewSet):
             return Discuss.objects.none()
 
         if not isinstance(company, MFO):
-            discuss_list = Message.objects.filter(
-                **{'%s_read' % role: 0}
-            ).values_list('discuss', flat=True).distinct()
-            discuss = Discuss.objects.filter(id__in=discuss_list).filter(**kwargs)
+            # обсуждения с непрочитанными сообщениями стороны по DiscussCounter
+            discuss = Discuss.objects.filter(
+                counters__role=role, counters__unread__gt=0, **kwargs
+            )
         else:
             discuss = Discuss.objects.none()
         return discuss
@@ -199,8 +200,8 @@ class DiscussViewSet(viewsets.ViewSet):
         loan_discuss = self.get_loan_discusses(role, **kwargs)
 
         discuss = discuss.select_related().annotate(
-            message_count=Count('messages'),
-            last_message=Max('messages__created'),
+            message_count=F('counters__message_count'),
+            last_message=F('counters__last_message'),
             request_type=Value(AbstractRequest.TYPE_BG, CharField()),
         ).values(*self.selected_request_fields())
 
@@ -247,14 +248,7 @@ class DiscussViewSet(viewsets.ViewSet):
             'data': data
         })
 
-    @drf_action(detail=False, methods=['GET'])
-    def count(self, request, pk=None):
-        try:
-            company = self.request.user.client.get_actual_instance
-        except Exception:
-            return Response({
-                'count': 0
-            })
+    def get_count_data(self, company):
         role = company.get_role().lower()
         if role == 'mfo':
             role = 'bank'
@@ -267,13 +261,42 @@ class DiscussViewSet(viewsets.ViewSet):
             filter_kwargs['discuss__agent_id'] = company.id
         if role == 'client':
             filter_kwargs['discuss__request__client_id'] = company.id
-        messages_count = Message.objects.filter(**filter_kwargs).count()
+        messages_count = DiscussCounters.get_unread(role, company.id)
         loan_messages_count = LoanMessage.objects.filter(**filter_kwargs).count()
-        count = 0
+        return {
+            'count': messages_count + loan_messages_count,
+            'version': DiscussCounters.get_version(role, company.id),
+        }
+
+    @drf_action(detail=False, methods=['GET'])
+    def count(self, request, pk=None):
         try:
-            count = messages_count + loan_messages_count
+            company = self.request.user.client.get_actual_instance
         except Exception:
-            pass
-        return Response({
-            'count': count
-        })
+            return Response({
+                'count': 0
+            })
+        return Response(self.get_count_data(company))
+
+    @drf_action(detail=False, methods=['GET'])
+    def wait(self, request, pk=None):
+        """
+        Long-poll вместо опроса count: ответ после изменения счетчиков
+        компании пользователя (версия version из предыдущего ответа)
+        или по таймауту DISCUSS_WAIT_TIMEOUT, см. DiscussCounters.wait_changes
+        """
+        try:
+            company = self.request.user.client.get_actual_instance
+        except Exception:
+            return Response({
+                'count': 0
+            })
+        role = company.get_role().lower()
+        if role == 'mfo':
+            role = 'bank'
+        try:
+            version = int(request.query_params.get('version', 0))
+        except ValueError:
+            version = 0
+        DiscussCounters.wait_changes(role, company.id, version)
+        return Response(self.get_count_data(company))
@@ -1,12 +1,10 @@
-import datetime
+import heapq
 import logging
-from collections import Iterable
 
-import dateutil
-import ujson
+from django.core.cache import cache
 from django.core.paginator import Paginator, PageNotAnInteger
 from django.db.models import Value, CharField, DateField, Q, IntegerField
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action as drf_action
 from rest_framework.response import Response
 
@@ -22,6 +20,12 @@ from base_request.serializers import (
     RequestTenderSerializer, BaseRequestSerializer, RequestStatusSerializer,
     LoanRequestStatusSerializer
 )
+from cabinet.base_logic.helpers.access_scope import AccessScope
+from cabinet.base_logic.helpers.pagination import (
+    InvalidCursor, InvalidLimit, after_cursor, get_cached_counts, get_limit, get_page,
+    get_signature
+)
+from cabinet.base_logic.helpers.request_filters import filter_requests
 from cabinet.constants.constants import DeliveryType, FederalLaw, Target
 from cabinet.models import PlacementPlace
 from cabinet.serializers import FileSerializer
@@ -30,8 +34,6 @@ from clients.serializers import AgentInfoSerializer, BankInfoSerializer
 from external_api.data_zakupki_tenderhelp_api import ZakupkiTenderhelpApi
 from external_api.parsers_tenderhelp import ParsersApi
 from files.models import BaseFile
-from permissions.logic.bank_guarantee import GetUserAllowedRequests
-from permissions.logic.tender_loans import GetUserAllowedLoanRequests
 from settings.configs.money import MoneyTypes
 from tender_loans.models import (
     LoanRequest, LoanRequestDocument, LoanDocumentLinkToPerson, LoanStatus
@@ -352,6 +354,8 @@ class RequestDocumentsViewSet(viewsets.ViewSet):
 
 
 class RequestsViewSet(viewsets.ViewSet):
+    REFERENCES_CACHE_KEY = 'requests_references'
+    REFERENCES_CACHE_TTL = 5 * 60
 
     @drf_action(detail=False, methods=['GET'])
     def get_choices_delivery_methods(self, *args, **kwargs):
@@ -430,7 +434,8 @@ class RequestsViewSet(viewsets.ViewSet):
             'request_type',
         )
 
-    def get_queryset(self):
+    def get_querysets(self):
+        """ Заявки БГ и займы пользователя с фильтром, до объединения """
         archive = self.request.GET.get('archive', 'false') == 'true'
         requests = BGRequest.objects.select_related().annotate(
             request_type=Value(AbstractRequest.TYPE_BG, CharField())
@@ -446,12 +451,12 @@ class RequestsViewSet(viewsets.ViewSet):
 
         ).select_related().filter(in_archive=archive)
 
-        requests = GetUserAllowedRequests().execute(
+        requests = AccessScope.filter_requests(
             self.request.user,
             requests=requests
         ).select_related()
 
-        loan_requests = GetUserAllowedLoanRequests().execute(
+        loan_requests = AccessScope.filter_loan_requests(
             self.request.user,
             requests=loan_requests
         ).select_related()
@@ -467,27 +472,15 @@ class RequestsViewSet(viewsets.ViewSet):
 
         requests = requests.values(*self.selected_request_fields())
         loan_requests = loan_requests.values(*self.selected_request_fields())
-        return requests.union(loan_requests).order_by('-status_changed_date')
+        return requests, loan_requests
 
-    def list(self, *args, **kwargs):
-        requests = self.get_queryset()
-        page_limit = self.request.GET.get('limit', 50)
-        len_requests = len(requests)
-        len_requests_unique = len(requests.filter(request_number__in="-"))
-        page = self.request.GET.get('page', 1)
-        paginator = Paginator(requests, page_limit)
-        paginated_requests = []
-        if requests:
-            try:
-                paginated_requests = paginator.page(page)
-            except PageNotAnInteger:
-                paginated_requests = paginator.page(1)
+    def get_queryset(self):
+        requests, loan_requests = self.get_querysets()
+        return requests.union(loan_requests).order_by('-status_changed_date')
 
-        return Response({
-            'requests': BaseRequestSerializer(
-                paginated_requests,
-                many=True
-            ).data,
+    @staticmethod
+    def get_references():
+        return {
             'request_statuses': RequestStatusSerializer(
                 RequestStatus.objects.all(), many=True
             ).data,
@@ -498,9 +491,6 @@ class RequestsViewSet(viewsets.ViewSet):
                 Agent.objects.filter(active=True, confirmed=True),
                 many=True
             ).data,
-            'page_count': paginator.num_pages if requests else 0,
-            'len_requests': len_requests,
-            'len_requests_unique': len_requests_unique,
             'banks': BankInfoSerializer(
                 Bank.objects.filter(active=True),
                 many=True
@@ -512,90 +502,98 @@ class RequestsViewSet(viewsets.ViewSet):
             'managers': [{
                 'value': manager.id, 'label': manager.full_name
             } for manager in AgentManager.get_managers()]
-        })
+        }
 
-    @staticmethod
-    def filter_queryset(request_get, queryset):
-        filter_value = ujson.loads(request_get['filter'])
-        if filter_value:
-            if filter_value.get('request_number'):
-                queryset = queryset.filter(
-                    request_number__icontains=filter_value['request_number']
-                )
-
-            if filter_value.get('client'):
-                queryset = queryset.filter(
-                    Q(client__inn__icontains=filter_value['client']) |
-                    Q(client__full_name__icontains=filter_value['client']) |
-                    Q(client__short_name__icontains=filter_value['client'])
-                )
-
-            if filter_value.get('bank'):
-                if isinstance(filter_value['bank'], str):
-                    filter_value['bank'] = [int(filter_value['bank'])]
-                elif not isinstance(filter_value['bank'], Iterable):
-                    filter_value['bank'] = [filter_value['bank']]
-                queryset = queryset.filter(bank__id__in=filter_value['bank'])
-
-            if filter_value.get('required_amount_from'):
-                queryset = queryset.filter(
-                    required_amount__gte=filter_value['required_amount_from']
-                )
+    @drf_action(detail=False, methods=['GET'])
+    def references(self, *args, **kwargs):
+        """
+        Справочники для фильтров списка заявок (статусы, агенты, банки, МФО,
+        менеджеры). Общие для всех пользователей, кешируются, ответ с ETag
+        """
+        references = cache.get(self.REFERENCES_CACHE_KEY)
+        if references is None:
+            data = self.get_references()
+            references = {'data': data, 'etag': '"%s"' % get_signature(data)}
+            cache.set(self.REFERENCES_CACHE_KEY, references, self.REFERENCES_CACHE_TTL)
+        if self.request.META.get('HTTP_IF_NONE_MATCH') == references['etag']:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(references['data'])
+        response['ETag'] = references['etag']
+        return response
+
+    def get_counts(self, querysets) -> dict:
+        signature = get_signature(
+            self.request.user.id,
+            self.request.GET.get('archive', 'false'),
+            self.request.GET.get('filter'),
+        )
+        return get_cached_counts(signature, lambda: {
+            'len_requests': sum(queryset.count() for queryset in querysets),
+            'len_requests_unique': sum(
+                queryset.filter(request_number__in="-").count()
+                for queryset in querysets
+            ),
+        })
 
-            if filter_value.get('required_amount_to'):
-                queryset = queryset.filter(
-                    required_amount__lte=filter_value['required_amount_to']
-                )
+    def list_by_cursor(self):
+        """
+        Страница списка после курсора: по limit + 1 заявок из каждой части
+        (индекс по status_changed_date, id), без OFFSET и подсчета всего списка.
+        Итоги кешируются по фильтру, справочники - в references
+        """
+        cursor = self.request.GET.get('cursor')
+        querysets = self.get_querysets()
+        try:
+            limit = get_limit(self.request.GET.get('limit'))
+            parts = [
+                after_cursor(queryset, cursor).order_by(
+                    '-status_changed_date', '-id'
+                )[:limit + 1]
+                for queryset in querysets
+            ]
+        except (InvalidCursor, InvalidLimit) as error:
+            return Response({
+                'error': str(error)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        rows = heapq.merge(
+            *parts, key=lambda row: (row['status_changed_date'], row['id']),
+            reverse=True
+        )
+        page, next_cursor = get_page(rows, limit)
+        return Response({
+            'requests': BaseRequestSerializer(page, many=True).data,
+            'next_cursor': next_cursor,
+            **self.get_counts(querysets)
+        })
 
-            if filter_value.get('created_date_from'):
-                date_from = dateutil.parser.parse(
-                    filter_value['created_date_from'])
-                queryset = queryset.filter(
-                    created_date__gte=datetime.datetime(
-                        year=date_from.year,
-                        month=date_from.month,
-                        day=date_from.day,
-                        hour=0,
-                        minute=0
-                    )
-                )
+    def list(self, *args, **kwargs):
+        if 'cursor' in self.request.GET:
+            return self.list_by_cursor()
+        requests = self.get_queryset()
+        page_limit = self.request.GET.get('limit', 50)
+        len_requests = len(requests)
+        len_requests_unique = len(requests.filter(request_number__in="-"))
+        page = self.request.GET.get('page', 1)
+        paginator = Paginator(requests, page_limit)
+        paginated_requests = []
+        if requests:
+            try:
+                paginated_requests = paginator.page(page)
+            except PageNotAnInteger:
+                paginated_requests = paginator.page(1)
 
-            if filter_value.get('created_date_to'):
-                date_to = dateutil.parser.parse(filter_value['created_date_to'])
-                queryset = queryset.filter(
-                    created_date__lte=datetime.datetime(
-                        year=date_to.year,
-                        month=date_to.month,
-                        day=date_to.day,
-                        hour=23,
-                        minute=59
-                    )
-                )
-            if filter_value.get('tender'):
-                queryset = queryset.filter(
-                    tender__notification_id__icontains=filter_value['tender']
-                )
+        return Response({
+            'requests': BaseRequestSerializer(
+                paginated_requests,
+                many=True
+            ).data,
+            'page_count': paginator.num_pages if requests else 0,
+            'len_requests': len_requests,
+            'len_requests_unique': len_requests_unique,
+            **self.get_references()
+        })
 
-            if filter_value.get('status'):
-                statuses = filter_value.get('status', [])
-                if isinstance(statuses, str):
-                    statuses = [statuses]
-                queryset = queryset.filter(status__code__in=statuses)
-
-            if filter_value.get('agent'):
-                if isinstance(filter_value['agent'], str):
-                    filter_value['agent'] = [int(filter_value['agent'])]
-                elif not isinstance(filter_value['agent'], Iterable):
-                    filter_value['agent'] = [filter_value['agent']]
-                queryset = queryset.filter(agent_id__in=filter_value['agent'])
-
-            if filter_value.get('manager'):
-                if isinstance(filter_value['manager'], str):
-                    filter_value['manager'] = [int(filter_value['manager'])]
-                elif not isinstance(filter_value['manager'], list):
-                    filter_value['manager'] = [filter_value['manager']]
-                agents = AgentManager.objects.filter(
-                    manager_id__in=filter_value['manager']
-                ).values_list('agent_id', flat=True)
-                queryset = queryset.filter(agent_id__in=agents)
-        return queryset
+    @staticmethod
+    def filter_queryset(request_get, queryset):
+        return filter_requests(request_get, queryset)
@@ -0,0 +1,66 @@
+from rest_framework import viewsets, status
+from rest_framework.decorators import action as drf_action
+from rest_framework.response import Response
+
+from bank_guarantee.models import Request
+from cabinet.base_logic.scoring.batch import BatchScoring
+from cabinet.base_logic.scoring.profiler import ScoringProfiler
+from clients.models import Bank
+from tender_loans.models import LoanRequest
+from users.models import Role
+
+
+class ScoringViewSet(viewsets.ViewSet):
+    # большие матрицы считаются командой test_scoring
+    max_requests = 100
+
+    def has_access(self, request):
+        return request.user.is_superuser or request.user.has_role(Role.SUPER_AGENT)
+
+    @drf_action(detail=False, methods=['POST'])
+    def batch_check(self, request):
+        if not self.has_access(request):
+            return Response(status=status.HTTP_403_FORBIDDEN)
+
+        requests_ids = request.data.get('requests') or []
+        banks_ids = request.data.get('banks') or []
+        if not requests_ids:
+            return Response({'errors': ['Не указаны заявки']})
+        if len(requests_ids) > self.max_requests:
+            return Response({
+                'errors': ['Не более %s заявок за один запрос' % self.max_requests]
+            })
+
+        model = LoanRequest if request.data.get('loans') else Request
+        requests = model.objects.filter(
+            id__in=requests_ids
+        ).select_related('client__profile', 'tender').order_by('id')
+        banks = Bank.objects.select_related('settings').order_by('id')
+        if banks_ids:
+            banks = banks.filter(id__in=banks_ids)
+        else:
+            banks = banks.filter(settings__enable=True)
+
+        result = BatchScoring(
+            requests, banks, fail_fast=bool(request.data.get('fail_fast'))
+        ).run()
+        return Response(result.to_dict())
+
+    @drf_action(detail=False, methods=['GET', 'POST'])
+    def profiler(self, request):
+        """
+        GET - статистика профилировщика скоринга текущего процесса,
+        POST {enabled: bool, reset: bool} - включение/выключение и сброс
+        """
+        if not self.has_access(request):
+            return Response(status=status.HTTP_403_FORBIDDEN)
+
+        if request.method == 'POST':
+            if 'enabled' in request.data:
+                if request.data['enabled']:
+                    ScoringProfiler.enable()
+                else:
+                    ScoringProfiler.disable()
+            if request.data.get('reset'):
+                ScoringProfiler.reset()
+        return Response(ScoringProfiler.get_report())
@@ -1,3 +1,9 @@
+import datetime
+import hashlib
+import re
+import threading
+from collections import namedtuple
+
 import requests
 from django.core.cache import cache
 from lxml import html
@@ -16,6 +22,102 @@ class NotAvailableExternalResource(Exception):
     pass
 
 
+TerroristRecord = namedtuple('TerroristRecord', ['names', 'date_of_birth', 'place_of_birth'])
+
+
+def normalize_name(value) -> str:
+    value = (value or '').upper().replace('Ё', 'Е')
+    return ' '.join(value.split())
+
+
+def normalize_date(value) -> str:
+    """ Дата рождения в формате перечня: ДД.ММ.ГГГГ """
+    if not value:
+        return ''
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime('%d.%m.%Y')
+    value = str(value).strip()
+    if re.match(r'^\d{4}-\d{2}-\d{2}', value):
+        return datetime.datetime.strptime(value[:10], '%Y-%m-%d').strftime('%d.%m.%Y')
+    return value
+
+
+class TerroristsIndex:
+    """
+    Разобранный перечень террористов и экстремистов (физические лица)
+    с индексом по ФИО. Ключи индекса - полное ФИО (и псевдонимы) и все его
+    префиксы от фамилии и имени, поэтому поиск без отчества тоже работает
+    """
+    ENTRY_RE = re.compile(
+        r'^\s*\d+\.\s*(?P<name>[^,(]+?)\*?\s*,'
+        r'\s*(?:\((?P<aliases>[^)]*)\)\s*,)?'
+        r'\s*(?:(?P<date>\d{2}\.\d{2}\.\d{4})\s*г\.р\.)?\s*,?'
+        r'\s*(?P<place>.*?)[;,\s]*$',
+        re.S
+    )
+
+    def __init__(self, records, version=None):
+        self.version = version
+        self.records = records
+        self.by_name = {}
+        for record in records:
+            for name in record.names:
+                words = name.split()
+                for length in range(2, len(words) + 1):
+                    self.by_name.setdefault(' '.join(words[:length]), []).append(record)
+
+    @classmethod
+    def parse_entry(cls, entry: str) -> TerroristRecord:
+        match = cls.ENTRY_RE.match(entry)
+        if not match:
+            return None
+        names = [normalize_name(match.group('name'))]
+        if match.group('aliases'):
+            names.extend(
+                normalize_name(alias) for alias in match.group('aliases').split(';')
+                if alias.strip()
+            )
+        return TerroristRecord(
+            names=tuple(names),
+            date_of_birth=match.group('date') or '',
+            place_of_birth=normalize_name(match.group('place')),
+        )
+
+    @classmethod
+    def from_entries(cls, entries, version=None) -> 'TerroristsIndex':
+        records = []
+        for entry in entries:
+            record = cls.parse_entry(entry)
+            if record is None:
+                # не разобранная запись ищется по полному тексту
+                text = normalize_name(re.sub(r'^\s*\d+\.\s*', '', entry))
+                record = TerroristRecord(names=(text,), date_of_birth='',
+                                         place_of_birth=text)
+            records.append(record)
+        return cls(records, version=version)
+
+    def find(self, last_name, first_name, middle_name):
+        name = normalize_name(' '.join([
+            last_name or '', first_name or '', middle_name or ''
+        ]))
+        return self.by_name.get(name, [])
+
+    def check(self, last_name, first_name, middle_name, date_of_birth,
+              place_of_birth) -> int:
+        """ Возвращает индекс ответа в ANSWERS """
+        date_of_birth = normalize_date(date_of_birth)
+        place_of_birth = normalize_name(place_of_birth)
+        answer = 0
+        for record in self.find(last_name, first_name, middle_name):
+            if date_of_birth and date_of_birth == record.date_of_birth:
+                if place_of_birth in record.place_of_birth:
+                    return 3
+                answer = max(answer, 2)
+            else:
+                answer = max(answer, 1)
+        return answer
+
+
 class CheckInTerroristsList:
     RESULT_NOT_FOUND = 'NOT_FOUND'
     RESULT_FOUND_ONLY_FIO = 'FOUND_ONLY_FIO'
@@ -28,74 +130,93 @@ class CheckInTerroristsList:
         (RESULT_FOUND, 'Найден в реестре'),
     )
 
-    def get_terror_fl_list(self):
-        terror_list_fl = []
-
-        if cache.get('terror_list_fl') is None:
-            response = requests.get(URL_TERROR)
-            if response.status_code != 200:
-                raise NotAvailableExternalResource
+    CACHE_KEY = 'terror_list_fl_index'
+    VERSION_CACHE_KEY = 'terror_list_fl_version'
 
-            tree = html.fromstring(response.content)
-            for element in tree.xpath(r'//*[@id="russianFL"]/div/ol/li'):
-                terror_list_fl.append(element.text_content())
-            cache.set('terror_list_fl', terror_list_fl)
+    # разобранный индекс текущего процесса
+    _index = None
+    _lock = threading.Lock()
 
-        terror_list_fl = cache.get('terror_list_fl')
-        return terror_list_fl
+    @staticmethod
+    def download_terror_fl_list():
+        response = requests.get(URL_TERROR)
+        if response.status_code != 200:
+            raise NotAvailableExternalResource
+        tree = html.fromstring(response.content)
+        entries = [
+            element.text_content()
+            for element in tree.xpath(r'//*[@id="russianFL"]/div/ol/li')
+        ]
+        return entries, hashlib.md5(response.content).hexdigest()
+
+    @classmethod
+    def get_index(cls) -> TerroristsIndex:
+        """
+        Индекс строится один раз при загрузке перечня и хранится в кеше
+        вместе с версией; процессы перестраивают свой индекс при смене версии
+        """
+        version = cache.get(cls.VERSION_CACHE_KEY)
+        index = cls._index
+        if index is not None and version is not None and index.version == version:
+            return index
+
+        with cls._lock:
+            data = cache.get(cls.CACHE_KEY)
+            if data is None or data['version'] != version:
+                entries, version = cls.download_terror_fl_list()
+                index = TerroristsIndex.from_entries(entries, version=version)
+                cache.set(cls.CACHE_KEY, {
+                    'version': version, 'records': index.records
+                })
+                cache.set(cls.VERSION_CACHE_KEY, version)
+            else:
+                index = TerroristsIndex(data['records'], version=data['version'])
+            cls._index = index
+        return index
 
     def check(self, last_name: str, first_name: str, middle_name: str,
               date_of_birth: str, place_of_birth: str) -> str:
-
-        terror_list_fl = self.get_terror_fl_list()
-
-        first_name = ' '.join([last_name, first_name, middle_name])
-        first_name = first_name.upper()
-
-        place_of_birth = place_of_birth.upper() if place_of_birth else place_of_birth
-
-        answers = set()
-        for element in terror_list_fl:
-            if first_name in element:
-                if date_of_birth in element:
-                    if place_of_birth in element:
-                        answers.add(3)
-                    else:
-                        answers.add(2)
-                else:
-                    answers.add(1)
-            else:
-                answers.add(0)
-        return self.RESULT_CHOICES[max(answers)][0]
+        answer = self.get_index().check(
+            last_name, first_name, middle_name, date_of_birth, place_of_birth
+        )
+        return self.RESULT_CHOICES[answer][0]
+
+    def check_many(self, persons) -> list:
+        """
+        Проверка нескольких лиц за один вызов,
+        persons - список словарей с аргументами check
+        """
+        index = self.get_index()
+        return [
+            self.RESULT_CHOICES[index.check(**person)][0] for person in persons
+        ]
+
+    def check_profile(self, profile) -> dict:
+        """
+        Проверка руководителя и всех участников анкеты,
+        возвращает {id лица: результат}
+        """
+        persons = {}
+        general_director = profile.general_director
+        if general_director:
+            persons[general_director.id] = general_director
+        for person in profile.profilepartnerindividual_set.all():
+            persons[person.id] = person
+
+        results = self.check_many([{
+            'last_name': person.last_name,
+            'first_name': person.first_name,
+            'middle_name': person.middle_name,
+            'date_of_birth': person.passport.date_of_birth if person.passport else '',
+            'place_of_birth': person.passport.place_of_birth if person.passport else '',
+        } for person in persons.values()])
+        return dict(zip(persons.keys(), results))
 
 
 def check_terror_fl(surname, name, middle_name, date_of_birth, place_of_birth):
-    set_answer = set()
-
-    terror_list_fl = []
-
-    if cache.get('terror_list_fl') is None:
-        response = requests.get(URL_TERROR)
-        if response.status_code != 200:
-            return 'SERVER IS NOT AVAILABLE'
-        tree = html.fromstring(response.content)
-        for element in tree.xpath(r'//*[@id="russianFL"]/div/ol/li'):
-            terror_list_fl.append(element.text_content())
-        cache.set('terror_list_fl', terror_list_fl)
-    else:
-        terror_list_fl = cache.get('terror_list_fl')
-    name = surname + ' ' + name + ' ' + middle_name
-    name = name.upper()
-    place_of_birth = place_of_birth.upper()
-    for element in terror_list_fl:
-        if name in element:
-            if date_of_birth in element:
-                if place_of_birth in element:
-                    set_answer.add(3)
-                else:
-                    set_answer.add(2)
-            else:
-                set_answer.add(1)
-        else:
-            set_answer.add(0)
-    return ANSWERS[max(set_answer)]
+    try:
+        return CheckInTerroristsList().check(
+            surname, name, middle_name, date_of_birth, place_of_birth
+        )
+    except NotAvailableExternalResource:
+        return 'SERVER IS NOT AVAILABLE'
@@ -0,0 +1,98 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from clients.models import Client
+from permissions.logic.bank_guarantee import GetUserAllowedRequests
+from permissions.logic.tender_loans import GetUserAllowedLoanRequests
+from users.models import Role
+
+
+class AccessScope:
+    """
+    Заранее посчитанная область доступа пользователя с одной ролью:
+    супер-агенту доступны все заявки, менеджеру - заявки клиентов, где он
+    указан менеджером (Client.manager, как в AgentManager.manager_has_client),
+    id клиентов хранятся в кеше. Для остальных ролей и пользователей
+    с несколькими ролями фильтр строят GetUserAllowedRequests и
+    GetUserAllowedLoanRequests.
+    Область менеджера сбрасывается при смене менеджера клиента, все области -
+    при изменении ролей пользователей (см. signal_handlers)
+    """
+    VERSION_KEY = 'access_scope_version'
+    TTL = 60 * 60
+
+    @classmethod
+    def get_version(cls):
+        version = cache.get(cls.VERSION_KEY)
+        if version is None:
+            cache.add(cls.VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(cls.VERSION_KEY)
+        return version
+
+    @classmethod
+    def get_key(cls, user_id):
+        return 'access_scope:%s:%s' % (cls.get_version(), user_id)
+
+    @classmethod
+    def invalidate(cls):
+        cache.set(cls.VERSION_KEY, uuid.uuid4().hex, None)
+
+    @classmethod
+    def invalidate_user(cls, user_id):
+        if user_id:
+            cache.delete(cls.get_key(user_id))
+
+    @classmethod
+    def on_managers_changed(cls, user_ids):
+        """ Сброс областей менеджеров после фиксации смены менеджера клиентов """
+        user_ids = set(user_ids)
+
+        def invalidate():
+            for user_id in user_ids:
+                cls.invalidate_user(user_id)
+        transaction.on_commit(invalidate)
+
+    @staticmethod
+    def load(user):
+        """ {'all': True}, {'client_ids': [...]} или None - область не хранится """
+        roles = list(user.roles.values_list('name', flat=True))
+        if len(roles) != 1:
+            return None
+        if roles[0] == Role.SUPER_AGENT:
+            return {'all': True}
+        if roles[0] == Role.MANAGER:
+            return {'client_ids': sorted(Client.objects.filter(
+                manager_id=user.id
+            ).values_list('id', flat=True))}
+        return None
+
+    @classmethod
+    def get(cls, user):
+        key = cls.get_key(user.id)
+        cached = cache.get(key)
+        if cached is None:
+            cached = {'scope': cls.load(user)}
+            cache.set(key, cached, cls.TTL)
+        return cached['scope']
+
+    @staticmethod
+    def apply(scope, requests):
+        if scope.get('all'):
+            return requests
+        return requests.filter(client_id__in=scope['client_ids'])
+
+    @classmethod
+    def filter_requests(cls, user, requests):
+        scope = cls.get(user)
+        if scope is None:
+            return GetUserAllowedRequests().execute(user, requests=requests)
+        return cls.apply(scope, requests)
+
+    @classmethod
+    def filter_loan_requests(cls, user, requests):
+        scope = cls.get(user)
+        if scope is None:
+            return GetUserAllowedLoanRequests().execute(user, requests=requests)
+        return cls.apply(scope, requests)
@@ -1,11 +1,19 @@
-def check_in_regions(inn, regions, kpp=None) -> bool:
-    inns = [str(inn)[:2], str(inn)[:3]]
+def region_codes(inn, kpp=None) -> set:
+    """ Коды региона (2 и 3 знака) из ИНН и КПП """
+    codes = {str(inn)[:2], str(inn)[:3]}
     if kpp:
-        inns.append(str(kpp)[:2])
-        inns.append(str(kpp)[:3])
-    find = False
-    for inn in inns:
-        if inn in regions:
-            find = True
-            break
-    return find
+        codes.update([str(kpp)[:2], str(kpp)[:3]])
+    return codes
+
+
+def check_in_regions(inn, regions, kpp=None) -> bool:
+    return not region_codes(inn, kpp).isdisjoint(regions)
+
+
+def find_in_regions(companies, regions) -> list:
+    """
+    Проверка нескольких компаний за один вызов,
+    companies - список пар (ИНН, КПП), возвращает список bool
+    """
+    regions = frozenset(regions)
+    return [check_in_regions(inn, regions, kpp) for inn, kpp in companies]
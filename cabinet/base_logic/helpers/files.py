@@ -0,0 +1,30 @@
+# связи BaseFile, которые принадлежат самому файлу (подписи) и не считаются ссылками
+OWNED_RELATIONS = ['sign', 'separatedsignature']
+
+
+def get_file_references(base_file) -> int:
+    """
+    Количество ссылок на файл из документов (заявок, предложений, клиентов,
+    сообщений). Один BaseFile может использоваться несколькими заявками
+    (печатные формы при отправке в несколько банков).
+    Считается одним запросом UNION ALL по всем связям
+    """
+    querysets = [
+        relation.related_model._base_manager.filter(
+            **{relation.field.name: base_file}
+        ).values_list('pk', flat=True)
+        for relation in base_file._meta.related_objects
+        if not relation.many_to_many and
+        relation.related_model._meta.model_name not in OWNED_RELATIONS
+    ]
+    if not querysets:
+        return 0
+    return querysets[0].union(*querysets[1:], all=True).count()
+
+
+def delete_file_if_unused(base_file) -> bool:
+    """ Удаление файла, если на него больше не ссылается ни один документ """
+    if get_file_references(base_file) == 0:
+        base_file.delete()
+        return True
+    return False
@@ -0,0 +1,86 @@
+import base64
+import hashlib
+
+import dateutil.parser
+import ujson
+from django.core.cache import cache
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class InvalidLimit(ValueError):
+    pass
+
+
+def get_limit(value, default=50, maximum=200) -> int:
+    """ Размер страницы из параметра limit, приводится к 1..maximum """
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (ValueError, TypeError):
+        raise InvalidLimit('Некорректный limit %s' % value)
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(status_changed_date, pk) -> str:
+    """ Курсор - позиция последней заявки страницы (status_changed_date, id) """
+    data = ujson.dumps([status_changed_date.isoformat(), pk])
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor) -> tuple:
+    try:
+        status_changed_date, pk = ujson.loads(
+            base64.urlsafe_b64decode(cursor.encode()).decode()
+        )
+        return dateutil.parser.parse(status_changed_date), int(pk)
+    except (ValueError, TypeError, AttributeError):
+        raise InvalidCursor('Некорректный курсор %s' % cursor)
+
+
+def after_cursor(queryset, cursor):
+    """
+    Заявки после курсора при сортировке по (-status_changed_date, -id).
+    Применяется к каждой части UNION до объединения
+    """
+    if not cursor:
+        return queryset
+    status_changed_date, pk = decode_cursor(cursor)
+    return queryset.filter(
+        Q(status_changed_date__lt=status_changed_date) |
+        Q(status_changed_date=status_changed_date, id__lt=pk)
+    )
+
+
+def get_page(rows, limit) -> tuple:
+    """
+    Страница и курсор следующей страницы по limit + 1 выбранным строкам,
+    курсор None - страница последняя
+    """
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]['status_changed_date'], rows[-1]['id'])
+
+
+def get_signature(*parts) -> str:
+    return hashlib.md5(ujson.dumps(parts).encode()).hexdigest()
+
+
+def get_cached_counts(signature, load, timeout=60) -> dict:
+    """
+    Итоги списка по сигнатуре фильтра (пользователь, архив, filter).
+    Считаются не чаще раза в timeout секунд, на экране допустимо
+    небольшое отставание от реального количества
+    """
+    key = 'requests_counts:%s' % signature
+    counts = cache.get(key)
+    if counts is None:
+        counts = load()
+        cache.set(key, counts, timeout)
+    return counts
@@ -0,0 +1,297 @@
+import atexit
+import logging
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('django')
+
+
+class PdfConversionError(Exception):
+    pass
+
+
+def get_free_port():
+    """ Свободный локальный порт, выделенный ОС """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def stop_process_group(process, timeout=5):
+    """ Остановка процесса вместе с дочерними (unoserver запускает soffice) """
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            break
+        try:
+            process.wait(timeout=timeout)
+            break
+        except subprocess.TimeoutExpired:
+            continue
+    process.wait()
+
+
+class ConverterWorker:
+    """
+    Конвертер с собственным профилем LibreOffice.
+    Если доступен unoserver, держит его запущенным и конвертирует
+    через unoconvert без повторного запуска офиса, иначе каждый вызов -
+    soffice --convert-to в своем профиле (одновременные вызовы не мешают
+    друг другу).
+    Порты unoserver (XML-RPC и uno) выделяются ОС при запуске, поэтому
+    конвертеры разных процессов не пересекаются
+    """
+    HOST = '127.0.0.1'
+
+    def __init__(self, number, path_soffice, path_unoserver=None,
+                 path_unoconvert=None, port=None, uno_port=None,
+                 start_timeout=30):
+        self.number = number
+        self.path_soffice = path_soffice
+        self.path_unoserver = path_unoserver
+        self.path_unoconvert = path_unoconvert
+        self.port = port
+        self.uno_port = uno_port
+        self.start_timeout = start_timeout
+        # процесс-владелец: после fork конвертеры родителя не используются
+        self.pid = os.getpid()
+        self.profile_dir = os.path.join(
+            tempfile.gettempdir(), 'pdf_converter_%s_%s' % (self.pid, number)
+        )
+        self.process = None
+
+    @property
+    def profile_url(self):
+        return 'file://%s' % self.profile_dir
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def get_server_command(self):
+        return [
+            self.path_unoserver,
+            '--executable', self.path_soffice,
+            '--interface', self.HOST,
+            '--port', str(self.port),
+            '--uno-port', str(self.uno_port),
+            '--user-installation', self.profile_url,
+        ]
+
+    def is_ready(self):
+        try:
+            with socket.create_connection((self.HOST, self.port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def wait_ready(self):
+        """
+        Ожидание запуска unoserver: XML-RPC порт открывается после того,
+        как unoserver подключился к офису
+        """
+        deadline = time.monotonic() + self.start_timeout
+        while time.monotonic() < deadline:
+            if not self.is_alive():
+                break
+            if self.is_ready():
+                return
+            time.sleep(0.2)
+        port = self.port
+        self.stop()
+        raise PdfConversionError('Не удалось запустить unoserver на порту %s' % port)
+
+    def start(self):
+        if not self.path_unoserver or self.is_alive():
+            return
+        self.port = self.port or get_free_port()
+        self.uno_port = self.uno_port or get_free_port()
+        # своя группа процессов: при остановке завершается и soffice
+        self.process = subprocess.Popen(
+            self.get_server_command(),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        self.wait_ready()
+
+    def stop(self):
+        if self.process is not None:
+            stop_process_group(self.process)
+            self.process = None
+            # порты могли занять, при перезапуске выделяются новые
+            self.port = None
+            self.uno_port = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def close(self):
+        """ Остановка unoserver и удаление профиля офиса """
+        self.stop()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def get_command(self, path, output_dir):
+        if self.path_unoserver:
+            output_path = os.path.join(output_dir, '%s.pdf' % os.path.splitext(
+                os.path.basename(path)
+            )[0])
+            return [
+                self.path_unoconvert, '--host', self.HOST, '--port', str(self.port),
+                '--convert-to', 'pdf', path, output_path,
+            ]
+        return [
+            self.path_soffice, '--headless', '--norestore',
+            '-env:UserInstallation=%s' % self.profile_url,
+            '--convert-to', 'pdf', '--outdir', output_dir, path,
+        ]
+
+    def convert(self, path, output_dir, timeout):
+        self.start()
+        try:
+            subprocess.run(
+                self.get_command(path, output_dir), timeout=timeout, check=True,
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+        except subprocess.TimeoutExpired:
+            self.restart()
+            raise PdfConversionError('Превышено время конвертации %s' % path)
+        except subprocess.CalledProcessError as error:
+            if self.path_unoserver and not self.is_alive():
+                self.restart()
+            raise PdfConversionError('Ошибка конвертации %s: %s' % (
+                path, error.stderr.decode(errors='ignore')
+            ))
+
+
+class PdfConverter:
+    """
+    Пул конвертеров DOCX/XLSX -> PDF на процесс. Задачи ждут свободный
+    конвертер в очереди, каждая конвертация пишет в свой временный каталог,
+    упавший или зависший конвертер перезапускается.
+    Настройки: PATH_SOFFICE, PATH_UNOSERVER, PATH_UNOCONVERT,
+    PDF_CONVERTER_WORKERS, PDF_CONVERTER_TIMEOUT. Без PATH_UNOSERVER
+    используется unoserver, установленный в системе (pip install unoserver).
+    Запущенные unoserver останавливаются при завершении процесса
+    """
+    _workers = None
+    _all_workers = []
+    _lock = threading.Lock()
+
+    @classmethod
+    def is_available(cls):
+        return bool(os.environ.get('PATH_SOFFICE'))
+
+    @classmethod
+    def get_size(cls):
+        return int(os.environ.get('PDF_CONVERTER_WORKERS', 2))
+
+    @classmethod
+    def get_timeout(cls):
+        return int(os.environ.get('PDF_CONVERTER_TIMEOUT', 120))
+
+    @classmethod
+    def get_unoserver(cls):
+        return os.environ.get('PATH_UNOSERVER') or shutil.which('unoserver')
+
+    @classmethod
+    def get_unoconvert(cls):
+        return (
+            os.environ.get('PATH_UNOCONVERT') or shutil.which('unoconvert') or
+            'unoconvert'
+        )
+
+    @classmethod
+    def is_owner(cls):
+        return bool(cls._all_workers) and cls._all_workers[0].pid == os.getpid()
+
+    @classmethod
+    def get_workers(cls) -> queue.Queue:
+        if cls._workers is None or not cls.is_owner():
+            with cls._lock:
+                if cls._workers is None or not cls.is_owner():
+                    cls._all_workers = []
+                    workers = queue.Queue()
+                    path_unoserver = cls.get_unoserver()
+                    if not path_unoserver:
+                        logger.warning(
+                            'unoserver не найден, каждая конвертация в PDF '
+                            'запускает soffice'
+                        )
+                    for number in range(cls.get_size()):
+                        worker = ConverterWorker(
+                            number,
+                            path_soffice=os.environ.get('PATH_SOFFICE'),
+                            path_unoserver=path_unoserver,
+                            path_unoconvert=cls.get_unoconvert(),
+                        )
+                        cls._all_workers.append(worker)
+                        workers.put(worker)
+                    cls._workers = workers
+        return cls._workers
+
+    @classmethod
+    def shutdown(cls):
+        """ Остановка всех конвертеров пула, в том числе занятых """
+        with cls._lock:
+            workers, cls._all_workers = cls._all_workers, []
+            cls._workers = None
+        for worker in workers:
+            if worker.pid == os.getpid():
+                worker.close()
+
+    @classmethod
+    def convert(cls, path, output_dir=None) -> str:
+        """
+        Конвертация файла в PDF, возвращает путь к PDF в output_dir
+        (по умолчанию рядом с исходным файлом)
+        """
+        if not cls.is_available():
+            raise PdfConversionError('Не установлен soffice')
+        output_dir = output_dir or os.path.dirname(path)
+        timeout = cls.get_timeout()
+        workers = cls.get_workers()
+        try:
+            worker = workers.get(timeout=timeout)
+        except queue.Empty:
+            raise PdfConversionError('Нет свободного конвертера')
+        job_dir = tempfile.mkdtemp(prefix='pdf_job_')
+        try:
+            worker.convert(path, job_dir, timeout)
+            name = '%s.pdf' % os.path.splitext(os.path.basename(path))[0]
+            if not os.path.exists(os.path.join(job_dir, name)):
+                raise PdfConversionError('Конвертер не создал файл %s' % name)
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = os.path.join(output_dir, name)
+            shutil.move(os.path.join(job_dir, name), output_path)
+            return output_path
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            workers.put(worker)
+
+    @classmethod
+    def convert_many(cls, paths, output_dir=None) -> list:
+        """
+        Конвертация нескольких файлов всеми конвертерами пула,
+        возвращает пути к PDF (None для файлов с ошибкой) в порядке paths
+        """
+        def convert(path):
+            try:
+                return cls.convert(path, output_dir)
+            except PdfConversionError as error:
+                logger.error(error)
+                return None
+
+        with ThreadPoolExecutor(max_workers=cls.get_size()) as executor:
+            return list(executor.map(convert, paths))
+
+
+atexit.register(PdfConverter.shutdown)
@@ -0,0 +1,37 @@
+from collections import defaultdict
+
+# поля, которые сравниваются перед сохранением: {модель: поля}
+TRACKED_FIELDS = defaultdict(set)
+
+
+def track_fields(model, fields):
+    """ Регистрация полей модели, изменения которых проверяются в pre_save """
+    TRACKED_FIELDS[model._meta.label].update(fields)
+
+
+def get_previous(instance):
+    """
+    Сохраненные значения отслеживаемых полей объекта (None - объект новый).
+    Читаются одним запросом на сохранение и запоминаются в объекте для всех
+    проверок pre_save, сбрасываются в post_save (forget_previous)
+    """
+    if not instance.pk:
+        return None
+    if '_previous_row' not in instance.__dict__:
+        fields = TRACKED_FIELDS[instance._meta.label]
+        instance._previous_row = instance.__class__._base_manager.filter(
+            pk=instance.pk
+        ).values(*fields).first()
+    return instance._previous_row
+
+
+def forget_previous(instance):
+    instance.__dict__.pop('_previous_row', None)
+
+
+def is_changed(instance, fields) -> bool:
+    """ Изменилось ли хотя бы одно из полей fields, новый объект - изменен """
+    previous = get_previous(instance)
+    return previous is None or any(
+        previous[field] != getattr(instance, field) for field in fields
+    )
@@ -0,0 +1,100 @@
+import datetime
+from collections import Iterable
+
+import dateutil
+import ujson
+
+from cabinet.base_logic.search.index import SearchIndex
+from cabinet.models import SearchDocument
+from clients.models import AgentManager
+
+
+def filter_requests(params, queryset):
+    """
+    Фильтр списка заявок (БГ или кредитов) по параметру filter (JSON):
+    номер, клиент, поиск, банк, сумма, даты, закупка, статус, агент, менеджер
+    """
+    filter_value = ujson.loads(params['filter'])
+    if filter_value:
+        if filter_value.get('request_number'):
+            queryset = queryset.filter(
+                request_number__icontains=filter_value['request_number']
+            )
+
+        if filter_value.get('client'):
+            queryset = queryset.filter(client_id__in=SearchIndex.search(
+                SearchDocument.TYPE_CLIENT, filter_value['client']
+            ))
+
+        if filter_value.get('search'):
+            queryset = SearchIndex.filter(queryset, filter_value['search'])
+
+        if filter_value.get('bank'):
+            if isinstance(filter_value['bank'], str):
+                filter_value['bank'] = [int(filter_value['bank'])]
+            elif not isinstance(filter_value['bank'], Iterable):
+                filter_value['bank'] = [filter_value['bank']]
+            queryset = queryset.filter(bank__id__in=filter_value['bank'])
+
+        if filter_value.get('required_amount_from'):
+            queryset = queryset.filter(
+                required_amount__gte=filter_value['required_amount_from']
+            )
+
+        if filter_value.get('required_amount_to'):
+            queryset = queryset.filter(
+                required_amount__lte=filter_value['required_amount_to']
+            )
+
+        if filter_value.get('created_date_from'):
+            date_from = dateutil.parser.parse(
+                filter_value['created_date_from'])
+            queryset = queryset.filter(
+                created_date__gte=datetime.datetime(
+                    year=date_from.year,
+                    month=date_from.month,
+                    day=date_from.day,
+                    hour=0,
+                    minute=0
+                )
+            )
+
+        if filter_value.get('created_date_to'):
+            date_to = dateutil.parser.parse(filter_value['created_date_to'])
+            queryset = queryset.filter(
+                created_date__lte=datetime.datetime(
+                    year=date_to.year,
+                    month=date_to.month,
+                    day=date_to.day,
+                    hour=23,
+                    minute=59
+                )
+            )
+        if filter_value.get('tender'):
+            queryset = queryset.filter(
+                tender__notification_id__icontains=filter_value['tender']
+            )
+
+        if filter_value.get('status'):
+            statuses = filter_value.get('status', [])
+            if isinstance(statuses, str):
+                statuses = [statuses]
+            queryset = queryset.filter(status__code__in=statuses)
+
+        if filter_value.get('agent'):
+            if isinstance(filter_value['agent'], str):
+                filter_value['agent'] = [int(filter_value['agent'])]
+            elif not isinstance(filter_value['agent'], Iterable):
+                filter_value['agent'] = [filter_value['agent']]
+            queryset = queryset.filter(agent_id__in=filter_value['agent'])
+
+        if filter_value.get('manager'):
+            if isinstance(filter_value['manager'], str):
+                filter_value['manager'] = [int(filter_value['manager'])]
+            elif not isinstance(filter_value['manager'], list):
+                filter_value['manager'] = [filter_value['manager']]
+            agents = AgentManager.objects.filter(
+                manager_id__in=filter_value['manager']
+            ).values_list('agent_id', flat=True)
+            queryset = queryset.filter(agent_id__in=agents)
+    return queryset
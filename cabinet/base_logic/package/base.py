@@ -1,7 +1,11 @@
+import hashlib
 import json
 import logging
+import threading
+import uuid
 from typing import List
 
+from django.core.cache import cache
 from django.utils.module_loading import import_string
 
 from clients.models import Bank, BankSettings, MFOSettings, BankCode, MFO
@@ -11,12 +15,38 @@ from utils.helpers import clone_base_file
 logger = logging.getLogger('django')
 
 
+def get_attribute(obj, path):
+    """ Значение по пути атрибутов 'client.profile.tax_system' """
+    for name in path.split('.'):
+        if obj is None:
+            return None
+        obj = getattr(obj, name, None)
+    return obj
+
+
 class ValidateBlock:
+    # пути атрибутов заявки, от которых зависит результат блока;
+    # None - зависимостью считается сам результат validate
+    depends_on = None
 
     def __init__(self, class_name, params):
         self.class_name = class_name
         self.params = params
 
+    @classmethod
+    def compile(cls, class_name, params):
+        """ Экземпляр класса блока, None - класс не найден """
+        package_class = cls.get_class(class_name)
+        if package_class:
+            return package_class(class_name, params)
+        return None
+
+    def get_dependencies(self, request):
+        """ Данные заявки, от которых зависит результат блока """
+        if self.depends_on is None:
+            return self.validate(request, None)
+        return [str(get_attribute(request, path)) for path in self.depends_on]
+
     @staticmethod
     def get_class(class_name):
         try:
@@ -65,7 +95,113 @@ class ConditionalBlock:
         return True
 
 
+class CompiledConditionalBlock:
+    """
+    Дерево условий документа пакета, разобранное один раз:
+    классы блоков импортированы, экземпляры созданы
+    """
+
+    def __init__(self, operator, blocks):
+        self.operator = operator
+        self.blocks = []
+        for block in blocks or []:
+            if block.get('operator'):
+                self.blocks.append(CompiledConditionalBlock(
+                    block.get('operator'), block.get('blocks')
+                ))
+            else:
+                self.blocks.append(ValidateBlock.compile(
+                    block.get('class'), block.get('params')
+                ))
+
+    @classmethod
+    def from_json(cls, conditionals):
+        conditionals = json.loads(conditionals)
+        return cls(conditionals.get('operator'), conditionals.get('blocks'))
+
+    def validate(self, request, bank):
+        results = [
+            block.validate(request, bank) if block is not None else False
+            for block in self.blocks
+        ]
+        if self.operator == 'AND':
+            return all(results + [True])
+        if self.operator == 'OR':
+            return any(results)
+        return True
+
+    def get_dependencies(self, request):
+        return [
+            block.get_dependencies(request) if block is not None else None
+            for block in self.blocks
+        ]
+
+
+class PackageCache:
+    """
+    Разобранные условия пакетов документов и банк/МФО, по пакету которого
+    строится пакет заявки, в памяти процесса. Перечитываются при смене версии
+    в общем кеше (меняется при изменении пакетов, настроек банков и System,
+    см. cabinet.signal_handlers)
+    """
+    VERSION_KEY = 'package_conditionals_version'
+
+    _packages = {}
+    _relevant = {}
+    _version = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_version(cls):
+        version = cache.get(cls.VERSION_KEY)
+        if version is None:
+            cache.add(cls.VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(cls.VERSION_KEY)
+        return version
+
+    @classmethod
+    def check_version(cls):
+        version = cls.get_version()
+        if cls._version != version:
+            with cls._lock:
+                cls._packages = {}
+                cls._relevant = {}
+                cls._version = version
+        return version
+
+    @classmethod
+    def get_package(cls, credit_organization) -> list:
+        """ [(id типа документа, CompiledConditionalBlock)] обязательных документов """
+        cls.check_version()
+        key = (credit_organization._meta.label, credit_organization.id)
+        if key not in cls._packages:
+            cls._packages[key] = [
+                (document.document_type_id,
+                 CompiledConditionalBlock.from_json(document.conditionals))
+                for document in credit_organization.package.filter(
+                    active=True, required=True
+                )
+            ]
+        return cls._packages[key]
+
+    @classmethod
+    def get_relevant(cls, name, load):
+        cls.check_version()
+        if name not in cls._relevant:
+            cls._relevant[name] = load()
+        return cls._relevant[name]
+
+    @classmethod
+    def invalidate(cls):
+        cache.set(cls.VERSION_KEY, uuid.uuid4().hex, None)
+        with cls._lock:
+            cls._packages = {}
+            cls._relevant = {}
+
+
 class PackageLogic:
+    FINGERPRINT_KEY = 'request_package_%s_%s'
+    FINGERPRINT_TTL = 7 * 24 * 60 * 60
 
     def __init__(self, request, bank: Bank):
         self.request = request
@@ -73,21 +209,29 @@ class PackageLogic:
 
     def collect_required_document_categories(self) -> List[str]:
         categories_ids = []
-        bank_documents = self.bank.package.filter(active=True, required=True)
-        for bank_document in bank_documents:
-            conditionals = json.loads(bank_document.conditionals)
-            c = ConditionalBlock(
-                conditionals.get('operator'),
-                conditionals.get('blocks')
-            )
-            if not c.validate(self.request, self.bank):
+        for document_type_id, block in PackageCache.get_package(self.bank):
+            if not block.validate(self.request, self.bank):
                 continue
 
-            categories_ids.append(str(bank_document.document_type_id))
+            categories_ids.append(str(document_type_id))
         return list(set(categories_ids))
 
+    def get_fingerprint(self) -> str:
+        """ Хеш данных заявки, от которых зависят условия пакета банка """
+        dependencies = [
+            (document_type_id, block.get_dependencies(self.request))
+            for document_type_id, block in PackageCache.get_package(self.bank)
+        ]
+        return hashlib.md5(json.dumps(
+            [PackageCache.get_version(), self.bank.code, dependencies], default=str
+        ).encode()).hexdigest()
+
     @classmethod
     def get_first_relevant_bank(cls, request):
+        return PackageCache.get_relevant('bank', cls._load_first_relevant_bank)
+
+    @classmethod
+    def _load_first_relevant_bank(cls):
         from cabinet.models import System
         if not TESTING and System.objects.first().one_package_documents:
             return Bank.objects.get(code=BankCode.CODE_INBANK)
@@ -99,6 +243,10 @@ class PackageLogic:
 
     @classmethod
     def get_first_relevant_mfo(cls, request):
+        return PackageCache.get_relevant('mfo', cls._load_first_relevant_mfo)
+
+    @classmethod
+    def _load_first_relevant_mfo(cls):
         from cabinet.models import System
         if not TESTING and System.objects.first().one_package_documents:
             return MFO.objects.get(code='simple_finance')
@@ -123,6 +271,41 @@ class PackageLogic:
             return True
         return False
 
+    @classmethod
+    def get_fingerprint_key(cls, request):
+        return cls.FINGERPRINT_KEY % (request._meta.label, request.id)
+
+    @classmethod
+    def update_package_if_changed(cls, request):
+        """
+        Пересчет пакета перед сохранением заявки, только если изменились
+        данные, от которых зависят условия пакета (зависимости берутся
+        из блоков условий). Хеш зависимостей сохраняется в request
+        и записывается в кеш после сохранения (save_fingerprint)
+        """
+        from bank_guarantee.models import Request
+        if not cls.can_update_package(request, force=True):
+            return
+        if isinstance(request, Request):
+            bank = cls.get_first_relevant_bank(request)
+        else:
+            bank = cls.get_first_relevant_mfo(request)
+        fingerprint = None
+        if bank and request.id:
+            fingerprint = PackageLogic(request, bank).get_fingerprint()
+            if request.package_class == bank.code and \
+                    cache.get(cls.get_fingerprint_key(request)) == fingerprint:
+                return
+        cls.commit_package(request, auto_save=False)
+        request._package_fingerprint = fingerprint
+
+    @classmethod
+    def save_fingerprint(cls, request):
+        fingerprint = getattr(request, '_package_fingerprint', None)
+        if fingerprint:
+            cache.set(cls.get_fingerprint_key(request), fingerprint, cls.FINGERPRINT_TTL)
+            request._package_fingerprint = None
+
     @classmethod
     def __get_old_requests_for_fill_documents(cls, request):
         from bank_guarantee.models import Request
@@ -7,6 +7,7 @@ from external_api.clearspending_api import ClearsSpendingApi
 
 
 class OrgValidationBlock(ValidateBlock):
+    depends_on = ('client.is_organization', 'client.profile.organization_form')
     for_ip_result = True
     for_org_result = True
 
@@ -32,6 +33,7 @@ class hasBeneficiars(ValidateBlock):
 
 
 class hasContractsExperience(ValidateBlock):
+    depends_on = ('client.inn', 'client.kpp', 'experience_general_contractor')
 
     def validate(self, request, bank):
         try:
@@ -54,12 +56,14 @@ class hasContractsExperience(ValidateBlock):
 
 
 class hasLicencies(ValidateBlock):
+    depends_on = ('client.profile.has_license_sro',)
 
     def validate(self, request, bank):
         return request.client.profile.has_license_sro
 
 
 class hasPoA(ValidateBlock):
+    depends_on = ('power_of_attorney',)
 
     def validate(self, request, bank):
         return request.power_of_attorney
@@ -71,16 +75,22 @@ class isAO(OrgValidationBlock):
 
 
 class isBigDeal(ValidateBlock):
+    depends_on = ('is_big_deal',)
+
     def validate(self, request, bank):
         return request.is_big_deal
 
 
 class isENVD(ValidateBlock):
+    depends_on = ('client.profile.tax_system',)
+
     def validate(self, request, bank):
         return request.client.profile.tax_system == TaxationType.TYPE_ENVD
 
 
 class isESHN(ValidateBlock):
+    depends_on = ('client.profile.tax_system',)
+
     def validate(self, request, bank):
         return request.client.profile.tax_system == TaxationType.TYPE_ESHN
 
@@ -94,11 +104,15 @@ class isGenBuhNotGenDir(ValidateBlock):
 
 
 class isIpOrg(ValidateBlock):
+    depends_on = ('client.is_organization',)
+
     def validate(self, request, bank):
         return not request.client.is_organization
 
 
 class isUrOrg(ValidateBlock):
+    depends_on = ('client.is_organization',)
+
     def validate(self, request, bank):
         return request.client.is_organization
 
@@ -114,6 +128,8 @@ class isOOO(OrgValidationBlock):
 
 
 class isOSN(ValidateBlock):
+    depends_on = ('client.profile.tax_system',)
+
     def validate(self, request, bank):
         return request.client.profile.tax_system == TaxationType.TYPE_OSN
 
@@ -134,20 +150,28 @@ class isZAO(OrgValidationBlock):
 
 
 class isPSN(ValidateBlock):
+    depends_on = ('client.profile.tax_system',)
+
     def validate(self, request, bank):
         return request.client.profile.tax_system == TaxationType.TYPE_PSN
 
 
 class isUSN(ValidateBlock):
+    depends_on = ('client.profile.tax_system',)
+
     def validate(self, request, bank):
         return request.client.profile.tax_system == TaxationType.TYPE_USN
 
 
 class sumInRange(ValidateBlock):
+    depends_on = ('required_amount',)
+
     def validate(self, request, bank):
         return self.params[0] <= request.required_amount <= self.params[1]
 
 
 class sumNotInRange(ValidateBlock):
+    depends_on = ('required_amount',)
+
     def validate(self, request, bank):
         return not (self.params[0] <= request.required_amount <= self.params[1])
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
 from uuid import uuid4
 
+from cabinet.base_logic.helpers.pdf_converter import PdfConverter
 from settings.settings import BASE_DIR
 
 PATH_TEMP = os.path.join(BASE_DIR, 'temp')
@@ -14,6 +15,8 @@ def get_temp_path(extension):
 
 
 class BasePrintFormGenerator:
+    # отдавать печатную форму в PDF (через пул конвертеров)
+    convert_to_pdf = False
 
     def __init__(self, *args, **kwargs):
         self.template = None
@@ -27,3 +30,9 @@ class BasePrintFormGenerator:
 
     def update_data_values(self, key, value):
         self.data['values'][key] = value
+
+    def to_pdf(self, path):
+        """ PDF из сгенерированного файла, исходный файл удаляется """
+        pdf_path = PdfConverter.convert(path)
+        os.unlink(path)
+        return pdf_path
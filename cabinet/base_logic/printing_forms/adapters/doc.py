@@ -1,6 +1,8 @@
 import copy
+import io
 import logging
 import os
+import threading
 
 from django.conf import settings
 
@@ -29,22 +31,58 @@ def silent_none(value):
     return value
 
 
+class TemplateCache:
+    """
+    Содержимое DOCX шаблонов в памяти процесса, перечитывается
+    при изменении файла. DocxTemplate изменяется при рендере,
+    поэтому на каждую форму создается новый объект из кешированных байтов
+    """
+    _files = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_content(cls, path) -> bytes:
+        mtime = os.path.getmtime(path)
+        cached = cls._files.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'rb') as template_file:
+            content = template_file.read()
+        with cls._lock:
+            cls._files[path] = (mtime, content)
+        return content
+
+    @classmethod
+    def get_docx(cls, path) -> DocxTemplate:
+        return DocxTemplate(io.BytesIO(cls.get_content(path)))
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._files = {}
+
+
 class DocBasePrintFormGenerator(BasePrintFormGenerator):
+    _jinja_env = None
 
     def __init__(self):
         super(DocBasePrintFormGenerator, self).__init__()
         self.extension = '.docx'
 
-    def _get_jinja_env(self):
-        jcm = Jinja_custom_filter()
-        jinja_env = jinja2.Environment()
-        jinja_env.finalize = silent_none
-        for key, value in jcm.dict_filter.items():
-            jinja_env.filters[key] = value
-        return jinja_env
+    @classmethod
+    def _get_jinja_env(cls):
+        """ Одно окружение jinja с фильтрами на процесс """
+        if DocBasePrintFormGenerator._jinja_env is None:
+            jcm = Jinja_custom_filter()
+            jinja_env = jinja2.Environment()
+            jinja_env.finalize = silent_none
+            for key, value in jcm.dict_filter.items():
+                jinja_env.filters[key] = value
+            DocBasePrintFormGenerator._jinja_env = jinja_env
+        return DocBasePrintFormGenerator._jinja_env
 
     def _render_and_save_doc(self, path_to_save):
-        word = DocxTemplate(self.template)
+        word = TemplateCache.get_docx(self.template)
         try:
             word.render(self.data, self._get_jinja_env())
         except Exception as error:
@@ -60,6 +98,8 @@ class DocBasePrintFormGenerator(BasePrintFormGenerator):
         if self.template:
             temp_path = get_temp_path(self.extension)
             self._render_and_save_doc(temp_path)
+            if self.convert_to_pdf:
+                temp_path = self.to_pdf(temp_path)
             yield temp_path
 
 
@@ -77,6 +117,10 @@ class RequestDocBasePrintFormGenerator(RequestPrintFormMixin, DocBasePrintFormGe
             ))
 
 
+class RequestDocPdfPrintFormGenerator(RequestDocBasePrintFormGenerator):
+    convert_to_pdf = True
+
+
 class MetallInvestProfilePrintForm(RequestDocBasePrintFormGenerator):
 
     def __init__(self, request, print_form):
@@ -256,7 +300,7 @@ class SFAssigmentPrintForm(RequestDocBasePrintFormGenerator):
     def _render_and_save_doc(self, path_to_save, data=None):
         if not data:
             data = self.data
-        word = DocxTemplate(self.template)
+        word = TemplateCache.get_docx(self.template)
         try:
             word.render(data, self._get_jinja_env())
         except (UndefinedError, TemplateSyntaxError) as error:
@@ -6,6 +6,17 @@ from common.helpers import get_month_text
 class RequestPrintFormMixin:
 
     def _get_context(self, request):
+        """
+        Контекст печатной формы. При пакетной генерации контекст заявки
+        строится один раз (см. RequestPrintFormGenerator.generate_print_forms),
+        каждая форма получает свою копию values
+        """
+        shared_context = getattr(request, '_print_form_context', None)
+        if shared_context is not None:
+            return dict(shared_context, values=dict(shared_context['values']))
+        return self._build_context(request)
+
+    def _build_context(self, request):
         now = timezone.now()
         profile = request.client.profile
         context = {
@@ -1,6 +1,7 @@
 class PrintForm:
     TYPE_HTML = 'html'
     TYPE_DOC = 'doc'
+    TYPE_DOC_PDF = 'doc_pdf'
     TYPE_SF_AGREEMENT = 'sf_agreement'
     TYPE_SGB_EXCEL = 'sgb_excel'
     TYPE_INBANK_BG = 'inbank_bg'
@@ -42,6 +43,10 @@ class PrintForm:
          'cabinet.base_logic.printing_forms.adapters.doc.'
          'RequestDocBasePrintFormGenerator'
          ),
+        (TYPE_DOC_PDF,
+         'cabinet.base_logic.printing_forms.adapters.doc.'
+         'RequestDocPdfPrintFormGenerator'
+         ),
         (TYPE_HTML,
          'cabinet.base_logic.printing_forms.adapters.html.HTMLPrintFormGenerator'),
         (TYPE_SF_AGREEMENT,
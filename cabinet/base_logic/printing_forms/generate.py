@@ -1,10 +1,13 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
 from django.core.files import File
+from django.db import connections
 from django.utils.module_loading import import_string
 
 from bank_guarantee.models import RequestPrintForm, Request, BankOfferDocumentCategory
+from cabinet.base_logic.printing_forms.adapters.mixins import RequestPrintFormMixin
 from cabinet.base_logic.printing_forms.base import PrintForm
 from files.models import BaseFile
 from tender_loans.models import LoanPrintForm
@@ -47,44 +50,92 @@ class RequestPrintFormGenerator:
             return '%s.%s' % (download_name, extension)
         return ''
 
-    def generate_print_form(self, request: Request, print_form):
+    def render_print_form(self, request: Request, print_form):
+        """ Генерация файла печатной формы, возвращает путь к временному файлу """
         adapter = self.adapters.get(print_form.type, None)
         if adapter:
-
             adapter = adapter(request=request, print_form=print_form)
-            request.requestdocument_set.filter(print_form=print_form).delete()
-            files = adapter.generate()
-            for temp_path in files:
-                filename = os.path.basename(temp_path)
-
-                file = BaseFile.objects.create(
-                    author=request.client,
-                    download_name=self.generate_print_form_download_name(
-                        file_name=filename,
-                        request=request,
-                        print_form=print_form
-                    )
-                )
-                file.file.save(
-                    os.path.join(self.path_for_save, filename),
-                    open(temp_path, 'rb'),
-                    save=True
-                )
+            return next(iter(adapter.generate()), None)
+        return None
+
+    def save_print_form(self, request: Request, print_form, temp_path):
+        request.requestdocument_set.filter(print_form=print_form).delete()
+        if not temp_path:
+            return None
+        filename = os.path.basename(temp_path)
+
+        file = BaseFile.objects.create(
+            author=request.client,
+            download_name=self.generate_print_form_download_name(
+                file_name=filename,
+                request=request,
+                print_form=print_form
+            )
+        )
+        with open(temp_path, 'rb') as generated_file:
+            file.file.save(
+                os.path.join(self.path_for_save, filename),
+                generated_file,
+                save=True
+            )
+
+        doc = request.requestdocument_set.create(
+            print_form=print_form,
+            file=file
+        )
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        return doc
 
-                doc = request.requestdocument_set.create(
-                    print_form=print_form,
-                    file=file
-                )
-                try:
-                    os.unlink(filename)
-                except FileNotFoundError:
-                    pass
-                return doc
-
-    def generate_print_forms(self, request: Request):
-        print_forms = self.get_enabled_print_forms(request)
-        for print_form in print_forms:
-            self.generate_print_form(request, print_form)
+    def generate_print_form(self, request: Request, print_form):
+        if self.adapters.get(print_form.type, None):
+            return self.save_print_form(
+                request, print_form, self.render_print_form(request, print_form)
+            )
+
+    def _render_in_thread(self, request, print_form):
+        try:
+            return self.render_print_form(request, print_form)
+        finally:
+            connections.close_all()
+
+    def generate_print_forms(self, request: Request, workers=None):
+        """
+        Генерация всех печатных форм заявки за один проход: контекст заявки
+        и хелпер банка строятся один раз, шаблоны берутся из кеша.
+        workers - число потоков для рендера форм, файлы сохраняются
+        в текущем потоке. Ошибка рендера любой формы пробрасывается
+        до сохранения, существующие документы заявки не удаляются
+        """
+        print_forms = [
+            print_form for print_form in self.get_enabled_print_forms(request)
+            if self.adapters.get(print_form.type, None)
+        ]
+        if not print_forms:
+            return []
+        request._print_form_context = RequestPrintFormMixin()._build_context(request)
+        try:
+            if workers and workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [
+                        executor.submit(self._render_in_thread, request, print_form)
+                        for print_form in print_forms
+                    ]
+                # пул дождался всех форм, result() пробрасывает ошибку рендера
+                files = [future.result() for future in futures]
+            else:
+                files = [
+                    self.render_print_form(request, print_form)
+                    for print_form in print_forms
+                ]
+        finally:
+            request._print_form_context = None
+        return [
+            self.save_print_form(request, print_form, temp_path)
+            for print_form, temp_path in zip(print_forms, files)
+        ]
 
 
 class OfferPrintGenerator(RequestPrintFormGenerator):
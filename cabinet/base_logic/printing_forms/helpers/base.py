@@ -1,6 +1,8 @@
+import hashlib
 import json
 from functools import reduce
 
+from django.core.cache import cache
 from django.utils import timezone
 from django.utils.functional import cached_property
 
@@ -14,6 +16,13 @@ from utils.helpers import number2string
 
 
 class BaseHelper:
+    """
+    Данные для шаблонов печатных форм. Хелпер создается один раз на заявку
+    для всех форм (см. RequestPrintFormGenerator.generate_print_forms),
+    поэтому обращения к ЕГРЮЛ и DaData запоминаются в хелпере
+    """
+    ADDRESS_CACHE_KEY = 'print_forms_address_%s'
+    ADDRESS_CACHE_TTL = 30 * 24 * 60 * 60
 
     def get_profile(self, request):
         return request.client.profile
@@ -23,6 +32,17 @@ class BaseHelper:
         self.bank = bank
         self.profile = self.get_profile(request)
         self.client = request.client
+        self._egrul_info = {}
+        self._addresses = {}
+
+    def get_egrul_info(self, inn):
+        if inn not in self._egrul_info:
+            self._egrul_info[inn] = EgrulData.get_info(inn)
+        return self._egrul_info[inn]
+
+    @property
+    def egrul_data(self):
+        return self.get_egrul_info(self.profile.reg_inn)
 
     @cached_property
     def print_required_amount(self):
@@ -52,7 +72,8 @@ class BaseHelper:
             return 'контракт'
         return ''
 
-    def finished_guaranties(self):
+    @cached_property
+    def _finished_guaranties(self):
         result = []
         total = 0
         now = timezone.now()
@@ -62,11 +83,11 @@ class BaseHelper:
             request__client=self.request.client,
         ).exclude(
             request_id=self.request.id
-        )
+        ).select_related('request')
         for offer in offers:
             result.append({
                 'cost': offer.amount,
-                'from': offer.contract_date or offer.request.intreval_from,
+                'from': offer.contract_date or offer.request.interval_from,
                 'to': offer.request.interval_to
             })
             if offer.request.interval_to > now.date():
@@ -76,6 +97,9 @@ class BaseHelper:
             'total': total
         }
 
+    def finished_guaranties(self):
+        return self._finished_guaranties
+
     @cached_property
     def get_all_sum_bgs(self):
         data = self.finished_guaranties()
@@ -105,7 +129,7 @@ class BaseHelper:
         return result
 
     def getAddressFromEGRUL(self):
-        egrul_data = EgrulData.get_info(self.profile.reg_inn)
+        egrul_data = self.egrul_data
         if egrul_data:
             result = egrul_data.get(
                 'section-ur-adress', {}
@@ -127,9 +151,23 @@ class BaseHelper:
         )
 
     def format_address(self, address):
-        api = DaData()
-        result = api.clean_address(address)
-        return '%s, %s' % (result[0]['postal_code'], result[0]['result'])
+        """
+        Нормализованный адрес через DaData. Результат запоминается в хелпере
+        и в общем кеше на ADDRESS_CACHE_TTL по исходной строке адреса
+        """
+        if address in self._addresses:
+            return self._addresses[address]
+        key = self.ADDRESS_CACHE_KEY % hashlib.md5(
+            (address or '').encode()
+        ).hexdigest()
+        result = cache.get(key)
+        if result is None:
+            api = DaData()
+            data = api.clean_address(address)
+            result = '%s, %s' % (data[0]['postal_code'], data[0]['result'])
+            cache.set(key, result, self.ADDRESS_CACHE_TTL)
+        self._addresses[address] = result
+        return result
 
     def getFactAddress(self):
         if self.profile.fact_is_legal_address:
@@ -146,7 +184,7 @@ class BaseHelper:
         )
 
     def get_company_full_name(self):
-        egrul_data = EgrulData.get_info(self.profile.reg_inn)
+        egrul_data = self.egrul_data
         if egrul_data:
             result = egrul_data.get(
                 'section-ur-lico', {}
@@ -1,11 +1,17 @@
 import os
+import uuid
 from copy import copy
 
 import attr
 from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import colors, PatternFill
 from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import coordinate_to_tuple
 
+from cabinet.base_logic.helpers.pdf_converter import (
+    PdfConversionError, PdfConverter
+)
 from settings.settings import MEDIA_ROOT, MEDIA_URL
 
 
@@ -14,6 +20,8 @@ class ExcelCellData:
     def __init__(self, cell=None, row=None, column=None, value=None, color=None,
                  merge=None, href=None, format=None):
         assert cell or (row and column) or merge
+        self.row = row
+        self.column = column
         if cell or merge:
             self.cell = cell
         else:
@@ -46,10 +54,47 @@ class BaseReport:
     sheets_for_remove = []
     money_format = r'#,##0"р.";[RED]\\-#,##0"р."'
     date_format = r'DD.MM.YYYY'
+    # каталог в MEDIA_ROOT, у каждого отчета свой подкаталог
+    reports_dir = 'reports'
+
+    WRITER_TEMPLATE = 'template'
+    WRITER_FAST = 'fast'
+    # способ записи: по шаблону или быстрая запись в write-only книгу,
+    # None - по шаблону, если он задан. Быстрая запись подходит отчетам,
+    # шаблон которых - простая шапка (значения, стили, объединения,
+    # ширины колонок): шапка переносится в книгу вместе с удалением
+    # колонок, вставкой строк и удалением листов
+    writer = None
 
     def __init__(self):
         self.rows_for_insert = []
         self.cols_for_delete = []
+        self.sheets_for_remove = list(self.sheets_for_remove)
+        self.output_dir = None
+        self.progress_callback = None
+        self.fills = {}
+
+    def set_progress(self, progress):
+        """ Прогресс построения отчета 0-100, для фоновых задач """
+        if self.progress_callback:
+            self.progress_callback(progress)
+
+    def get_output_dir(self):
+        if self.output_dir is None:
+            self.output_dir = os.path.join(self.reports_dir, uuid.uuid4().hex)
+        return self.output_dir
+
+    def get_output_path(self, name):
+        """
+        Путь к файлу и url. Отчеты пишутся в уникальный подкаталог,
+        одновременные выгрузки не перезаписывают друг друга
+        """
+        output_dir = self.get_output_dir()
+        os.makedirs(os.path.join(MEDIA_ROOT, output_dir), exist_ok=True)
+        return (
+            os.path.join(MEDIA_ROOT, output_dir, name),
+            os.path.join(MEDIA_URL, output_dir, name)
+        )
 
     def get_data(self):
         return {}
@@ -64,14 +109,24 @@ class BaseReport:
         self.sheets_for_remove.append(sheet_name)
 
     def action_insert(self, ws):
+        """
+        Вставка строк в шаблон: блок строк вставляется одним insert_rows,
+        стили копируются из строки шаблона, следующей за блоком
+        """
         for start, count in self.rows_for_insert:
-            for _ in range(count):
-                ws.insert_rows(start)
-                for col in range(1, 50):
-                    ws.cell(start, col)._style = copy(ws.cell(start + 1, col)._style)
-                    ws.cell(start, col).number_format = ws.cell(start + 1,
-                                                                col).number_format
-                    ws.row_dimensions[start + _ + 1] = ws.row_dimensions[start]
+            if count <= 0:
+                continue
+            ws.insert_rows(start, count)
+            source = start + count
+            styles = [
+                (col, copy(ws.cell(source, col)._style))
+                for col in range(1, 50)
+            ]
+            row_dimension = ws.row_dimensions[source]
+            for row in range(start, source):
+                for col, style in styles:
+                    ws.cell(row, col)._style = copy(style)
+                ws.row_dimensions[row].height = row_dimension.height
 
     def delete_col(self, col):
         self.cols_for_delete.append(col)
@@ -79,7 +134,210 @@ class BaseReport:
     def add_insert_rows(self, start, count):
         self.rows_for_insert.append((start, count))
 
+    def get_writer(self):
+        if self.writer:
+            return self.writer
+        return self.WRITER_TEMPLATE if self.get_template_name() else self.WRITER_FAST
+
+    def get_fill(self, color):
+        if color not in self.fills:
+            self.fills[color] = PatternFill(start_color=color, end_color=color,
+                                            fill_type='solid')
+        return self.fills[color]
+
+    def make_write_only_cell(self, ws, cell_data):
+        if cell_data is None:
+            return None
+        cell = WriteOnlyCell(ws, value=cell_data.value)
+        if cell_data.color:
+            cell.fill = self.get_fill(cell_data.color)
+        if cell_data.href:
+            cell.hyperlink = cell_data.href
+        if cell_data.format:
+            cell.number_format = getattr(self, '%s_format' % cell_data.format)
+        return cell
+
+    @staticmethod
+    def get_sheet_layout(sheet_data):
+        """
+        Раскладка данных листа по строкам: {строка: {колонка: ExcelCellData}}
+        и список объединений. Данные одной ячейки (значение, цвет, ссылка,
+        формат) из нескольких ExcelCellData сводятся в одну
+        """
+        rows = {}
+        merges = []
+        for cell_data in sheet_data:
+            if cell_data.merge is not None:
+                merges.append(cell_data.merge)
+                continue
+            if cell_data.row and cell_data.column:
+                row, column = cell_data.row, cell_data.column
+            else:
+                row, column = coordinate_to_tuple(cell_data.cell)
+            cells = rows.setdefault(row, {})
+            current = cells.get(column)
+            if current is None:
+                cells[column] = ExcelCellData(
+                    row=row, column=column, value=cell_data.value,
+                    href=cell_data.href, format=cell_data.format
+                )
+                cells[column].color = cell_data.color
+                continue
+            for field in ['value', 'color', 'href', 'format']:
+                if getattr(cell_data, field) is not None:
+                    setattr(current, field, getattr(cell_data, field))
+        return rows, merges
+
+    def map_column(self, column):
+        """ Колонка шаблона после удаления cols_for_delete, None - удалена """
+        for deleted in self.cols_for_delete:
+            if column == deleted:
+                return None
+            if column > deleted:
+                column -= 1
+        return column
+
+    def get_template_layout(self, ws, transform):
+        """
+        Ячейки листа шаблона {строка: {колонка: (значение, ячейка)}},
+        объединения и высоты строк. transform - лист с данными: колонки
+        удаляются и строки вставляются как при записи по шаблону
+        (сдвигаются только ячейки, объединения и размеры остаются на месте)
+        """
+        rows = {}
+        for row_cells in ws.iter_rows():
+            for cell in row_cells:
+                column = self.map_column(cell.column) if transform else cell.column
+                if column is not None:
+                    rows.setdefault(cell.row, {})[column] = (cell.value, cell)
+        heights = {
+            row: dimension.height for row, dimension in ws.row_dimensions.items()
+        }
+        if transform:
+            for start, count in self.rows_for_insert:
+                if count <= 0:
+                    continue
+                rows = {
+                    (row + count if row >= start else row): cells
+                    for row, cells in rows.items()
+                }
+                style_row = {
+                    column: (None, cell)
+                    for column, (value, cell) in rows.get(start + count, {}).items()
+                }
+                height = heights.get(start + count)
+                for row in range(start, start + count):
+                    rows[row] = style_row
+                    heights[row] = height
+        merges = [str(merge) for merge in ws.merged_cells.ranges]
+        return rows, merges, heights
+
+    def get_template_sheets(self):
+        """ Листы шаблона {имя: лист} в порядке шаблона """
+        template_name = self.get_template_name()
+        if not template_name:
+            return {}
+        return {ws.title: ws for ws in load_workbook(template_name).worksheets}
+
+    @staticmethod
+    def get_cell_style(cell, styles):
+        """ Стиль ячейки шаблона для ячеек другой книги, один раз на ячейку """
+        if id(cell) not in styles:
+            styles[id(cell)] = cell.has_style and (
+                copy(cell.font), copy(cell.border), copy(cell.fill),
+                cell.number_format, copy(cell.protection), copy(cell.alignment)
+            )
+        return styles[id(cell)]
+
+    def make_fast_cell(self, ws, template_cell, cell_data, styles):
+        value, source = template_cell or (None, None)
+        if cell_data is not None and cell_data.value is not None:
+            value = cell_data.value
+        cell = WriteOnlyCell(ws, value=value)
+        style = source is not None and self.get_cell_style(source, styles)
+        if style:
+            (cell.font, cell.border, cell.fill, cell.number_format,
+             cell.protection, cell.alignment) = style
+        if cell_data is not None:
+            if cell_data.color:
+                cell.fill = self.get_fill(cell_data.color)
+            if cell_data.href:
+                cell.hyperlink = cell_data.href
+            if cell_data.format:
+                cell.number_format = getattr(self, '%s_format' % cell_data.format)
+        return cell
+
+    def write_fast_sheet(self, wb, sheet_name, source, sheet_data):
+        ws = wb.create_sheet(sheet_name)
+        template_rows, merges, heights = {}, [], {}
+        if source is not None:
+            template_rows, merges, heights = self.get_template_layout(
+                source, transform=sheet_data is not None
+            )
+            for letter, dimension in source.column_dimensions.items():
+                if dimension.width:
+                    ws.column_dimensions[letter].width = dimension.width
+            ws.freeze_panes = source.freeze_panes
+        for row, height in heights.items():
+            if height:
+                ws.row_dimensions[row].height = height
+        rows, data_merges = self.get_sheet_layout(sheet_data or [])
+        styles = {}
+        for row in range(1, max(list(template_rows) + list(rows), default=0) + 1):
+            template_cells = template_rows.get(row, {})
+            cells = rows.get(row, {})
+            columns = set(template_cells) | set(cells)
+            if not columns:
+                ws.append([])
+                continue
+            values = [None] * max(columns)
+            for column in columns:
+                values[column - 1] = self.make_fast_cell(
+                    ws, template_cells.get(column), cells.get(column), styles
+                )
+            ws.append(values)
+        for merge in dict.fromkeys(merges + data_merges):
+            ws.merged_cells.add(merge)
+
+    def write_fast(self, data):
+        """
+        Запись в write-only книгу: строки пишутся по порядку одним проходом.
+        Листы шаблона переносятся с шапкой, стилями и объединениями,
+        лист (имя, родитель) копирует лист шаблона родитель. Порядок листов,
+        удаление колонок, вставка строк и удаление листов - как при записи
+        по шаблону
+        """
+        template = self.get_template_sheets()
+        data_sheets = {}
+        for sheet_name, sheet_data in data.items():
+            parent = None
+            if isinstance(sheet_name, tuple):
+                sheet_name, parent = sheet_name
+            data_sheets[sheet_name] = (parent, sheet_data)
+        sheets = [
+            (sheet_name, source, data_sheets.pop(sheet_name, (None, None))[1])
+            for sheet_name, source in template.items()
+        ]
+        sheets += [
+            (sheet_name, template.get(parent), sheet_data)
+            for sheet_name, (parent, sheet_data) in data_sheets.items()
+        ]
+
+        wb = Workbook(write_only=True)
+        for sheet_name, source, sheet_data in sheets:
+            if sheet_name not in self.sheets_for_remove:
+                self.write_fast_sheet(wb, sheet_name, source, sheet_data)
+        if not wb.sheetnames:
+            wb.create_sheet('Empty')
+
+        file_path, url = self.get_output_path(self.get_output_filename())
+        wb.save(file_path)
+        return url
+
     def write_to_file(self, data, sheets_list=None):
+        if self.get_writer() == self.WRITER_FAST:
+            return self.write_fast(data)
+
         template_name = self.get_template_name()
         if not template_name:
             wb = Workbook()
@@ -114,9 +372,7 @@ class BaseReport:
                 if cell_data.value is not None:
                     sheet[cell_data.cell] = cell_data.value
                 if cell_data.color is not None:
-                    sheet[cell_data.cell].fill = PatternFill(start_color=cell_data.color,
-                                                             end_color=cell_data.color,
-                                                             fill_type='solid')
+                    sheet[cell_data.cell].fill = self.get_fill(cell_data.color)
                 if cell_data.href:
                     sheet[cell_data.cell].hyperlink = cell_data.href
 
@@ -138,26 +394,27 @@ class BaseReport:
         if len(wb.sheetnames) > 1:
             wb.remove_sheet(wb.get_sheet_by_name('Empty'))
 
-        name = self.get_output_filename()
-        file_path = os.path.join(MEDIA_ROOT, name)
+        file_path, url = self.get_output_path(self.get_output_filename())
         wb.save(filename=file_path)
-        return os.path.join(MEDIA_URL, name)
+        return url
 
     def generate_pdf(self):
-        path = self.generate().file_path
-        path_soffice = os.environ.get('PATH_SOFFICE')
-        if path_soffice:
-            os.system('%s --headless --convert-to pdf %s' % (path_soffice, path[1:]))
-            os.system('mv %s media/' % self.get_output_filename(extension='pdf'))
+        if not PdfConverter.is_available():
             return BaseReportResult(
-                file_path=os.path.join(r'/media',
-                                       self.get_output_filename(extension='pdf')),
-                output_name=self.get_output_filename(extension='pdf')
+                file_path='',
+                output_name='',
+                error='Не установлен soffice'
             )
+        result = self.generate()
+        file_path, url = self.get_output_path(result.output_name)
+        try:
+            pdf_path = PdfConverter.convert(file_path)
+        except PdfConversionError as error:
+            return BaseReportResult(file_path='', output_name='', error=str(error))
+        output_name = os.path.basename(pdf_path)
         return BaseReportResult(
-            file_path='',
-            output_name='',
-            error='Не установлен soffice'
+            file_path=os.path.join(os.path.dirname(url), output_name),
+            output_name=output_name
         )
 
     def generate(self):
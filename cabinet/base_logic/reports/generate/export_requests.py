@@ -1,216 +1,442 @@
+import csv
+import datetime
+
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+from accounting_report.models import Quarter
+from bank_guarantee.models import Request
 from base_request.models import AbstractRequest
-from cabinet.base_logic.reports.generate.base import BaseReport, ExcelCellData
+from cabinet.base_logic.helpers.access_scope import AccessScope
+from cabinet.base_logic.helpers.request_filters import filter_requests
+from cabinet.base_logic.reports.generate.base import (
+    BaseReport, BaseReportResult, ExcelCellData
+)
 from common.helpers import format_decimal
+from tender_loans.models import LoanRequest
 from users.models import Role
 
 
 class ExportRequests(BaseReport):
     template_name = r'system_files/report_templates/export_request.xlsx'
+    # шаблон - шапка и строка стилей, вставка тысяч строк в шаблон медленная
+    writer = BaseReport.WRITER_FAST
+    # заголовки колонок для потоковой выгрузки (без шаблона)
+    columns = [
+        (1, 'Номер заявки'),
+        (2, 'Номер заявки в банке'),
+        (3, 'Дата отправки в банк'),
+        (4, 'Дата изменения статуса'),
+        (5, 'Статус'),
+        (6, 'Клиент'),
+        (7, 'Банк'),
+        (8, 'Агент'),
+        (9, 'Тип'),
+        (10, 'Сумма'),
+        (11, 'Срок, дней'),
+        (12, 'НМЦК'),
+        (13, 'Выручка'),
+        (14, 'Номер извещения'),
+        (15, 'Закон'),
+        (16, 'Дата окончания'),
+        (17, 'Комиссия по тарифу'),
+        (18, 'Превышение/снижение'),
+        (19, 'Комиссия'),
+        (20, 'Менеджер'),
+        (21, 'Последний комментарий'),
+        (22, 'Номер договора'),
+        (23, 'Дата договора'),
+    ]
+    # колонки с итоговыми суммами
+    total_columns = [10, 17, 18, 19]
+    chunk_size = 1000
+    related_fields = [
+        'client__profile', 'client__manager', 'status', 'bank', 'agent', 'tender',
+        'offer',
+    ]
 
-    def __init__(self, requests=None, loans=None, role=Role.AGENT):
+    def __init__(self, requests=None, loans=None, role=Role.AGENT, stream=False,
+                 extension='xlsx'):
         super().__init__()
         self.requests = requests
         self.loans = loans
         self.role = role
         self.is_bank = Role.BANK in self.role or Role.MFO in self.role
+        self.stream = stream or extension == 'csv'
+        self.extension = extension
+        self.revenues = {}
+        self.last_comments = None
 
+    @classmethod
+    def for_user(cls, user, params):
+        """
+        Выгрузка заявок, доступных пользователю, по параметрам списка заявок
+        (filter, archive, stream, extension)
+        """
+        requests = Request.objects.all()
+        requests = AccessScope.filter_requests(
+            user, requests=requests
+        ).select_related()
+        loans = LoanRequest.objects.all()
+        loans = AccessScope.filter_loan_requests(
+            user, requests=loans
+        ).select_related()
+        archive = params.get('archive') == 'true'
+        if requests:
+            requests = filter_requests(params, requests.filter(in_archive=archive))
+        else:
+            requests = None
 
-    def fill_requests_table(self, data, row, requests):
-        for request in requests:
-            # data.append(ExcelCellData(
-            #     row=row,
-            #     column=1,
-            #     value=request.offer.id if request.has_offer() else ''
-            # ))
-            data.append(ExcelCellData(
-                row=row,
-                column=1,
-                value=request.request_number
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=2,
-                value=request.request_number_in_bank
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=3,
-                value=request.sent_to_bank_date,
-                format='date'
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=4,
-                value=request.status_changed_date,
-                format='date'
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=5,
-                value=request.status.name,
-                color=request.status.color[1:] if request.status.color else ''
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=6,
-                value='%s, \nИНН: %s' % (request.client.short_name, request.client.profile.reg_inn),
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=7,
-                value=request.bank.short_name if request.bank else ''
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=8,
-                value=request.agent.short_name if request.agent else '',
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=9,
-                value=request.get_targets_display(),
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=10,
-                value=request.required_amount,
-                format='money'
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=11,
-                value=request.interval if request.request_type == AbstractRequest.TYPE_BG else '',
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=12,
-                value=request.tender.price,
-                format='money'
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=13,
-                value=request.client.accounting_report.get_year_quarter().get_value(
-                    2110
-                ) * 1000,
-                format='money'
-            ))
-            data.append(ExcelCellData(
-                row=row,
-                column=14,
-                value=request.tender.notification_id,
-                href=request.tender.tender_url,
-            ))
-            # data.append(ExcelCellData(
-            #     row=row,
-            #     column=13,
-            #     value=request.protocol_number if request.request_type == AbstractRequest.TYPE_BG else ''
-            # ))
-            # data.append(ExcelCellData(
-            #     row=row,
-            #     column=14,
-            #     value=request.protocol_date.strftime('%d.%m.%Y') if request.request_type == AbstractRequest.TYPE_BG and request.protocol_date else ''
-            # ))
-            data.append(ExcelCellData(
-                row=row,
-                column=15,
-                value=request.tender.get_federal_law_display()
-            ))
+        if loans:
+            loans = filter_requests(params, requests.filter(in_archive=archive))
+        else:
+            loans = None
+        extension = params.get('extension')
+        return cls(
+            requests=requests,
+            loans=loans.filter(in_archive=archive) if loans else None,
+            role=user.roles_list,
+            stream=params.get('stream') == 'true',
+            extension='csv' if extension == 'csv' else 'xlsx'
+        )
 
-            final_date = None
-            if request.request_type == AbstractRequest.TYPE_BG:
-                if request.final_date:
-                    final_date = request.final_date
-            else:
-                final_date = request.date_end
-            data.append(ExcelCellData(
-                row=row,
-                column=16,
-                value=final_date,
-                format='date'
-            ))
-            default_commission = None
-            delta_commission = None
-            commission = None
-            if request.request_type == AbstractRequest.TYPE_BG:
-                if request.has_offer():
-                    if self.is_bank:
-                        default_commission = request.offer.default_commission_bank
-                        delta_commission = request.offer.delta_commission_bank
-                        commission = request.offer.commission_bank
-                    else:
-                        default_commission = request.offer.default_commission
-                        delta_commission = request.offer.delta_commission
-                        commission = request.offer.commission
+    def get_revenue(self, client):
+        """
+        Выручка клиента, считается один раз на клиента. Для пачек заявок
+        загружается заранее (prefetch_revenues), здесь - клиенты
+        без годовой отчетности
+        """
+        if client.id not in self.revenues:
+            self.revenues[client.id] = client.accounting_report.get_year_quarter(
+            ).get_value(2110) * 1000
+        return self.revenues[client.id]
+
+    def prefetch_revenues(self, requests):
+        """
+        Выручка клиентов пачки заявок: годовые кварталы отчетности
+        (как AccountingReport.get_year_quarter) одним запросом
+        """
+        client_ids = {request.client_id for request in requests} - set(self.revenues)
+        if not client_ids:
+            return
+        params = Quarter.manager_accounting_report.get_last_year_quarter()
+        quarters = Quarter.objects.filter(
+            client_id__in=client_ids, year=params.year, quarter=params.quarter
+        )
+        for quarter in quarters:
+            self.revenues[quarter.client_id] = quarter.get_value(2110) * 1000
+
+    def get_last_comment(self, request):
+        if self.last_comments is not None:
+            return self.last_comments.get(request.base_request_id, '')
+        last_comment = request.get_last_comments().first()
+        return last_comment.text if last_comment else ''
+
+    def prefetch_last_comments(self, requests):
+        """ Последние комментарии пачки заявок одним запросом """
+        self.last_comments = {}
+        if self.is_bank or not requests:
+            return
+        comments = requests[0].get_last_comments().model.objects.filter(
+            request_id__in={request.base_request_id for request in requests}
+        ).order_by('request_id', '-id').distinct('request_id')
+        self.last_comments = {
+            comment.request_id: comment.text for comment in comments
+        }
+
+    def iter_chunks(self, requests):
+        """
+        Заявки пачками по chunk_size с загруженными связанными данными,
+        порядок исходного queryset сохраняется
+        """
+        ids = list(requests.values_list('id', flat=True))
+        for start in range(0, len(ids), self.chunk_size):
+            self.set_progress(int(start * 100 / len(ids)))
+            chunk_ids = ids[start:start + self.chunk_size]
+            objects = requests.model.objects.filter(
+                id__in=chunk_ids
+            ).select_related(*self.related_fields).in_bulk()
+            chunk = [objects[id] for id in chunk_ids if id in objects]
+            self.prefetch_last_comments(chunk)
+            self.prefetch_revenues(chunk)
+            yield chunk
+        self.last_comments = None
+
+    def get_stream_columns(self):
+        return [
+            (column, name) for column, name in self.columns
+            if not (self.is_bank and column == 21)
+        ]
+
+    def iter_stream_rows(self, requests):
+        """ Строки выгрузки: список ExcelCellData по колонкам get_stream_columns """
+        columns = [column for column, name in self.get_stream_columns()]
+        for chunk in self.iter_chunks(requests):
+            for request in chunk:
+                cells = {cell.column: cell for cell in self.get_row(request, 1)}
+                yield [cells.get(column) for column in columns]
+
+    def get_stream_sheets(self):
+        sheets = []
+        if self.requests:
+            sheets.append(('Банковские гарантии', self.requests))
+        if self.loans:
+            sheets.append(('Тендерные займы', self.loans))
+        return sheets
+
+    def write_xlsx_stream(self, file_path):
+        wb = Workbook(write_only=True)
+        columns = self.get_stream_columns()
+        positions = {column: index for index, (column, name) in enumerate(columns)}
+        for sheet_name, requests in self.get_stream_sheets():
+            ws = wb.create_sheet(sheet_name)
+            ws.append([name for column, name in columns])
+            row = 1
+            for cells in self.iter_stream_rows(requests):
+                ws.append([self.make_write_only_cell(ws, cell) for cell in cells])
+                row += 1
+            totals = [None] * len(columns)
+            totals[0] = 'Итог: %s' % (row - 1)
+            for column in self.total_columns:
+                letter = get_column_letter(positions[column] + 1)
+                totals[positions[column]] = '=SUM(%s2:%s%i)' % (letter, letter, row)
+            ws.append(totals)
+        if not wb.sheetnames:
+            wb.create_sheet('Empty')
+        wb.save(file_path)
+
+    @staticmethod
+    def format_csv_value(cell_data):
+        if cell_data is None or cell_data.value is None:
+            return ''
+        if isinstance(cell_data.value, (datetime.date, datetime.datetime)):
+            return cell_data.value.strftime('%d.%m.%Y')
+        return cell_data.value
+
+    def write_csv_stream(self, file_path):
+        columns = self.get_stream_columns()
+        # utf-8-sig, чтобы Excel корректно открывал кириллицу
+        with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f, delimiter=';')
+            for sheet_name, requests in self.get_stream_sheets():
+                writer.writerow([sheet_name])
+                writer.writerow([name for column, name in columns])
+                for cells in self.iter_stream_rows(requests):
+                    writer.writerow([self.format_csv_value(cell) for cell in cells])
+
+    def generate_stream(self):
+        """
+        Потоковая выгрузка: заявки читаются пачками, строки сразу пишутся
+        в файл (write-only книга или csv), память не зависит от числа строк
+        """
+        name = self.get_output_filename(self.extension)
+        file_path, url = self.get_output_path(name)
+        if self.extension == 'csv':
+            self.write_csv_stream(file_path)
+        else:
+            self.write_xlsx_stream(file_path)
+        return BaseReportResult(file_path=url, output_name=name)
+
+    def generate(self):
+        if self.stream:
+            return self.generate_stream()
+        return super().generate()
+
+    def get_row(self, request, row) -> list:
+        data = []
+        # data.append(ExcelCellData(
+        #     row=row,
+        #     column=1,
+        #     value=request.offer.id if request.has_offer() else ''
+        # ))
+        data.append(ExcelCellData(
+            row=row,
+            column=1,
+            value=request.request_number
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=2,
+            value=request.request_number_in_bank
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=3,
+            value=request.sent_to_bank_date,
+            format='date'
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=4,
+            value=request.status_changed_date,
+            format='date'
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=5,
+            value=request.status.name,
+            color=request.status.color[1:] if request.status.color else ''
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=6,
+            value='%s, \nИНН: %s' % (request.client.short_name, request.client.profile.reg_inn),
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=7,
+            value=request.bank.short_name if request.bank else ''
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=8,
+            value=request.agent.short_name if request.agent else '',
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=9,
+            value=request.get_targets_display(),
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=10,
+            value=request.required_amount,
+            format='money'
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=11,
+            value=request.interval if request.request_type == AbstractRequest.TYPE_BG else '',
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=12,
+            value=request.tender.price,
+            format='money'
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=13,
+            value=self.get_revenue(request.client),
+            format='money'
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=14,
+            value=request.tender.notification_id,
+            href=request.tender.tender_url,
+        ))
+        # data.append(ExcelCellData(
+        #     row=row,
+        #     column=13,
+        #     value=request.protocol_number if request.request_type == AbstractRequest.TYPE_BG else ''
+        # ))
+        # data.append(ExcelCellData(
+        #     row=row,
+        #     column=14,
+        #     value=request.protocol_date.strftime('%d.%m.%Y') if request.request_type == AbstractRequest.TYPE_BG and request.protocol_date else ''
+        # ))
+        data.append(ExcelCellData(
+            row=row,
+            column=15,
+            value=request.tender.get_federal_law_display()
+        ))
+
+        final_date = None
+        if request.request_type == AbstractRequest.TYPE_BG:
+            if request.final_date:
+                final_date = request.final_date
+        else:
+            final_date = request.date_end
+        data.append(ExcelCellData(
+            row=row,
+            column=16,
+            value=final_date,
+            format='date'
+        ))
+        default_commission = None
+        delta_commission = None
+        commission = None
+        if request.request_type == AbstractRequest.TYPE_BG:
+            if request.has_offer():
+                if self.is_bank:
+                    default_commission = request.offer.default_commission_bank
+                    delta_commission = request.offer.delta_commission_bank
+                    commission = request.offer.commission_bank
                 else:
-                    if request.bank:
-                        default_commission = (request.get_commission_for_bank_code(
-                            request.bank.code
-                        ) or {}).get('commission', 0)
-                        delta_commission = 0
-                        commission = 0
+                    default_commission = request.offer.default_commission
+                    delta_commission = request.offer.delta_commission
+                    commission = request.offer.commission
             else:
-                if request.has_offer():
-                    default_commission = request.offer.commission
-                    if self.is_bank:
-                        commission = request.offer.mfo_commission
+                if request.bank:
+                    default_commission = (request.get_commission_for_bank_code(
+                        request.bank.code
+                    ) or {}).get('commission', 0)
+                    delta_commission = 0
+                    commission = 0
+        else:
+            if request.has_offer():
+                default_commission = request.offer.commission
+                if self.is_bank:
+                    commission = request.offer.mfo_commission
+                else:
+                    commission = request.offer.agent_commission
+                    if commission and default_commission:
+                        delta_commission = commission - default_commission
                     else:
-                        commission = request.offer.agent_commission
-                        if commission and default_commission:
-                            delta_commission = commission - default_commission
-                        else:
-                            delta_commission = 0
+                        delta_commission = 0
+
+        data.append(ExcelCellData(
+            row=row,
+            column=17,
+            value=default_commission,
+            format='money'
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=18,
+            value=delta_commission,
+            format='money'
+        ))
+        data.append(ExcelCellData(
+            row=row,
+            column=19,
+            value=commission,
+            format='money'
+        ))
+        manager = request.client.manager
+        manager = manager.full_name if manager else ''
 
+        data.append(ExcelCellData(
+            row=row,
+            column=20,
+            value=manager,
+        ))
+        if not self.is_bank:
             data.append(ExcelCellData(
                 row=row,
-                column=17,
-                value=default_commission,
-                format='money'
+                column=21,
+                value=self.get_last_comment(request)
             ))
+        if request.has_offer():
             data.append(ExcelCellData(
                 row=row,
-                column=18,
-                value=delta_commission,
-                format='money'
+                column=22,
+                value=request.offer.contract_number
             ))
             data.append(ExcelCellData(
                 row=row,
-                column=19,
-                value=commission,
-                format='money'
+                column=23,
+                value=request.offer.contract_date,
+                format='date'
             ))
-            manager = request.client.manager
-            manager = manager.full_name if manager else ''
+        return data
 
-            data.append(ExcelCellData(
-                row=row,
-                column=20,
-                value=manager,
-            ))
-            if not self.is_bank:
-                last_comment = request.get_last_comments().first()
-                if last_comment:
-                    last_comment = last_comment.text
-                else:
-                    last_comment = ''
-                data.append(ExcelCellData(
-                    row=row,
-                    column=21,
-                    value=last_comment
-                ))
-            if request.has_offer():
-                data.append(ExcelCellData(
-                    row=row,
-                    column=22,
-                    value=request.offer.contract_number
-                ))
-                data.append((ExcelCellData(
-                    row=row,
-                    column=23,
-                    value=request.offer.contract_date,
-                    format='date'
-                )))
-            row += 1
+    def fill_requests_table(self, data, row, requests):
+        for chunk in self.iter_chunks(requests):
+            for request in chunk:
+                data.extend(self.get_row(request, row))
+                row += 1
         return data, row
 
     def get_data(self):
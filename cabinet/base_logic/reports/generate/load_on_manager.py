@@ -1,9 +1,8 @@
-from django.db.models import F, Q
-
 from bank_guarantee.constants import ProductChoices
 from bank_guarantee.models import Request
 from cabinet.base_logic.reports.generate.base import ExcelCellData, BaseReport
-from clients.models import Agent, AgentManager
+from cabinet.base_logic.reports.matrix import AgentStatusMatrix, get_managers_agents
+from clients.models import Agent
 from tender_loans.models import LoanRequest
 from users.models import User, Role
 
@@ -65,238 +64,82 @@ class LoadOnManagerReport(BaseReport):
         return data
 
 
-    def requests_report(self):
-        data = []
-        start_row = 18
-        data = self.fill_head(data)
-        for manager in self.managers:
-            start_row_manager = start_row
-            for agent in self.agents.filter(
-                    id__in=AgentManager.objects.filter(manager=manager).values_list('agent_id', flat=True)):
-                start_row = start_row + 1
-                requests = Request.objects.filter(agent=agent)
-                data.append(ExcelCellData(
-                    cell='B%i' % start_row,
-                    value=agent.short_name
-                ))
-                data.append(ExcelCellData(
-                    cell='C%i' % start_row,
-                    value=requests.filter(Q(base_request=F('id')) | Q(base_request__isnull=True)).count()
-                ))
-                data.append(ExcelCellData(
-                    cell='D%i' % start_row,
-                    value=requests.count()
-                ))
-                statuses = {
-                    'E': 'Черновик',
-                    'F': 'На подписании у клиента',
-                    'G': 'Направлена в банк / МФО',
-                    'H': 'Запрос',
-                    'I': 'Отклонено скорингом',
-                    'j': 'Отозванная клиентом заявка',
-                    'K': 'На рассмотрении в банке / МФО',
-                    'L': 'На рассмотрении у службы безопасности',
-                    'M': 'На рассмотрении в кредитном комитете',
-                    'N': 'Заявка отклонена банком / МФО',
-                    'O': 'Одобрено банком / МФО',
-                    'P': 'Предложение подготавливается банком / МФО',
-                    'Q': 'Банк / МФО отправил предложение',
-                    'R': 'Предложение отклонено клиентом',
-                    'S': 'Предложение отозвано банком / МФО',
-                    'T': 'Предложение принято, не оплачено',
-                    'U': 'Подготавливается банковская гарантия',
-                    'V': 'Банковская гарантия передана клиенту',
-                    'W': 'Закреплен за другим агентом',
-                    'X': 'Запрос отработан',
-                }
-                for key, value in statuses.items():
-                    data.append(ExcelCellData(
-                        cell='%s%i' % (key, start_row),
-                        value=requests.filter(status__name=value).count()
-                    ))
-            if start_row == start_row_manager:
-                continue
-            columns = 'CDEFGHIJKLMNOPQRSTUVWX'
-            data.append(ExcelCellData(
-                cell='A%i' % start_row_manager,
-                value='%s (Итого)' % manager.full_name,
-                color='F4B183'
-            ))
-            data.append(ExcelCellData(
-                cell='B%i' % start_row_manager,
-                color='F4B183'
-            ))
-            for column in columns:
-                data.append(ExcelCellData(
-                    cell='%s%i' % (column, start_row_manager),
-                    value='=SUM(%s%i:%s%i)' % (column, start_row_manager + 1, column, start_row),
-                    color='F4B183'
-                ))
-            start_row += 1
-        columns = 'CDEFGHIJKLMNOPQRSTUVWX'
-        data.append(ExcelCellData(
-            cell='A%i' % start_row,
-            value='Итого',
-            color='F4B183'
-        ))
-        data.append(ExcelCellData(
-            cell='B%i' % start_row,
-            color='F4B183'
-        ))
-        for column in columns:
-            data.append(ExcelCellData(
-                cell='%s%i' % (column, start_row),
-                value='=SUM(%s%i:%s%i)/2' % (column, 18, column, start_row-1),
-                color='F4B183'
-            ))
+    statuses = {
+        'E': 'Черновик',
+        'F': 'На подписании у клиента',
+        'G': 'Направлена в банк / МФО',
+        'H': 'Запрос',
+        'I': 'Отклонено скорингом',
+        'J': 'Отозванная клиентом заявка',
+        'K': 'На рассмотрении в банке / МФО',
+        'L': 'На рассмотрении у службы безопасности',
+        'M': 'На рассмотрении в кредитном комитете',
+        'N': 'Заявка отклонена банком / МФО',
+        'O': 'Одобрено банком / МФО',
+        'P': 'Предложение подготавливается банком / МФО',
+        'Q': 'Банк / МФО отправил предложение',
+        'R': 'Предложение отклонено клиентом',
+        'S': 'Предложение отозвано банком / МФО',
+        'T': 'Предложение принято, не оплачено',
+        'U': 'Подготавливается банковская гарантия',
+        'V': 'Банковская гарантия передана клиенту',
+        'W': 'Закреплен за другим агентом',
+        'X': 'Запрос отработан',
+    }
 
-        return {'Лист1': data}
+    def requests_report(self):
+        return self.status_report([Request.objects.all()], self.statuses)
 
     def loans_report(self):
-        data = []
-        start_row = 18
-        data = self.fill_head(data)
-        for manager in self.managers:
-            start_row_manager = start_row
-            for agent in self.agents.filter(
-                    id__in=AgentManager.objects.filter(manager=manager).values_list('agent_id', flat=True)):
-                start_row = start_row + 1
-                requests = LoanRequest.objects.filter(agent=agent)
-                data.append(ExcelCellData(
-                    cell='B%i' % start_row,
-                    value=agent.short_name
-                ))
-                data.append(ExcelCellData(
-                    cell='C%i' % start_row,
-                    value=requests.filter(Q(base_request=F('id')) | Q(base_request__isnull=True)).count()
-                ))
-                data.append(ExcelCellData(
-                    cell='D%i' % start_row,
-                    value=requests.count()
-                ))
-                statuses = {
-                    'E': 'Черновик',
-                    'F': 'На подписании у клиента',
-                    'G': 'Направлена в банк / МФО',
-                    'H': 'Запрос',
-                    'I': 'Отклонено скорингом',
-                    'j': 'Отозванная клиентом заявка',
-                    'K': 'На рассмотрении в банке / МФО',
-                    'L': 'На рассмотрении у службы безопасности',
-                    'M': 'На рассмотрении в кредитном комитете',
-                    'N': 'Заявка отклонена банком / МФО',
-                    'O': 'Одобрено банком / МФО',
-                    'P': 'Предложение подготавливается банком / МФО',
-                    'Q': 'Банк / МФО отправил предложение',
-                    'R': 'Предложение отклонено клиентом',
-                    'S': 'Предложение отозвано банком / МФО',
-                    'T': 'Предложение принято, не оплачено',
-                    'U': 'Подготавливается банковская гарантия',
-                    'V': 'Займ выдан',
-                    'W': 'Закреплен за другим агентом',
-                    'X': 'Запрос отработан',
-                }
-                for key, value in statuses.items():
-                    data.append(ExcelCellData(
-                        cell='%s%i' % (key, start_row),
-                        value=requests.filter(status__name=value).count()
-                    ))
-            if start_row == start_row_manager:
-                continue
-            columns = 'CDEFGHIJKLMNOPQRSTUVWX'
-            data.append(ExcelCellData(
-                cell='A%i' % start_row_manager,
-                value='%s (Итого)' % manager.full_name,
-                color='F4B183'
-            ))
-            data.append(ExcelCellData(
-                cell='B%i' % start_row_manager,
-                color='F4B183'
-            ))
-            for column in columns:
-                data.append(ExcelCellData(
-                    cell='%s%i' % (column, start_row_manager),
-                    value='=SUM(%s%i:%s%i)' % (column, start_row_manager + 1, column, start_row),
-                    color='F4B183'
-                ))
-            start_row += 1
-        columns = 'CDEFGHIJKLMNOPQRSTUVWX'
-        data.append(ExcelCellData(
-            cell='A%i' % start_row,
-            value='Итого',
-            color='F4B183'
-        ))
-        data.append(ExcelCellData(
-            cell='B%i' % start_row,
-            color='F4B183'
-        ))
-        for column in columns:
-            data.append(ExcelCellData(
-                cell='%s%i' % (column, start_row),
-                value='=SUM(%s%i:%s%i)/2' % (column, 18, column, start_row - 1),
-                color='F4B183'
-            ))
-
-        return {'Лист1': data}
+        statuses = dict(self.statuses, V='Займ выдан')
+        return self.status_report([LoanRequest.objects.all()], statuses)
 
     def all_report(self):
+        statuses = dict(
+            self.statuses, V=['Займ выдан', 'Банковская гарантия передана клиенту']
+        )
+        return self.status_report(
+            [Request.objects.all(), LoanRequest.objects.all()], statuses
+        )
+
+    def status_report(self, querysets, statuses):
+        """
+        Таблица агент x статус. Все количества берутся из матрицы,
+        построенной одним сгруппированным запросом на продукт
+        """
         data = []
         start_row = 18
         data = self.fill_head(data)
+        agents = list(self.agents)
+        matrix = AgentStatusMatrix(*[
+            queryset.filter(agent__in=self.agents)
+            for queryset in querysets
+        ]).load()
+        managers_agents = get_managers_agents(self.managers, agents)
+        columns = 'CDEFGHIJKLMNOPQRSTUVWX'
         for manager in self.managers:
             start_row_manager = start_row
-            for agent in self.agents.filter(
-                    id__in=AgentManager.objects.filter(manager=manager).values_list('agent_id', flat=True)) :
+            for agent in managers_agents.get(manager.id, []):
                 start_row = start_row + 1
-                requests = Request.objects.filter(agent=agent)
-                loan_requests = LoanRequest.objects.filter(agent=agent)
                 data.append(ExcelCellData(
                     cell='B%i' % start_row,
                     value=agent.short_name
                 ))
                 data.append(ExcelCellData(
                     cell='C%i' % start_row,
-                    value=requests.filter(
-                        Q(base_request=F('id')) | Q(base_request__isnull=True)
-                    ).count() + loan_requests.filter(Q(base_request=F('id')) | Q(base_request__isnull=True)).count()
+                    value=matrix.get_unique(agent.id)
                 ))
                 data.append(ExcelCellData(
                     cell='D%i' % start_row,
-                    value=requests.count() + loan_requests.count()
+                    value=matrix.get_count(agent.id)
                 ))
-                statuses = {
-                    'E': 'Черновик',
-                    'F': 'На подписании у клиента',
-                    'G': 'Направлена в банк / МФО',
-                    'H': 'Запрос',
-                    'I': 'Отклонено скорингом',
-                    'j': 'Отозванная клиентом заявка',
-                    'K': 'На рассмотрении в банке / МФО',
-                    'L': 'На рассмотрении у службы безопасности',
-                    'M': 'На рассмотрении в кредитном комитете',
-                    'N': 'Заявка отклонена банком / МФО',
-                    'O': 'Одобрено банком / МФО',
-                    'P': 'Предложение подготавливается банком / МФО',
-                    'Q': 'Банк / МФО отправил предложение',
-                    'R': 'Предложение отклонено клиентом',
-                    'S': 'Предложение отозвано банком / МФО',
-                    'T': 'Предложение принято, не оплачено',
-                    'U': 'Подготавливается банковская гарантия',
-                    'V': ['Займ выдан', 'Банковская гарантия передана клиенту'],
-                    'W': 'Закреплен за другим агентом',
-                    'X': 'Запрос отработан',
-                }
                 for key, value in statuses.items():
-                    if isinstance(value, str):
-                        value = [value, ]
                     data.append(ExcelCellData(
                         cell='%s%i' % (key, start_row),
-                        value=requests.filter(status__name__in=value).count() + loan_requests.filter(
-                            status__name=value).count()
+                        value=matrix.get(agent.id, value)
                     ))
             if start_row == start_row_manager:
                 continue
-            columns = 'CDEFGHIJKLMNOPQRSTUVWX'
             data.append(ExcelCellData(
                 cell='A%i' % start_row_manager,
                 value='%s (Итого)' % manager.full_name,
@@ -313,7 +156,6 @@ class LoadOnManagerReport(BaseReport):
                     color='F4B183'
                 ))
             start_row += 1
-        columns = 'CDEFGHIJKLMNOPQRSTUVWX'
         data.append(ExcelCellData(
             cell='A%i' % start_row,
             value='Итого',
@@ -1,24 +1,16 @@
-from django.db.models import Sum, Q, F
+from collections import defaultdict
+
+from django.db.models import Q
 
 from bank_guarantee.constants import ProductChoices
 from bank_guarantee.models import Request
-from clients.models import Agent, AgentManager
+from clients.models import Agent
 from cabinet.base_logic.reports.generate.base import BaseReport, ExcelCellData
+from cabinet.base_logic.reports.matrix import AgentStatusMatrix, get_managers_agents
 from tender_loans.models import LoanRequest
 from users.models import User, Role
 
 
-def get_count_and_amount(requests):
-    unique_requests = requests.filter(Q(base_request=F('id')) | Q(base_request__isnull=True))
-    # requests = requests.filter(
-    #     Q(base_request__in=unique_requests) | Q(base_request__isnull=True)
-    # )
-    agent_total_requests = requests.count()
-    agent_unique_requests = unique_requests.count()
-    agent_total_amount = requests.aggregate(Sum('required_amount')).get('required_amount__sum') or 0
-    return agent_total_requests, agent_unique_requests, agent_total_amount
-
-
 class OperationManagerReport(BaseReport):
     template_name = 'system_files/report_templates/operation_manager_report.xlsx'
 
@@ -56,51 +48,34 @@ class OperationManagerReport(BaseReport):
             return self.all_type_requests_report()
 
     def requests_report(self):
-        start_row = 19
-        data = []
-        end_row = 20
-        for manager in self.managers:
-            data, end_row = self.get_requests_table(data, manager, start_row)
-            if end_row == start_row:
-                continue
-            data.append(ExcelCellData(cell='A%i' % start_row, value='%s Итого' % manager.full_name))
-            data.append((ExcelCellData(cell='B%i' % start_row, value='=SUM(B%i:B%i)' % (start_row + 1, end_row - 1))))
-            data.append((ExcelCellData(cell='C%i' % start_row, value='=SUM(C%i:C%i)' % (start_row + 1, end_row - 1))))
-            data.append((ExcelCellData(cell='L%i' % start_row, value='=SUM(L%i:L%i)' % (start_row + 1, end_row - 1))))
-            data.append((ExcelCellData(cell='M%i' % start_row, value='=SUM(M%i:M%i)' % (start_row + 1, end_row - 1))))
-            data.append((ExcelCellData(cell='N%i' % start_row, value='=SUM(N%i:N%i)' % (start_row + 1, end_row - 1))))
-            for i in range(15):
-                data.append(ExcelCellData(row=start_row, column=i + 1, color='ADB9CA'))
-            start_row = end_row
-        data = self.fill_header(data, start_row=19, end_row=end_row)
-        return {'Лист1': data}
+        return self.manager_tables([Request.objects.all()])
 
     def loans_report(self):
-        start_row = 19
-        data = []
-        end_row = 20
-        for manager in self.managers:
-            data, end_row = self.get_loans_table(data, manager, start_row)
-            if end_row == start_row:
-                continue
-            data.append(ExcelCellData(cell='A%i' % start_row, value='%s Итого' % manager.full_name))
-            data.append((ExcelCellData(cell='B%i' % start_row, value='=SUM(B%i:B%i)' % (start_row + 1, end_row - 1))))
-            data.append((ExcelCellData(cell='C%i' % start_row, value='=SUM(C%i:C%i)' % (start_row + 1, end_row - 1))))
-            data.append((ExcelCellData(cell='L%i' % start_row, value='=SUM(L%i:L%i)' % (start_row + 1, end_row - 1))))
-            data.append((ExcelCellData(cell='M%i' % start_row, value='=SUM(M%i:M%i)' % (start_row + 1, end_row - 1))))
-            data.append((ExcelCellData(cell='N%i' % start_row, value='=SUM(N%i:N%i)' % (start_row + 1, end_row - 1))))
-            for i in range(15):
-                data.append(ExcelCellData(row=start_row, column=i + 1, color='ADB9CA'))
-            start_row = end_row
-        data = self.fill_header(data, start_row=19, end_row=end_row)
-        return {'Лист1': data}
+        return self.manager_tables([LoanRequest.objects.all()])
 
     def all_type_requests_report(self):
+        return self.manager_tables([Request.objects.all(), LoanRequest.objects.all()])
+
+    def manager_tables(self, querysets):
+        """
+        Таблицы по менеджерам. Итоги агентов берутся из матрицы агент x статус,
+        заявки периода загружаются одним запросом на продукт
+        """
+        querysets = [
+            queryset.filter(self.filter_date, agent__in=self.agents)
+            for queryset in querysets
+        ]
+        matrix = AgentStatusMatrix(*querysets).load()
+        requests = self.load_requests(querysets)
+        managers_agents = get_managers_agents(self.managers, self.agents)
+
         start_row = 19
         data = []
         end_row = 20
         for manager in self.managers:
-            data, end_row = self.get_all_table(data, manager, start_row)
+            data, end_row = self.get_table(
+                data, managers_agents.get(manager.id, []), matrix, requests, start_row
+            )
             if end_row == start_row:
                 continue
             data.append(ExcelCellData(cell='A%i' % start_row, value='%s Итого' % manager.full_name))
@@ -115,229 +90,68 @@ class OperationManagerReport(BaseReport):
         data = self.fill_header(data, start_row=19, end_row=end_row)
         return {'Лист1': data}
 
-    def get_requests_table(self, data, manager, start_row):
-        data_for_insert = []
-        for agent in self.agents.filter(
-                id__in=AgentManager.objects.filter(manager=manager).values_list('agent_id', flat=True)):
-            # запоминаем, чтобы потом вставить суммирующие данные
-            requests = agent.request_set.filter(self.filter_date)
-            agent_total_requests, agent_unique_requests, agent_total_amount = get_count_and_amount(requests)
-            agent_requests_for_insert = []
-            for agent_request in requests.filter(Q(base_request=F('id')) | Q(base_request__isnull=True)):
-                agent_unique_request_for_insert = {
-                    'base': [
-                        agent_request.get_number(),
-                        agent_request.client.short_name,
-                        agent_request.created_date,
-                        'Архивная' if agent_request.in_archive else '',
-                        agent_request.required_amount
-                    ],
-                    'requests': [[
-                        request.get_number(),
-                        request.client.short_name or request.client.full_name,
-                        request.status_changed_date,
-                        request.bank.short_name if request.bank else '',
-                        request.status.name,
-                        request.required_amount,
-                        self.get_commission_bank(request),
-                        'БГ' if request.request_type == Request.TYPE_BG else 'ТЗ',
-                        request.get_current_bank_commission() and request.get_current_bank_commission()['commission'],
-                    ] for request in agent_request.request_set.filter(self.filter_date)]
-                }
-                agent_requests_for_insert.append(agent_unique_request_for_insert)
-
-            if agent_requests_for_insert:
-                data_for_insert.append({
-                    'total': [
-                        agent.short_name,
-                        agent_total_requests,
-                        agent_unique_requests,
-                        agent_total_amount
-                    ],
-                    'data': agent_requests_for_insert
-                })
-        if data_for_insert:
-            row = start_row + 1
-        else:
-            row = start_row
-        for d in data_for_insert:
-            start_row_agent = row
-            data.append(ExcelCellData(row=row, column=1, value=d['total'][0]))
-            data.append(ExcelCellData(row=row, column=2, value=d['total'][1]))
-            data.append(ExcelCellData(row=row, column=3, value=d['total'][2]))
-            data.append(ExcelCellData(row=row, column=12, value=d['total'][3]))
-            for i in range(2, 16):
-                data.append(ExcelCellData(row=row, column=i, color='FFC000'))
-            row += 1
-            for unique_request_group in d['data']:
-                data.append(ExcelCellData(row=row, column=4, value=unique_request_group['base'][0]))
-                data.append(ExcelCellData(row=row, column=6, value=unique_request_group['base'][1]))
-                data.append(
-                    ExcelCellData(row=row, column=7, value=unique_request_group['base'][2].strftime('%d.%m.%Y')))
-                data.append(ExcelCellData(row=row, column=9, value=unique_request_group['base'][3]))
-                data.append(ExcelCellData(row=row, column=12, value=unique_request_group['base'][4]))
-                row += 1
-                for r in unique_request_group['requests']:
-                    data.append(ExcelCellData(row=row, column=5, value=r[0]))
-                    data.append(ExcelCellData(row=row, column=6, value=unique_request_group['base'][1]))
-                    data.append(ExcelCellData(row=row, column=8, value=r[2].strftime('%d.%m.%Y')))
-                    data.append(ExcelCellData(row=row, column=9, value=r[7]))
-                    data.append(ExcelCellData(row=row, column=10, value=r[3]))
-                    data.append(ExcelCellData(row=row, column=11, value=r[4]))
-                    data.append(ExcelCellData(row=row, column=12, value=r[5]))
-                    data.append(ExcelCellData(row=row, column=13, value=r[8] or ''))
-                    data.append(ExcelCellData(row=row, column=14, value=r[6]))
-                    row += 1
-            data.append(ExcelCellData(
-                merge='A%i:A%i' % (start_row_agent, row - 1)
-            ))
-        return data, row
-
-    def get_loans_table(self, data, manager, start_row):
-        data_for_insert = []
-        for agent in self.agents.filter(
-                id__in=AgentManager.objects.filter(manager=manager).values_list('agent_id', flat=True)):
-            # запоминаем, чтобы потом вставить суммирующие данные
-            requests = agent.loanrequest_set.filter(self.filter_date)
-            agent_total_requests, agent_unique_requests, agent_total_amount = get_count_and_amount(requests)
-
-            agent_requests_for_insert = []
-            for agent_request in requests.filter(Q(base_request=F('id')) | Q(base_request__isnull=True)):
-                agent_unique_request_for_insert = {
-                    'base': [
-                        agent_request.get_number(),
-                        agent_request.client.short_name,
-                        agent_request.created_date,
-                        'Архивная' if agent_request.in_archive else '',
-                        agent_request.required_amount
-                    ],
-                    'requests': [[
-                        request.get_number(),
-                        request.client.full_name,
-                        request.status_changed_date,
-                        request.bank.short_name if request.bank else '',
-                        request.status.name,
-                        request.required_amount,
-                        self.get_commission_bank(request),
-                        'БГ' if request.request_type == Request.TYPE_BG else 'ТЗ',
-                        request.get_current_bank_commission() and request.get_current_bank_commission()['commission'],
-                    ] for request in agent_request.loanrequest_set.filter(self.filter_date)]
-                }
-                agent_requests_for_insert.append(agent_unique_request_for_insert)
-            if agent_requests_for_insert:
-                data_for_insert.append({
-                    'total': [
-                        agent.short_name,
-                        agent_total_requests,
-                        agent_unique_requests,
-                        agent_total_amount
-                    ],
-                    'data': agent_requests_for_insert
-                })
-        if data_for_insert:
-            row = start_row + 1
-        else:
-            row = start_row
-        for d in data_for_insert:
-            start_row_agent = row
-            data.append(ExcelCellData(row=row, column=1, value=d['total'][0]))
-            data.append(ExcelCellData(row=row, column=2, value=d['total'][1]))
-            data.append(ExcelCellData(row=row, column=3, value=d['total'][2]))
-            data.append(ExcelCellData(row=row, column=12, value=d['total'][3]))
-            for i in range(2, 16):
-                data.append(ExcelCellData(row=row, column=i, color='FFC000'))
-            row += 1
-            for unique_request_group in d['data']:
-                data.append(ExcelCellData(row=row, column=4, value=unique_request_group['base'][0]))
-                data.append(ExcelCellData(row=row, column=6, value=unique_request_group['base'][1]))
-                data.append(
-                    ExcelCellData(row=row, column=7, value=unique_request_group['base'][2].strftime('%d.%m.%Y')))
-                data.append(ExcelCellData(row=row, column=9, value=unique_request_group['base'][3]))
-                data.append(ExcelCellData(row=row, column=12, value=unique_request_group['base'][4]))
-                row += 1
-
-                for r in unique_request_group['requests']:
-                    data.append(ExcelCellData(row=row, column=5, value=r[0]))
-                    data.append(ExcelCellData(row=row, column=6, value=unique_request_group['base'][1]))
-                    data.append(ExcelCellData(row=row, column=8, value=r[2].strftime('%d.%m.%Y')))
-                    data.append(ExcelCellData(row=row, column=9, value=r[7]))
-                    data.append(ExcelCellData(row=row, column=10, value=r[3]))
-                    data.append(ExcelCellData(row=row, column=11, value=r[4]))
-                    data.append(ExcelCellData(row=row, column=12, value=r[5]))
-                    data.append(ExcelCellData(row=row, column=13, value=r[8] or ''))
-                    data.append(ExcelCellData(row=row, column=14, value=r[6]))
-                    row += 1
-            data.append(ExcelCellData(
-                merge='A%i:A%i' % (start_row_agent, row - 1)
-            ))
-        return data, row
-
-    def get_all_table(self, data, manager, start_row):
+    @staticmethod
+    def load_requests(querysets):
+        """
+        Заявки периода, сгруппированные по агенту и исходной заявке:
+        {id агента: {(модель, id исходной заявки): [заявки]}}.
+        Модель в ключе - id заявок БГ и ТЗ пересекаются
+        """
+        requests = defaultdict(lambda: defaultdict(list))
+        for queryset in querysets:
+            for request in queryset.select_related(
+                    'client', 'bank', 'status', 'offer'
+            ).order_by('id'):
+                key = (request._meta.label, request.base_request_id or request.id)
+                requests[request.agent_id][key].append(request)
+        return requests
+
+    def get_agent_request_groups(self, agent_requests):
+        groups = []
+        for (_, base_request_id), requests in agent_requests.items():
+            base_request = next(
+                (request for request in requests if request.id == base_request_id), None
+            )
+            # исходная заявка вне периода в отчет не попадает
+            if base_request is None:
+                continue
+            groups.append({
+                'base': [
+                    base_request.get_number(),
+                    base_request.client.short_name or base_request.client.full_name,
+                    base_request.created_date,
+                    'Архивная' if base_request.in_archive else '',
+                    base_request.required_amount
+                ],
+                # заявки, ссылающиеся на исходную (включая ее саму, если
+                # base_request заполнен), без исходной с пустым base_request
+                'requests': [[
+                    request.get_number(),
+                    request.client.short_name or request.client.full_name,
+                    request.status_changed_date,
+                    request.bank.short_name if request.bank else '',
+                    request.status.name,
+                    request.required_amount,
+                    self.get_commission_bank(request),
+                    'БГ' if request.request_type == Request.TYPE_BG else 'ТЗ',
+                    request.get_current_bank_commission() and request.get_current_bank_commission()['commission'],
+                ] for request in requests if request.base_request_id is not None]
+            })
+        return groups
+
+    def get_table(self, data, agents, matrix, requests, start_row):
         data_for_insert = []
-        row = start_row + 1
-        for agent in self.agents.filter(
-                id__in=AgentManager.objects.filter(manager=manager).values_list('agent_id', flat=True)):
-            # запоминаем, чтобы потом вставить суммирующие данные
-            requests = agent.request_set.filter(self.filter_date)
-            agent_total_requests, agent_unique_requests, agent_total_amount = get_count_and_amount(requests)
-            loan_requests = agent.loanrequest_set.filter(self.filter_date)
-            agent_total_loan_requests, agent_unique_loan_requests, agent_total_amount_loan_requests = get_count_and_amount(
-                loan_requests)
-            agent_total_requests += agent_total_loan_requests
-            agent_unique_requests += agent_unique_loan_requests
-            agent_total_amount += agent_total_amount_loan_requests
-            agent_requests_for_insert = []
-            for agent_request in requests.filter(Q(base_request=F('id')) | Q(base_request__isnull=True)):
-                agent_unique_request_for_insert = {
-                    'base': [
-                        agent_request.get_number(),
-                        agent_request.client.short_name,
-                        agent_request.created_date,
-                        'Архивная' if agent_request.in_archive else '',
-                        agent_request.required_amount
-                    ],
-                    'requests': [[
-                        request.get_number(),
-                        request.client.full_name,
-                        request.status_changed_date,
-                        request.bank.short_name if request.bank else '',
-                        request.status.name,
-                        request.required_amount,
-                        self.get_commission_bank(request),
-                        'БГ' if request.request_type == Request.TYPE_BG else 'ТЗ',
-                        request.get_current_bank_commission() and request.get_current_bank_commission()['commission'],
-                    ] for request in agent_request.request_set.filter(self.filter_date)]
-                }
-                agent_requests_for_insert.append(agent_unique_request_for_insert)
-            for agent_request in loan_requests.filter(Q(base_request=F('id')) | Q(base_request__isnull=True)):
-                agent_unique_request_for_insert = {
-                    'base': [
-                        agent_request.get_number(),
-                        agent_request.client.full_name,
-                        agent_request.created_date,
-                        'Архивная' if agent_request.in_archive else '',
-                        agent_request.required_amount
-                    ],
-                    'requests': [[
-                        request.get_number(),
-                        request.client.full_name,
-                        request.status_changed_date,
-                        request.bank.short_name if request.bank else '',
-                        request.status.name,
-                        request.required_amount,
-                        self.get_commission_bank(request),
-                        'БГ' if request.request_type == Request.TYPE_BG else 'ТЗ',
-                        request.get_current_bank_commission() and request.get_current_bank_commission()['commission'],
-                    ] for request in agent_request.loanrequest_set.filter(self.filter_date)]
-                }
-                agent_requests_for_insert.append(agent_unique_request_for_insert)
+        for agent in agents:
+            agent_requests_for_insert = self.get_agent_request_groups(
+                requests.get(agent.id, {})
+            )
             if agent_requests_for_insert:
                 data_for_insert.append({
                     'total': [
                         agent.short_name,
-                        agent_total_requests,
-                        agent_unique_requests,
-                        agent_total_amount
+                        matrix.get_count(agent.id),
+                        matrix.get_unique(agent.id),
+                        matrix.get_amount(agent.id)
                     ],
                     'data': agent_requests_for_insert
                 })
@@ -362,7 +176,6 @@ class OperationManagerReport(BaseReport):
                 data.append(ExcelCellData(row=row, column=9, value=unique_request_group['base'][3]))
                 data.append(ExcelCellData(row=row, column=12, value=unique_request_group['base'][4]))
                 row += 1
-
                 for r in unique_request_group['requests']:
                     data.append(ExcelCellData(row=row, column=5, value=r[0]))
                     data.append(ExcelCellData(row=row, column=6, value=unique_request_group['base'][1]))
@@ -0,0 +1,306 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from django.core.cache import cache
+
+from cabinet.base_logic.reports.generate.base import BaseReport
+from settings.settings import MEDIA_ROOT
+
+logger = logging.getLogger('django')
+
+
+def parse_date(value):
+    return datetime.datetime(*[int(i) for i in value.split('-')])
+
+
+class ReportJob:
+    """
+    Фоновое построение отчета (django_rq). Состояние задачи хранится в кеше:
+    статус, прогресс 0-100 и ссылка на файл. Результат для одинаковых
+    параметров переиспользуется в течение RESULT_TTL
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    JOB_KEY = 'report_job_%s'
+    RESULT_KEY = 'report_job_result_%s'
+    RUNNING_KEY = 'report_job_running_%s'
+    JOB_TTL = 24 * 60 * 60
+    RESULT_TTL = 10 * 60
+    # файлы отчетов старше этого срока удаляются
+    FILES_TTL = 24 * 60 * 60
+
+    # name: (функция построения отчета, зависит ли отчет от пользователя)
+    reports = {}
+    # name: (обязательные параметры, форматы дат параметров)
+    params_rules = {}
+    # названия параметров для сообщений об ошибках
+    PARAM_LABELS = {
+        'date_from': 'Период с',
+        'date_to': 'Период по',
+        'date': 'Месяц',
+        'product': 'Тип продукта',
+        'manager': 'Менеджер',
+        'agent': 'Агент',
+        'filter': 'Фильтр',
+    }
+
+    def __init__(self, report, params, user_id, id=None, status=STATUS_QUEUED,
+                 progress=0, result=None, error='', from_cache=False):
+        self.id = id or uuid.uuid4().hex
+        self.report = report
+        self.params = params
+        self.user_id = user_id
+        self.status = status
+        self.progress = progress
+        self.result = result
+        self.error = error
+        self.from_cache = from_cache
+
+    @classmethod
+    def register(cls, name, per_user=False, required=(), date_formats=None):
+        """
+        Регистрация отчета: функция (params, user) -> BaseReport.
+        per_user - данные отчета зависят от прав пользователя,
+        required - обязательные параметры, date_formats - формат
+        (strptime) параметров-дат
+        """
+        def decorator(func):
+            cls.reports[name] = (func, per_user)
+            cls.params_rules[name] = (required, date_formats or {})
+            return func
+        return decorator
+
+    @classmethod
+    def validate(cls, report, params) -> list:
+        """ Ошибки параметров отчета, пустой список - можно ставить в очередь """
+        if report not in cls.reports:
+            return ['Неизвестный отчет']
+        if not isinstance(params, dict):
+            return ['Неверные параметры отчета']
+        required, date_formats = cls.params_rules[report]
+        errors = [
+            'Заполните поле "%s"' % cls.PARAM_LABELS.get(name, name)
+            for name in required if not params.get(name)
+        ]
+        for name, date_format in date_formats.items():
+            if not params.get(name):
+                continue
+            try:
+                datetime.datetime.strptime(str(params[name]), date_format)
+            except ValueError:
+                errors.append('Неверный формат поля "%s"' % cls.PARAM_LABELS.get(
+                    name, name
+                ))
+        return errors
+
+    @property
+    def params_key(self):
+        func, per_user = self.reports[self.report]
+        return hashlib.md5(json.dumps({
+            'report': self.report,
+            'params': self.params,
+            'user': self.user_id if per_user else None,
+        }, sort_keys=True).encode()).hexdigest()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'report': self.report,
+            'params': self.params,
+            'user_id': self.user_id,
+            'status': self.status,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+            'from_cache': self.from_cache,
+        }
+
+    def save(self):
+        cache.set(self.JOB_KEY % self.id, self.to_dict(), self.JOB_TTL)
+
+    @classmethod
+    def get(cls, job_id):
+        data = cache.get(cls.JOB_KEY % job_id)
+        return cls(**data) if data else None
+
+    def is_available_for(self, user):
+        """
+        Задача отчета, не зависящего от пользователя, общая для всех,
+        кто поставил отчет с теми же параметрами
+        """
+        func, per_user = self.reports.get(self.report, (None, True))
+        return not per_user or self.user_id == user.id
+
+    @classmethod
+    def submit(cls, report, params, user):
+        """
+        Постановка отчета в очередь. Если отчет с такими параметрами уже
+        построен или строится, возвращается готовый результат или текущая задача
+        """
+        if report not in cls.reports:
+            raise ValueError('Неизвестный отчет %s' % report)
+        job = cls(report, params, user.id)
+        params_key = job.params_key
+
+        result = cache.get(cls.RESULT_KEY % params_key)
+        if result:
+            job.status = cls.STATUS_DONE
+            job.progress = 100
+            job.result = result
+            job.from_cache = True
+            job.save()
+            return job
+
+        # задача сохраняется до захвата ключа: параллельная постановка
+        # не должна принять захваченный ключ за оставшийся от старой задачи
+        job.save()
+        running_key = cls.RUNNING_KEY % params_key
+        while not cache.add(running_key, job.id, cls.JOB_TTL):
+            running = cls.get(cache.get(running_key))
+            if running and running.status in [cls.STATUS_QUEUED, cls.STATUS_RUNNING]:
+                return running
+            # ключ остался от завершенной или удаленной задачи
+            cache.delete(running_key)
+
+        from cabinet.tasks import task_generate_report
+        task_generate_report.delay(job.id)
+        return job
+
+    def set_progress(self, progress):
+        if progress != self.progress:
+            self.progress = progress
+            self.save()
+
+    def build_report(self) -> BaseReport:
+        from users.models import User
+        func, per_user = self.reports[self.report]
+        return func(self.params, User.objects.get(id=self.user_id))
+
+    def run(self):
+        self.status = self.STATUS_RUNNING
+        self.save()
+        params_key = self.params_key
+        try:
+            self.cleanup_files()
+            report = self.build_report()
+            report.progress_callback = self.set_progress
+            if self.params.get('writer') == BaseReport.WRITER_FAST:
+                report.writer = BaseReport.WRITER_FAST
+            if self.params.get('extension') == 'pdf':
+                result = report.generate_pdf()
+            else:
+                result = report.generate()
+            if result.error:
+                raise Exception(result.error)
+            self.result = {
+                'report': result.file_path,
+                'name': result.output_name,
+            }
+            self.status = self.STATUS_DONE
+            self.progress = 100
+            cache.set(self.RESULT_KEY % params_key, self.result, self.RESULT_TTL)
+        except Exception as error:
+            logger.exception(error)
+            self.status = self.STATUS_FAILED
+            self.error = str(error)
+        finally:
+            if cache.get(self.RUNNING_KEY % params_key) == self.id:
+                cache.delete(self.RUNNING_KEY % params_key)
+            self.save()
+
+    @classmethod
+    def cleanup_files(cls):
+        """ Удаление старых файлов отчетов """
+        reports_dir = os.path.join(MEDIA_ROOT, BaseReport.reports_dir)
+        if not os.path.isdir(reports_dir):
+            return
+        expired = time.time() - cls.FILES_TTL
+        for name in os.listdir(reports_dir):
+            path = os.path.join(reports_dir, name)
+            if os.path.isdir(path) and os.path.getmtime(path) < expired:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+@ReportJob.register(
+    'manager_plan_executing',
+    required=('date_from', 'date_to', 'product', 'manager'),
+    date_formats={'date_from': '%Y-%m-%d', 'date_to': '%Y-%m-%d'}
+)
+def manager_plan_executing_report(params, user):
+    from cabinet.base_logic.reports.generate.manager_plan_executing import (
+        ManagerPlanExecutingReport
+    )
+    return ManagerPlanExecutingReport(
+        parse_date(params['date_from']), parse_date(params['date_to']),
+        params['product'], params['manager']
+    )
+
+
+@ReportJob.register(
+    'operation_manager',
+    required=('date_from', 'date_to', 'product', 'manager', 'agent'),
+    date_formats={'date_from': '%Y-%m-%d', 'date_to': '%Y-%m-%d'}
+)
+def operation_manager_report(params, user):
+    from cabinet.base_logic.reports.generate.operation_manager_report import (
+        OperationManagerReport
+    )
+    return OperationManagerReport(
+        parse_date(params['date_from']), parse_date(params['date_to']),
+        params['product'], params['manager'], params['agent']
+    )
+
+
+@ReportJob.register(
+    'load_on_manager',
+    required=('date_from', 'date_to', 'product', 'manager', 'agent'),
+    date_formats={'date_from': '%Y-%m-%d', 'date_to': '%Y-%m-%d'}
+)
+def load_on_manager_report(params, user):
+    from cabinet.base_logic.reports.generate.load_on_manager import (
+        LoadOnManagerReport
+    )
+    return LoadOnManagerReport(
+        parse_date(params['date_from']), parse_date(params['date_to']),
+        params['product'], params['manager'], params['agent']
+    )
+
+
+@ReportJob.register('sales')
+def sales_report(params, user):
+    from cabinet.base_logic.reports.generate.sales_report import SalesReport
+    return SalesReport(date=params.get('date'))
+
+
+@ReportJob.register('requests_funnel')
+def requests_funnel_report(params, user):
+    from cabinet.base_logic.reports.generate.funnel_report import SalesFunnelReport
+    return SalesFunnelReport(
+        from_month=params.get('from_month'),
+        from_year=params.get('from_year'),
+    )
+
+
+@ReportJob.register('export_requests', per_user=True, required=('filter',))
+def export_requests_report(params, user):
+    from cabinet.base_logic.reports.generate.export_requests import ExportRequests
+    return ExportRequests.for_user(user, params)
+
+
+@ReportJob.register(
+    'manager_statistics', required=('date',), date_formats={'date': '%Y-%m'}
+)
+def manager_statistics_report(params, user):
+    from cabinet.base_logic.reports.manager_statistics_report import (
+        ManagerStatisticsReportBuilder
+    )
+    return ManagerStatisticsReportBuilder().build(params['date'])
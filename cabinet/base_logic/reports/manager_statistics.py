@@ -0,0 +1,244 @@
+import datetime
+from collections import defaultdict, namedtuple
+
+from django.db.models import (
+    BooleanField, Case, Count, IntegerField, Q, Sum, Value, When
+)
+from django.db.models.functions import Coalesce
+
+from bank_guarantee.models import Request, RequestHistory
+from cabinet.base_logic.reports.statistics import (
+    RequestStatistics, Totals, month_range
+)
+from clients.models import AgentManager
+
+Row = namedtuple('Row', [
+    'client_id', 'client_agent_id', 'agent_id', 'bank_id', 'status_id',
+    'is_unique', 'interval_period', 'amount_bucket',
+    'count', 'amount', 'commission', 'interval',
+])
+
+# периоды interval_from относительно месяца отчета
+PERIOD_CURRENT = 0
+PERIOD_PREVIOUS = 1
+
+# границы сумм предложений для отчета по структуре
+AMOUNT_BUCKETS = [
+    ('to_1_mln', 1000000),
+    ('1-5_mln', 5000000),
+    ('5-15_mln', 15000000),
+    ('from_15_mln', None),
+]
+
+
+class ManagerStatistics:
+    """
+    Базовый набор данных для статистики менеджеров за месяц.
+    Заявки месяца загружаются одним сгруппированным запросом в разрезе
+    клиент x агент x банк x статус x уникальность x период срока БГ
+    x диапазон суммы предложения. Из этого набора считаются показатели
+    менеджеров, конверсия по банкам, динамика месяца и структура заявок
+    """
+
+    def __init__(self, date):
+        self.date = date
+        self.date_from, self.date_to = month_range(date)
+        self.rows = []
+        self.exhibited = {}
+
+    def get_queryset(self):
+        return Request.objects.filter(
+            status_changed_date__gte=self.date_from,
+            status_changed_date__lt=self.date_to,
+        )
+
+    def get_interval_period(self):
+        date_from = self.date_from.date()
+        date_to = self.date_to.date()
+        prev_from = (date_from - datetime.timedelta(days=1)).replace(day=1)
+        return Case(
+            When(interval_from__gte=date_from, interval_from__lt=date_to,
+                 then=Value(PERIOD_CURRENT)),
+            When(interval_from__gte=prev_from, interval_from__lt=date_from,
+                 then=Value(PERIOD_PREVIOUS)),
+            default=Value(None),
+            output_field=IntegerField()
+        )
+
+    @staticmethod
+    def get_amount_bucket():
+        whens = []
+        low = None
+        for index, (name, high) in enumerate(AMOUNT_BUCKETS):
+            condition = Q(offer__amount__isnull=False)
+            if low is not None:
+                condition &= Q(offer__amount__gt=low)
+            if high is not None:
+                condition &= Q(offer__amount__lte=high)
+            whens.append(When(condition, then=Value(index)))
+            low = high
+        return Case(*whens, default=Value(None), output_field=IntegerField())
+
+    def load(self) -> 'ManagerStatistics':
+        queryset = self.get_queryset()
+        rows = queryset.annotate(
+            is_unique=Case(
+                When(base_request__isnull=False, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            ),
+            interval_period=self.get_interval_period(),
+            amount_bucket=self.get_amount_bucket(),
+        ).values(
+            'client_id', 'client__agent_company_id', 'agent_id', 'bank_id',
+            'status_id', 'is_unique', 'interval_period', 'amount_bucket',
+        ).annotate(
+            count=Count('id'),
+            amount=Coalesce(Sum('offer__amount'), 0),
+            commission=Coalesce(Sum('offer__commission_bank'), 0),
+            interval_sum=Coalesce(Sum('interval'), 0),
+        ).order_by()
+        self.rows = [Row(
+            row['client_id'], row['client__agent_company_id'], row['agent_id'],
+            row['bank_id'], row['status_id'], row['is_unique'],
+            row['interval_period'], row['amount_bucket'],
+            row['count'], row['amount'], row['commission'], row['interval_sum'],
+        ) for row in rows.iterator()]
+
+        # выставлено предложений - записи истории по заявкам месяца
+        self.exhibited = dict(RequestHistory.objects.filter(
+            request__in=queryset
+        ).values('request__client__agent_company_id').annotate(
+            count=Count('id')
+        ).order_by().values_list('request__client__agent_company_id', 'count'))
+        return self
+
+    def select(self, statuses=None, exclude_statuses=None, unique=None,
+               interval_period=None, with_bank=False, client_agents=None):
+        for row in self.rows:
+            if statuses is not None and row.status_id not in statuses:
+                continue
+            if exclude_statuses is not None and row.status_id in exclude_statuses:
+                continue
+            if unique is not None and row.is_unique != unique:
+                continue
+            if interval_period is not None and row.interval_period != interval_period:
+                continue
+            if with_bank and row.bank_id is None:
+                continue
+            if client_agents is not None and row.client_agent_id not in client_agents:
+                continue
+            yield row
+
+    def get(self, **conditions) -> Totals:
+        count, amount, commission = 0, 0, 0
+        for row in self.select(**conditions):
+            count += row.count
+            amount += row.amount
+            commission += row.commission
+        return Totals(count, amount, commission)
+
+    def distinct(self, field, **conditions) -> int:
+        return len({getattr(row, field) for row in self.select(**conditions)})
+
+    def get_request_statistics(self) -> RequestStatistics:
+        """ Сводка банк x статус x уникальность для отчета по банкам """
+        statistics = RequestStatistics(self.date_from, self.date_to, requests=[])
+        cells = defaultdict(lambda: [0, 0, 0])
+        for row in self.rows:
+            cell = cells[(row.bank_id, row.status_id, row.is_unique)]
+            cell[0] += row.count
+            cell[1] += row.amount
+            cell[2] += row.commission
+        statistics.cells = {key: Totals(*value) for key, value in cells.items()}
+        return statistics
+
+    def get_amounts_by_bucket(self, statuses) -> dict:
+        result = {name: 0 for name, _ in AMOUNT_BUCKETS}
+        for row in self.select(statuses=statuses):
+            if row.amount_bucket is not None:
+                result[AMOUNT_BUCKETS[row.amount_bucket][0]] += row.amount
+        return result
+
+    def get_requests_by_period(self, interval_period) -> dict:
+        """ Уникальные заявки месяца по сроку БГ с начала месяца interval_period """
+        return {
+            'unique_request': self.get(
+                unique=True, interval_period=interval_period
+            ).count,
+            'unique_request_exc_blank': self.get(
+                unique=True, interval_period=interval_period, exclude_statuses=[26]
+            ).count,
+        }
+
+    @staticmethod
+    def get_managers_agents(managers) -> dict:
+        """ {id менеджера: множество id агентов} одним запросом """
+        result = {manager.id: set() for manager in managers}
+        links = AgentManager.objects.filter(manager__in=managers).values_list(
+            'manager_id', 'agent_id'
+        )
+        for manager_id, agent_id in links:
+            result[manager_id].add(agent_id)
+        return result
+
+    def get_agent_totals(self) -> dict:
+        """ Итоги уникальных заявок по агентам клиентов за один проход """
+        result = defaultdict(lambda: defaultdict(int))
+        for row in self.select(unique=True):
+            totals = result[row.client_agent_id]
+            totals['unique_request'] += row.count
+            totals['interval'] += row.interval
+            if row.status_id != 26:
+                totals['unique_request_exc_blank'] += row.count
+                totals['required_amount'] += row.amount
+            if row.status_id == 12:
+                totals['required_amount_done'] += row.amount
+                totals['num_required_amount_done'] += row.count
+                totals['commission_bank'] += row.commission
+        return result
+
+    def get_manager_data(self, managers) -> dict:
+        """
+        Показатели менеджеров по уникальным заявкам клиентов,
+        закрепленных за агентами менеджера
+        """
+        managers_agents = self.get_managers_agents(managers)
+        agent_totals = self.get_agent_totals()
+        all_commission_bank = self.get().commission
+        fields = [
+            'unique_request', 'unique_request_exc_blank', 'required_amount',
+            'required_amount_done', 'num_required_amount_done', 'commission_bank',
+        ]
+        data = {}
+        for manager in managers:
+            agents = managers_agents[manager.id]
+            totals = {field: 0 for field in fields}
+            interval = 1
+            exhibited = 0
+            for agent_id in agents:
+                for field in fields:
+                    totals[field] += agent_totals[agent_id][field]
+                interval += agent_totals[agent_id]['interval']
+                exhibited += self.exhibited.get(agent_id, 0)
+            done_count = totals['num_required_amount_done']
+            data[manager.id] = dict(
+                name=manager.first_name,
+                request_list=[],
+                part_commission_bank=(
+                    totals['commission_bank'] / all_commission_bank
+                    if all_commission_bank else 0
+                ),
+                avg_required_amount=(
+                    totals['required_amount_done'] / done_count if done_count else 0
+                ),
+                avg_term=totals['unique_request'] / interval,
+                conversion=(
+                    done_count / totals['unique_request_exc_blank']
+                    if totals['unique_request_exc_blank'] else 0
+                ),
+                exhibited=exhibited,
+                take_rate=done_count / exhibited if exhibited else 0,
+                **totals
+            )
+        return data
@@ -0,0 +1,472 @@
+import datetime
+import decimal
+
+from cabinet.base_logic.reports.generate.bank_request_report import (
+    BankRequestReport
+)
+from cabinet.base_logic.reports.generate.manager_request_report import (
+    ManagerRequestReport
+)
+from cabinet.base_logic.reports.generate.month_dynamics_request_report import (
+    MonthDynamicsRequestReport
+)
+from cabinet.base_logic.reports.generate.structure_report import (
+    StructureRequestReport
+)
+from cabinet.base_logic.reports.manager_statistics import (
+    ManagerStatistics, PERIOD_CURRENT, PERIOD_PREVIOUS
+)
+from cabinet.base_logic.reports.statistics import RequestStatistics
+from clients.models import AgentManager, Bank
+
+
+class ManagerStatisticsReportBuilder:
+    """
+    Отчет статистики менеджеров за месяц 'ГГГГ-ММ': листы менеджеров,
+    конверсии по банкам, динамики месяца и структуры предложений
+    """
+
+    def get_overall_result(self, bank_data):
+        count_fields = [
+            "all_requests", "requests_done", "unreached_requests", "issued",
+        ]
+        value_fields = [
+            "avg_bg_sum", "commission_requests", "conversion",
+            "verification_requests", "avg_bg_sum_issued_request",
+            "comissoion_issued", "conversion_issued_to_exhibited",
+            "conversion_issued_to_exhibited_by_value", "conversion_issued_to_all",
+        ]
+        overall_result = {field: 0 for field in count_fields + value_fields}
+        for bank_id, bank_value in bank_data.items():
+            for field in count_fields:
+                overall_result[field] += bank_value[field] or 0
+            for field in value_fields:
+                overall_result[field] += (
+                    decimal.Decimal(bank_value[field])
+                    if bank_value[field] is not None else 0)
+        return overall_result
+
+    def get_bank_data(self, statistics, bank_id=None, unique=False):
+        def totals(statuses=None, exclude_statuses=None):
+            return statistics.get(
+                statuses=statuses, exclude_statuses=exclude_statuses,
+                bank_id=bank_id, unique=unique
+            )
+
+        # Во всех статусах (без черновиков)
+        all_requests = totals(exclude_statuses=[26])
+        # Банк направил предложение + выдана+предложение+
+        # предложение принято+отклонено клиентом+ на выдачу
+        requests_done = totals(statuses=[9, 12, 10, 14, 11])
+        # Не дошло до банка из-за верификации
+        unreached_requests = totals(statuses=[28, 29])
+        # Заявки в статусе Направлена
+        directed = totals(statuses=[6])
+        # Заявки в статусе Выдана
+        issued = totals(statuses=[12])
+        # Заявки в статусе Предложение
+        offer = totals(statuses=[9])
+        # Заявки в статусе Предложение принято
+        accepted = totals(statuses=[10])
+        # Заявки в статусе Отклонено Клинетом
+        revoked_client = totals(statuses=[14])
+        # Заявки в статусе На Выдачу
+        for_issue = totals(statuses=[11])
+
+        # Средняя сумма БГ
+        try:
+            avg_bg_sum = (offer.amount +
+                          issued.amount +
+                          accepted.amount +
+                          revoked_client.amount +
+                          for_issue.amount
+                          ) / (directed.count +
+                               issued.count +
+                               offer.count +
+                               accepted.count +
+                               revoked_client.count +
+                               for_issue.count
+                               )
+        except ZeroDivisionError:
+            avg_bg_sum = None
+        # Комиссия
+        try:
+            commission_requests = (offer.commission +
+                                   accepted.commission +
+                                   issued.commission
+                                   ) / (issued.commission +
+                                        offer.commission +
+                                        accepted.commission +
+                                        revoked_client.commission +
+                                        for_issue.commission
+                                        )
+        except ZeroDivisionError:
+            commission_requests = None
+        # Конверсия
+        try:
+            conversion = (offer.count +
+                          accepted.count +
+                          revoked_client.count +
+                          for_issue.count
+                          ) / all_requests.count
+        except ZeroDivisionError:
+            conversion = None
+
+        # C учетом верификации
+        try:
+            verification_requests = (issued.count +
+                                     offer.count +
+                                     accepted.count +
+                                     revoked_client.count +
+                                     for_issue.count
+                                     ) / (
+                                        all_requests.count - unreached_requests.count
+                                    )
+        except ZeroDivisionError:
+            verification_requests = None
+
+        # Средняя сумма БГ по выданным
+        try:
+            avg_bg_sum_issued_request = issued.amount / issued.count
+        except ZeroDivisionError:
+            avg_bg_sum_issued_request = None
+
+        # Конверсия выданных БГ к выставленным предложений
+        try:
+            conversion_issued_to_exhibited = issued.count / (
+                issued.count +
+                offer.count +
+                accepted.count +
+                revoked_client.count
+            )
+        except ZeroDivisionError:
+            conversion_issued_to_exhibited = None
+
+        # Конверсия выданных БГ к выставленым предложений (по объему комиссии)
+        try:
+            conversion_issued_to_exhibited_by_value = issued.commission / (
+                offer.commission +
+                issued.commission +
+                accepted.commission
+            )
+        except ZeroDivisionError:
+            conversion_issued_to_exhibited_by_value = None
+
+        # Конверсия выданных к "во всех статусах"
+        try:
+            conversion_issued_to_all = issued.count / all_requests.count
+        except ZeroDivisionError:
+            conversion_issued_to_all = None
+
+        return {
+            "all_requests": all_requests.count,
+            "requests_done": requests_done.count,
+            "unreached_requests": unreached_requests.count,
+            "avg_bg_sum": avg_bg_sum,
+            "commission_requests": commission_requests,
+            "conversion": conversion,
+            "verification_requests": verification_requests,
+            # Выдано
+            "issued": issued.count,
+            "avg_bg_sum_issued_request": avg_bg_sum_issued_request,
+            # Комиссия по выданным
+            "comissoion_issued": issued.commission,
+            "conversion_issued_to_exhibited": conversion_issued_to_exhibited,
+            "conversion_issued_to_exhibited_by_value":
+                conversion_issued_to_exhibited_by_value,
+            "conversion_issued_to_all": conversion_issued_to_all,
+        }
+
+    def generate_bank_report(self, date, statistics=None):
+        """
+        Конверсия по банкам за месяц. Все показатели считаются
+        из одной сводки RequestStatistics
+        """
+        if statistics is None:
+            statistics = RequestStatistics.for_month(date)
+
+        bank_data = dict()
+        overall_unique_result = dict()
+        for bank in Bank.objects.all():
+            bank_data[bank.id] = self.get_bank_data(statistics, bank.id)
+            bank_data[bank.id]["name"] = bank.full_name
+            overall_unique_result[bank.id] = self.get_bank_data(
+                statistics, bank.id, unique=True
+            )
+
+        overall_data = self.get_overall_result(bank_data)
+        overall_data["name"] = "Общий итог"
+        overall_unique_data = self.get_overall_result(overall_unique_result)
+        overall_unique_data["name"] = "Из них уникальных"
+
+        result = BankRequestReport(bank_data=bank_data,
+                                   overall_data=overall_data,
+                                   overall_unique_data=overall_unique_data)
+        return result
+
+    def define_business_days(self, date):
+        now = datetime.datetime.now()
+        now = datetime.date(now.year, now.month, now.day)
+
+        date = datetime.datetime.strptime(date, '%Y-%m')
+
+        holidays = {}
+        businessdays = 0
+        for i in range(1, 32):
+            try:
+                thisdate = datetime.date(date.year, date.month, i)
+            except(ValueError):
+                break
+            if (thisdate.weekday() < 5 and thisdate < now and thisdate not in holidays):
+                # Monday == 0, Sunday == 6
+                businessdays += 1
+
+        return businessdays
+
+    def get_structure_report(self, date, dataset=None):
+        """ Структура предложений по суммам, из базового набора ManagerStatistics """
+        if dataset is None:
+            dataset = ManagerStatistics(date).load()
+
+        # Выдана, Одобрена, Предложение, Предложение принято
+        issued_dict = dataset.get_amounts_by_bucket([12])
+        approve_dict = dataset.get_amounts_by_bucket([20])
+        offer_dict = dataset.get_amounts_by_bucket([9])
+        accepted_dict = dataset.get_amounts_by_bucket([10])
+        rows = [issued_dict, approve_dict, offer_dict, accepted_dict]
+
+        # Сумма по столбцу
+        total_col = {
+            name: sum(row[name] for row in rows) for name in issued_dict
+        }
+        # Сумма по строке
+        for row in rows + [total_col]:
+            row["total_row"] = sum(row.values())
+
+        result = StructureRequestReport(issued_dict=issued_dict,
+                                        approve_dict=approve_dict,
+                                        offer_dict=offer_dict,
+                                        accepted_dict=accepted_dict,
+                                        total_col=total_col)
+
+        return result
+
+    def get_month_dynamics(self, date, dataset=None):
+        """ Динамика месяца, из базового набора ManagerStatistics """
+        if dataset is None:
+            dataset = ManagerStatistics(date).load()
+        month_dynamics = dict()
+        month_dynamics["businessdays"] = self.define_business_days(date)
+
+        # Кол-во ИНН агента, по которым есть заявки в любом статусе
+        month_dynamics["unique_agents"] = dataset.distinct('agent_id')
+
+        # Кол-во ИНН агента, по которым гарантия выдана
+        month_dynamics["unique_agents_issued"] = dataset.distinct(
+            'agent_id', statuses=[12]
+        )
+
+        # Кол-во ИНН клиента  по которым есть заявки в любом статусе
+        month_dynamics["unique_clients"] = dataset.distinct('client_id')
+
+        # Кол-во ИНН клиента, по которым гарантия выдана
+        month_dynamics["unique_clients_issued"] = dataset.distinct(
+            'client_id', statuses=[12]
+        )
+
+        # Кол-во уникальных заявок во всех статусах (без учета прошлого месяца)
+        month_dynamics["unique_requests_month"] = dataset.get(
+            interval_period=PERIOD_CURRENT
+        ).count
+
+        # Кол-во уникальных, за исключением черновиков (без заявок прошлого месяца)
+        month_dynamics["unique_requests_month_exc_blank"] = dataset.get(
+            interval_period=PERIOD_CURRENT, exclude_statuses=[26]
+        ).count
+
+        # Кол-во заявок из отчета Максима
+        month_dynamics["maxim_report"] = None
+
+        # Кол-во уникальных, за исключением черновиков/кол-во рабочих дней
+        try:
+            month_dynamics["unique_requests_month_exc_blank_to_workday"] = (
+                month_dynamics["unique_requests_month_exc_blank"]
+                / month_dynamics["businessdays"]
+            )
+        except ZeroDivisionError:
+            month_dynamics["unique_requests_month_exc_blank_to_workday"] = 0
+
+        # Кол-во заявок из отчета Максима/ на кол-во рабочих дней
+        month_dynamics["maxim_report_to_workday"] = None
+
+        # Всего заявок на банки во всех статусах  без черновиков (неуникальных)
+        month_dynamics["requests_in_bank"] = dataset.get(
+            with_bank=True, exclude_statuses=[26]
+        ).count
+
+        # Кол-во уникальных заявок на банки без черновиков
+        month_dynamics["unique_requests_in_bank"] = month_dynamics["requests_in_bank"]
+
+        # Выставлено предложений (неуникальных)
+        month_dynamics["offer_requests"] = dataset.get(statuses=[9]).count
+
+        # Выставлено предложений (уникальных)
+        month_dynamics["unique_offer_requests"] = month_dynamics["offer_requests"]
+
+        # Выдано БГ
+        month_dynamics["month_issued"] = dataset.get(statuses=[12]).count
+
+        # Конверсия выданных/к зашедшим (уникальные)
+        if month_dynamics["unique_requests_in_bank"]:
+            month_dynamics["conversion_issued_to_unique_requests_in_bank"] = (
+                month_dynamics["month_issued"] / month_dynamics["unique_requests_in_bank"]
+            )
+        else:
+            month_dynamics["conversion_issued_to_unique_requests_in_bank"] = 0
+
+        if month_dynamics["requests_in_bank"]:
+            # Конверсия выданных/к зашедшим (неуникальные)
+            # Конверсия заведено без черновиков/ выдано
+            month_dynamics["conversion_issued_to_requests_in_bank"] = (
+                month_dynamics["month_issued"] / month_dynamics["requests_in_bank"]
+            )
+            # Конверсия заведено/ выставлено предложений
+            month_dynamics["conversion_offer_to_requests_in_bank"] = (
+                month_dynamics["offer_requests"] / month_dynamics["requests_in_bank"]
+            )
+        else:
+            month_dynamics["conversion_issued_to_requests_in_bank"] = 0
+            month_dynamics["conversion_offer_to_requests_in_bank"] = 0
+
+        # Конверсия  выставлено предложение/ выдано
+        if month_dynamics["offer_requests"]:
+            month_dynamics["conversion_offer_to_issued"] = (
+                month_dynamics["month_issued"] / month_dynamics["offer_requests"]
+            )
+        else:
+            month_dynamics["conversion_offer_to_issued"] = 0
+
+        # Конверсия  выставлено предложение/ выдано (по уникальным)
+        if month_dynamics["unique_offer_requests"]:
+            month_dynamics["conversion_offer_to_unique_issued"] = (
+                month_dynamics["month_issued"] / month_dynamics["unique_offer_requests"]
+            )
+        else:
+            month_dynamics["conversion_offer_to_unique_issued"] = 0
+
+        if month_dynamics["unique_agents"]:
+            # Кол-во уникальных заявок на одного работающего агента
+            month_dynamics["unique_request_per_agent"] = (
+                month_dynamics["unique_requests_month"] / month_dynamics["unique_agents"]
+            )
+            # Кол-во уникальных заявок (за исключением черновиков)
+            # на одного работающего агента
+            month_dynamics["unique_requests_exc_blank_per_agent"] = (
+                month_dynamics["unique_requests_month_exc_blank"]
+                / month_dynamics["unique_agents"]
+            )
+        else:
+            month_dynamics["unique_request_per_agent"] = 0
+            month_dynamics["unique_requests_exc_blank_per_agent"] = 0
+
+        # Кол-во выданных гарантий на 1 агента
+        if month_dynamics["unique_agents_issued"]:
+            month_dynamics["issued_per_agent_issued"] = (
+                month_dynamics["month_issued"] / month_dynamics["unique_agents_issued"]
+            )
+        else:
+            month_dynamics["issued_per_agent_issued"] = 0
+
+        all_requests = dataset.get()
+        # Средний чек (сумма БГ)
+        try:
+            month_dynamics["avg_receipt_bg"] = all_requests.amount / all_requests.count
+        except ZeroDivisionError:
+            month_dynamics["avg_receipt_bg"] = 0
+
+        # Средний чек (комиссия)
+        try:
+            month_dynamics["avg_receipt_comission"] = all_requests.commission / (
+                dataset.get(statuses=[9, 10, 12]).count
+            )
+        except ZeroDivisionError:
+            month_dynamics["avg_receipt_comission"] = 0
+
+        # Средняя комиссия по выставленным предложениям ( без выданных)
+        try:
+            month_dynamics["avg_receipt_comission_exc_issued"] = all_requests.commission / (
+                dataset.get(statuses=[9, 10]).count
+            )
+        except ZeroDivisionError:
+            month_dynamics["avg_receipt_comission_exc_issued"] = 0
+
+        # Комиссия млн. руб.
+        month_dynamics["all_commission_sum"] = all_requests.commission
+
+        result = MonthDynamicsRequestReport(month_dynamics=month_dynamics, date=date)
+
+        return result
+
+    def get_total_data(self, manager_data):
+        fields = [
+            "unique_request", "unique_request_exc_blank", "required_amount",
+            "required_amount_done", "commission_bank", "part_commission_bank",
+            "avg_required_amount", "num_required_amount_done", "avg_term",
+            "conversion", "exhibited", "take_rate",
+        ]
+        total_result = {field: 0 for field in fields}
+        for manager, data in manager_data.items():
+            for field in fields:
+                total_result[field] += data[field]
+        return total_result
+
+    def build(self, date):
+        """
+        Статистика менеджеров за месяц 'ГГГГ-ММ'. Все листы отчета
+        строятся из одного базового набора ManagerStatistics
+        """
+        dataset = ManagerStatistics(date).load()
+
+        bank_statistic_data = self.generate_bank_report(
+            date, statistics=dataset.get_request_statistics()
+        )
+        month_dynamics = self.get_month_dynamics(date, dataset=dataset)
+        structure_data = self.get_structure_report(date, dataset=dataset)
+
+        data = dataset.get_manager_data(list(AgentManager.get_managers()))
+
+        # Общий итог
+        total_data = self.get_total_data(data)
+        total_data["name"] = "Общий итог"
+
+        # Без заявок прошлого месяца
+        requests_without_last_month = dataset.get_requests_by_period(PERIOD_CURRENT)
+        requests_without_last_month["name"] = "Без заявок прошлого месяца"
+
+        # Количество заявок прошлого месяца
+        requests_last_month = dataset.get_requests_by_period(PERIOD_PREVIOUS)
+        requests_last_month["name"] = "Клоичество заявок прошлого месяца"
+
+        # Среднее кол-во заявок в р.д.
+        businessdays = self.define_business_days(date)
+        requests_to_businessdays = dict()
+        requests_to_businessdays["unique_request"] = businessdays
+        try:
+            requests_to_businessdays["unique_request_exc_blank"] = (
+                (total_data["unique_request_exc_blank"] -
+                 requests_last_month["unique_request_exc_blank"])
+                / businessdays)
+        except ZeroDivisionError:
+            requests_to_businessdays["unique_request_exc_blank"] = 0
+        requests_to_businessdays["name"] = "Среднее кол-во заявок в р.д."
+
+        return ManagerRequestReport(
+            manager_data=data,
+            total_data=total_data,
+            requests_last_month=requests_last_month,
+            requests_without_last_month=requests_without_last_month,
+            requests_to_businessdays=requests_to_businessdays,
+            bank_statistic_data=bank_statistic_data,
+            month_dynamics=month_dynamics,
+            structure_data=structure_data
+        )
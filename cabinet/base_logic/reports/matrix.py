@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, Q, Sum
+
+from clients.models import AgentManager
+
+# уникальная заявка - исходная заявка, а не ее копия в другой банк
+UNIQUE_REQUESTS = Q(base_request=F('id')) | Q(base_request__isnull=True)
+
+
+def get_managers_agents(managers, agents) -> dict:
+    """ {id менеджера: [агенты]} одним запросом, порядок агентов как в agents """
+    agents = {agent.id: agent for agent in agents}
+    result = defaultdict(list)
+    links = AgentManager.objects.filter(
+        manager__in=managers, agent_id__in=list(agents)
+    ).values_list('manager_id', 'agent_id')
+    agent_managers = defaultdict(list)
+    for manager_id, agent_id in links:
+        agent_managers[agent_id].append(manager_id)
+    for agent_id, agent in agents.items():
+        for manager_id in agent_managers.get(agent_id, []):
+            result[manager_id].append(agent)
+    return result
+
+
+class AgentStatusMatrix:
+    """
+    Количество заявок агент x статус одним сгруппированным запросом
+    на каждый queryset (заявки БГ, займы). Для агента также считаются
+    общее количество, количество уникальных заявок и сумма
+    """
+
+    def __init__(self, *querysets):
+        self.querysets = querysets
+        self.cells = defaultdict(int)
+        self.totals = defaultdict(lambda: {'count': 0, 'unique': 0, 'amount': 0})
+
+    def load(self) -> 'AgentStatusMatrix':
+        for queryset in self.querysets:
+            rows = queryset.values('agent_id', 'status__name').annotate(
+                count=Count('id'),
+                unique=Count('id', filter=UNIQUE_REQUESTS),
+                amount=Sum('required_amount'),
+            ).order_by()
+            for row in rows:
+                self.cells[(row['agent_id'], row['status__name'])] += row['count']
+                totals = self.totals[row['agent_id']]
+                totals['count'] += row['count']
+                totals['unique'] += row['unique']
+                totals['amount'] += row['amount'] or 0
+        return self
+
+    def get(self, agent_id, statuses) -> int:
+        if isinstance(statuses, str):
+            statuses = [statuses]
+        return sum(self.cells.get((agent_id, status), 0) for status in statuses)
+
+    def get_count(self, agent_id) -> int:
+        return self.totals[agent_id]['count'] if agent_id in self.totals else 0
+
+    def get_unique(self, agent_id) -> int:
+        return self.totals[agent_id]['unique'] if agent_id in self.totals else 0
+
+    def get_amount(self, agent_id):
+        return self.totals[agent_id]['amount'] if agent_id in self.totals else 0
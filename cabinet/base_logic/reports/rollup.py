@@ -0,0 +1,189 @@
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from bank_guarantee.constants import ProductChoices
+from bank_guarantee.models import Request
+from cabinet.models import RequestDailyStatistics, RequestStatisticsFact
+
+logger = logging.getLogger('django')
+
+MEASURES = ['required_amount', 'offer_amount', 'commission']
+# поля заявки, от которых зависит ее вклад в сводку (кроме менеджера клиента)
+FACT_FIELDS = [
+    'required_amount', 'bank_id', 'agent_id', 'base_request_id', 'client_id',
+    'status_id', 'status_changed_date',
+]
+
+
+class RequestRollup:
+    """
+    Инкрементальное обновление дневной сводки по заявкам.
+    Для каждой заявки хранится ее текущий вклад (RequestStatisticsFact):
+    при изменении заявки старый вклад вычитается из сводки, новый добавляется
+    """
+    chunk_size = 2000
+
+    @staticmethod
+    def get_fact(request, product=ProductChoices.PRODUCT_BG) -> dict:
+        offer = request.offer if request.has_offer() else None
+        status_changed_date = request.status_changed_date or timezone.now()
+        if timezone.is_aware(status_changed_date):
+            status_changed_date = timezone.localtime(status_changed_date)
+        return {
+            'day': status_changed_date.date(),
+            'product': product,
+            'bank_id': request.bank_id or 0,
+            'agent_id': request.agent_id or 0,
+            'manager_id': (request.client.manager_id if request.client else 0) or 0,
+            'status_id': request.status_id or 0,
+            'is_unique': request.base_request_id is not None,
+            'required_amount': request.required_amount or 0,
+            'offer_amount': (offer.amount if offer else 0) or 0,
+            'commission': (offer.commission_bank if offer else 0) or 0,
+        }
+
+    @staticmethod
+    def apply(fact: dict, sign: int):
+        key = {field: fact[field] for field in RequestDailyStatistics.KEY_FIELDS}
+        cell, _ = RequestDailyStatistics.objects.get_or_create(**key)
+        RequestDailyStatistics.objects.filter(id=cell.id).update(
+            count=F('count') + sign,
+            **{
+                field: F(field) + sign * Decimal(str(fact[field]))
+                for field in MEASURES
+            }
+        )
+
+    @classmethod
+    def update_request(cls, request_id, product=ProductChoices.PRODUCT_BG):
+        request = Request.objects.filter(id=request_id).select_related(
+            'client', 'offer'
+        ).first()
+        with transaction.atomic():
+            old = RequestStatisticsFact.objects.select_for_update().filter(
+                product=product, request_id=request_id
+            ).values(*RequestDailyStatistics.KEY_FIELDS, *MEASURES).first()
+            if old:
+                cls.apply(old, -1)
+            if request is None:
+                RequestStatisticsFact.objects.filter(
+                    product=product, request_id=request_id
+                ).delete()
+                return
+            new = cls.get_fact(request, product)
+            cls.apply(new, 1)
+            RequestStatisticsFact.objects.update_or_create(
+                product=product, request_id=request_id, defaults=new
+            )
+
+    @classmethod
+    def update_request_safe(cls, request_id, product=ProductChoices.PRODUCT_BG):
+        try:
+            cls.update_request(request_id, product)
+        except Exception as error:
+            logger.exception(error)
+
+    @classmethod
+    def on_request_changed(cls, request_id, product=ProductChoices.PRODUCT_BG):
+        """
+        Обновление сводки после фиксации транзакции. Заявки, измененные
+        в транзакции несколько раз (сохранение заявки и запись истории),
+        обновляются одним отложенным вызовом
+        """
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            cls.update_request_safe(request_id, product)
+            return
+        pending = getattr(connection, 'rollup_pending', None)
+        # после отката транзакции отложенный вызов снят, набор начинается заново
+        if pending is None or not any(
+                func is pending['flush'] for _, func in connection.run_on_commit
+        ):
+            pending = {'keys': set()}
+
+            def flush():
+                connection.rollup_pending = None
+                for key in sorted(pending['keys']):
+                    cls.update_request_safe(*key)
+            pending['flush'] = flush
+            connection.rollup_pending = pending
+            transaction.on_commit(flush)
+        pending['keys'].add((request_id, product))
+
+    @classmethod
+    def on_client_changed(cls, client_id, product=ProductChoices.PRODUCT_BG):
+        """ Обновление вкладов всех заявок клиента при смене менеджера """
+        cls.on_clients_changed([client_id], product)
+
+    @classmethod
+    def on_clients_changed(cls, client_ids, product=ProductChoices.PRODUCT_BG):
+        client_ids = list(client_ids)
+
+        def update():
+            request_ids = Request.objects.filter(
+                client_id__in=client_ids
+            ).values_list('id', flat=True)
+            for request_id in request_ids:
+                cls.update_request_safe(request_id, product)
+        transaction.on_commit(update)
+
+    @classmethod
+    def backfill(cls, requests=None, product=ProductChoices.PRODUCT_BG, stdout=None):
+        """
+        Полный пересчет сводки по заявкам: вклады заявок пишутся пачками,
+        сводка строится одним сгруппированным запросом по вкладам
+        """
+        if requests is None:
+            requests = Request.objects.all()
+        requests = requests.select_related('client', 'offer').order_by('id')
+        with transaction.atomic():
+            RequestStatisticsFact.objects.filter(product=product).delete()
+            RequestDailyStatistics.objects.filter(product=product).delete()
+            facts = []
+            total = 0
+            for request in requests.iterator():
+                facts.append(RequestStatisticsFact(
+                    request_id=request.id, **cls.get_fact(request, product)
+                ))
+                if len(facts) >= cls.chunk_size:
+                    RequestStatisticsFact.objects.bulk_create(facts)
+                    total += len(facts)
+                    facts = []
+                    if stdout:
+                        stdout.write('%s заявок' % total)
+            RequestStatisticsFact.objects.bulk_create(facts)
+            total += len(facts)
+
+            rows = RequestStatisticsFact.objects.filter(product=product).values(
+                *RequestDailyStatistics.KEY_FIELDS
+            ).annotate(
+                count=Count('id'),
+                **{field + '_sum': Sum(field) for field in MEASURES}
+            ).order_by()
+            RequestDailyStatistics.objects.bulk_create([
+                RequestDailyStatistics(
+                    count=row['count'],
+                    **{field: row[field] for field in RequestDailyStatistics.KEY_FIELDS},
+                    **{field: row[field + '_sum'] for field in MEASURES}
+                ) for row in rows.iterator()
+            ], batch_size=cls.chunk_size)
+        return total
+
+    @staticmethod
+    def get_rows(date_from, date_to, group_by, product=ProductChoices.PRODUCT_BG,
+                 **filters):
+        """
+        Сводка за период дней [date_from, date_to) сгруппированная по group_by,
+        например ['agent_id', 'status_id']. Итоги в полях count_sum,
+        required_amount_sum, offer_amount_sum, commission_sum
+        """
+        return RequestDailyStatistics.objects.filter(
+            day__gte=date_from, day__lt=date_to, product=product, **filters
+        ).values(*group_by).annotate(
+            count_sum=Sum('count'),
+            **{field + '_sum': Sum(field) for field in MEASURES}
+        ).order_by()
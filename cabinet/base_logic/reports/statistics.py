@@ -0,0 +1,106 @@
+import datetime
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import BooleanField, Case, Count, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from bank_guarantee.models import Request
+from cabinet.models import System
+
+Totals = namedtuple('Totals', ['count', 'amount', 'commission'])
+EMPTY_TOTALS = Totals(0, 0, 0)
+
+
+def month_range(date):
+    """ Границы месяца 'ГГГГ-ММ' для фильтра по диапазону дат """
+    year, month = [int(i) for i in date.split('-')[:2]]
+    date_from = datetime.datetime(year, month, 1)
+    date_to = datetime.datetime(year + month // 12, month % 12 + 1, 1)
+    if settings.USE_TZ:
+        date_from = timezone.make_aware(date_from)
+        date_to = timezone.make_aware(date_to)
+    return date_from, date_to
+
+
+class RequestStatistics:
+    """
+    Количество заявок, сумма и комиссия банка по предложениям за период
+    в разрезе банк x статус x уникальность, одним сгруппированным запросом.
+    Уникальные заявки - заявки с base_request
+    """
+
+    def __init__(self, date_from, date_to, requests=None):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.requests = requests if requests is not None else Request.objects.all()
+        self.cells = {}
+
+    @classmethod
+    def for_month(cls, date, requests=None) -> 'RequestStatistics':
+        statistics = cls(*month_range(date), requests=requests)
+        if requests is None and System.get_setting('reports_use_rollup'):
+            return statistics.load_from_rollup()
+        return statistics.load()
+
+    def load_from_rollup(self) -> 'RequestStatistics':
+        """ Те же данные из дневной сводки RequestDailyStatistics """
+        from cabinet.base_logic.reports.rollup import RequestRollup
+        rows = RequestRollup.get_rows(
+            self.date_from.date(), self.date_to.date(),
+            group_by=['bank_id', 'status_id', 'is_unique']
+        )
+        self.cells = {
+            (row['bank_id'] or None, row['status_id'] or None, row['is_unique']): Totals(
+                row['count_sum'], row['offer_amount_sum'], row['commission_sum']
+            ) for row in rows
+        }
+        return self
+
+    def get_queryset(self):
+        return self.requests.filter(
+            status_changed_date__gte=self.date_from,
+            status_changed_date__lt=self.date_to,
+        )
+
+    def load(self) -> 'RequestStatistics':
+        rows = self.get_queryset().annotate(
+            is_unique=Case(
+                When(base_request__isnull=False, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            )
+        ).values('bank_id', 'status_id', 'is_unique').annotate(
+            count=Count('id'),
+            amount=Coalesce(Sum('offer__amount'), 0),
+            commission=Coalesce(Sum('offer__commission_bank'), 0),
+        ).order_by()
+        self.cells = {
+            (row['bank_id'], row['status_id'], row['is_unique']): Totals(
+                row['count'], row['amount'], row['commission']
+            ) for row in rows
+        }
+        return self
+
+    def get(self, statuses=None, exclude_statuses=None, bank_id=None,
+            unique=False) -> Totals:
+        """
+        Итоги по ячейкам: statuses - только эти статусы, exclude_statuses -
+        кроме этих, bank_id - только банк (None - все банки),
+        unique - только уникальные заявки
+        """
+        count, amount, commission = 0, 0, 0
+        for (cell_bank_id, status_id, is_unique), totals in self.cells.items():
+            if bank_id is not None and cell_bank_id != bank_id:
+                continue
+            if statuses is not None and status_id not in statuses:
+                continue
+            if exclude_statuses is not None and status_id in exclude_statuses:
+                continue
+            if unique and not is_unique:
+                continue
+            count += totals.count
+            amount += totals.amount
+            commission += totals.commission
+        return Totals(count, amount, commission)
@@ -1,6 +1,10 @@
 import json
 import logging
+import threading
+import time
+import uuid
 from collections import Iterable
+from functools import lru_cache
 
 from django.conf import settings
 from django.core.cache import cache
@@ -8,6 +12,8 @@ from django.utils.functional import cached_property
 from django.utils.module_loading import import_string
 
 from base_request.models import AbstractRequest
+from cabinet.base_logic.scoring.facts import ScoringFacts
+from cabinet.base_logic.scoring.profiler import ScoringProfiler
 from cabinet.models import System
 from clients.models import Bank
 from tender_loans.models import LoanRequest
@@ -53,10 +59,20 @@ class ScoringResult:
 
 
 class ScoringItem(object):
+    # стоимость проверки: данные заявки в памяти / запросы в БД / внешние API
+    COST_CHEAP = 1
+    COST_DATABASE = 2
+    COST_EXTERNAL = 3
+
     error_message = None
     disable_for_loans = False
     scoring_params = []
     full_name = None
+    cost = COST_DATABASE
+
+    @classmethod
+    def get_cost(cls, settings: dict) -> int:
+        return cls.cost
 
     def params_to_dict(self):
         return {
@@ -65,6 +81,24 @@ class ScoringItem(object):
         }
 
     def get_result(self):
+        if not ScoringProfiler.is_enabled():
+            return self.get_validation_result()
+
+        hits, misses = self.facts.get_thread_stats()
+        start = time.monotonic()
+        result = self.get_validation_result()
+        elapsed = time.monotonic() - start
+        new_hits, new_misses = self.facts.get_thread_stats()
+        ScoringProfiler.record(
+            self.__class__.__name__,
+            elapsed,
+            bank_code=getattr(self.bank, 'code', None),
+            passed=result.is_success,
+            from_cache=new_hits > hits and new_misses == misses,
+        )
+        return result
+
+    def get_validation_result(self):
         if isinstance(self.request, LoanRequest) and self.disable_for_loans:
             return ScoringResult()
         try:
@@ -88,6 +122,8 @@ class ScoringItem(object):
         self.bank = bank
         self.request = request
         self.settings = settings
+        # общее хранилище фактов подставляет ScoringLogic.validate_rules
+        self.facts = ScoringFacts()
 
         params = self.scoring_params + ['error_message', 'disable_for_loans']
         for param in params:
@@ -108,6 +144,120 @@ class ScoringItem(object):
         return ScoringResult()
 
 
+class ScoringPlan:
+    """
+    Скомпилированный набор правил скоринга: правила разобраны из json,
+    классы функций скоринга загружены один раз
+    """
+
+    def __init__(self, items=None, size=0):
+        # items - список (index, scoring_class, scoring_item), index - номер
+        # правила в исходном списке (нужен для errors_index)
+        self.items = items or []
+        self.size = size
+
+    @classmethod
+    def compile(cls, scoring_settings, is_active=None):
+        items = []
+        index = 0
+        for scoring_item in scoring_settings:
+            index += 1
+            if is_active is not None and not is_active(scoring_item):
+                continue
+            scoring_class = ScoringLogic.load_class(scoring_item.get('class'))
+            if scoring_class:
+                items.append((index, scoring_class, scoring_item))
+        return cls(items=items, size=index)
+
+    @cached_property
+    def cost_ordered_items(self):
+        """ Правила от самых дешевых к самым дорогим, с сохранением порядка """
+        return sorted(
+            self.items,
+            key=lambda item: (item[1].get_cost(item[2]), item[0])
+        )
+
+    def __add__(self, other: 'ScoringPlan') -> 'ScoringPlan':
+        items = self.items + [
+            (index + self.size, scoring_class, scoring_item)
+            for index, scoring_class, scoring_item in other.items
+        ]
+        return ScoringPlan(items=items, size=self.size + other.size)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class ScoringPlanCache:
+    """
+    Кеш скомпилированных планов скоринга в памяти процесса.
+    Ключ плана - версии настроек банка и System.default_scoring_rules,
+    версии хранятся в общем кеше и меняются при сохранении настроек
+    (см. cabinet.signal_handlers), поэтому план сбрасывается во всех процессах
+    """
+    BANK_VERSION_KEY = 'scoring_plan_version_bank_%s'
+    COMMON_VERSION_KEY = 'scoring_plan_version_common'
+
+    _plans = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_versions(cls, bank_id):
+        bank_key = cls.BANK_VERSION_KEY % bank_id
+        versions = cache.get_many([bank_key, cls.COMMON_VERSION_KEY])
+        bank_version = versions.get(bank_key)
+        if bank_version is None:
+            bank_version = cls._init_version(bank_key)
+        common_version = versions.get(cls.COMMON_VERSION_KEY)
+        if common_version is None:
+            common_version = cls._init_version(cls.COMMON_VERSION_KEY)
+        return bank_version, common_version
+
+    @staticmethod
+    def _init_version(key):
+        # версия могла быть вытеснена из кеша, новая версия гарантирует,
+        # что не будет использован устаревший план
+        cache.add(key, uuid.uuid4().hex, None)
+        return cache.get(key)
+
+    @classmethod
+    def get(cls, bank_id, use_common_rules, compile_plan):
+        versions = cls.get_versions(bank_id)
+        key = (bank_id, use_common_rules) + versions
+        plan = cls._plans.get(key)
+        if plan is None:
+            plan = compile_plan()
+            with cls._lock:
+                cls._drop(lambda k: k[0] == bank_id and k[1] == use_common_rules)
+                cls._plans[key] = plan
+        return plan
+
+    @classmethod
+    def _drop(cls, condition):
+        for key in [key for key in cls._plans if condition(key)]:
+            cls._plans.pop(key, None)
+
+    @classmethod
+    def invalidate_bank(cls, bank_id):
+        cache.set(cls.BANK_VERSION_KEY % bank_id, uuid.uuid4().hex, None)
+        with cls._lock:
+            cls._drop(lambda k: k[0] == bank_id)
+
+    @classmethod
+    def invalidate_common(cls):
+        cache.set(cls.COMMON_VERSION_KEY, uuid.uuid4().hex, None)
+        with cls._lock:
+            cls._drop(lambda k: k[1])
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._plans.clear()
+
+
 class ScoringLogic:
 
     @classmethod
@@ -125,10 +275,11 @@ class ScoringLogic:
     def get_cache_name(cls, request):
         return 'send_to_bank_%s_%s' % (request.id, request.__class__.__name__)
 
-    def __init__(self, bank: Bank, request):
+    def __init__(self, bank: Bank, request, facts: ScoringFacts = None):
         self.bank = bank
         self.request = request
         self.reason = None
+        self.facts = facts if facts is not None else ScoringFacts()
 
     @cached_property
     def active_functions(self):
@@ -161,7 +312,7 @@ class ScoringLogic:
             rules = [rules]
         return self.validate_rules(rules)
 
-    def check(self, use_common_rules=False) -> ScoringResult:
+    def check(self, use_common_rules=False, fail_fast=False) -> ScoringResult:
         if not settings.TESTING and (
                 not System.objects.all().first().scoring_on or
                 not self.bank.settings.scoring_enable):
@@ -173,42 +324,87 @@ class ScoringLogic:
             logger.warning(log_message)
             return ScoringResult()
 
-        scoring_settings = self.get_scoring_settings() or []
-        if use_common_rules:
-            scoring_settings += json.loads(
-                System.get_setting('default_scoring_rules'))
-        if not scoring_settings:
+        scoring_plan = self.get_scoring_plan(use_common_rules=use_common_rules)
+        if not scoring_plan:
             return ScoringResult()
 
-        result = self.validate_rules(scoring_settings)
+        result = self.validate_rules(scoring_plan, fail_fast=fail_fast)
         if result.is_fail:
             self.reason = result.get_first_error()
         return result
 
-    def validate_rules(self, scoring_settings, as_agent=True) -> ScoringResult:
+    def compile_rules(self, scoring_settings) -> ScoringPlan:
+        return ScoringPlan.compile(scoring_settings, is_active=self.is_active)
+
+    def compile_scoring_plan(self, use_common_rules=False) -> ScoringPlan:
+        scoring_plan = self.compile_rules(self.get_scoring_settings() or [])
+        if use_common_rules:
+            scoring_plan += self.compile_rules(
+                json.loads(System.get_setting('default_scoring_rules'))
+            )
+        return scoring_plan
+
+    def get_scoring_plan(self, use_common_rules=False) -> ScoringPlan:
+        """
+        Возвращает скомпилированный план скоринга банка из кеша,
+        для несохраненного банка план компилируется без кеширования
+        """
+        if not self.bank.id:
+            return self.compile_scoring_plan(use_common_rules=use_common_rules)
+        return ScoringPlanCache.get(
+            self.bank.id,
+            use_common_rules,
+            lambda: self.compile_scoring_plan(use_common_rules=use_common_rules)
+        )
+
+    def validate_rules(self, scoring_settings, as_agent=True,
+                       fail_fast=False) -> ScoringResult:
+        """
+        Проверяет правила скоринга.
+        as_agent - полный отчет по всем правилам (для интерфейса агента),
+        иначе возвращается первая ошибка в порядке правил;
+        fail_fast - правила выполняются от дешевых к дорогим (см. ScoringItem.cost)
+        до первой ошибки
+        """
+        if not ScoringProfiler.is_enabled():
+            return self._validate_rules(scoring_settings, as_agent, fail_fast)
+        with ScoringProfiler.measure_rules(getattr(self.bank, 'code', None)):
+            return self._validate_rules(scoring_settings, as_agent, fail_fast)
+
+    def _validate_rules(self, scoring_settings, as_agent, fail_fast) -> ScoringResult:
+        if not isinstance(scoring_settings, ScoringPlan):
+            scoring_settings = self.compile_rules(scoring_settings)
+        if fail_fast:
+            return self.validate_rules_fail_fast(scoring_settings)
         errors = []
         errors_index = []
-        index = 0
-        for scoring_item in scoring_settings:
-            index += 1
-            scoring_class_name = scoring_item.get('class')
-            if self.is_active(scoring_item):
-                scoring_class = self.load_class(scoring_class_name)
-                if scoring_class:
-                    scoring_obj = scoring_class(self.bank, self.request,
-                                                scoring_item)
-                    result = scoring_obj.get_result()
-                    if result.is_fail:
-                        if as_agent:
-                            errors.append(result.get_first_error())
-                            errors_index.append(index)
-                        else:
-                            return result
+        for index, scoring_class, scoring_item in scoring_settings:
+            scoring_obj = scoring_class(self.bank, self.request, scoring_item)
+            scoring_obj.facts = self.facts
+            result = scoring_obj.get_result()
+            if result.is_fail:
+                if as_agent:
+                    errors.append(result.get_first_error())
+                    errors_index.append(index)
+                else:
+                    return result
         if errors:
             return ScoringResult(errors=errors, errors_index=errors_index)
         return ScoringResult()
 
+    def validate_rules_fail_fast(self, scoring_plan: ScoringPlan) -> ScoringResult:
+        for index, scoring_class, scoring_item in scoring_plan.cost_ordered_items:
+            scoring_obj = scoring_class(self.bank, self.request, scoring_item)
+            scoring_obj.facts = self.facts
+            result = scoring_obj.get_result()
+            if result.is_fail:
+                return ScoringResult(
+                    errors=[result.get_first_error()], errors_index=[index]
+                )
+        return ScoringResult()
+
     @staticmethod
+    @lru_cache(maxsize=None)
     def load_class(scoring_class_name):
         return import_string(
             'cabinet.base_logic.scoring.functions.%s' % scoring_class_name)
@@ -0,0 +1,101 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from django.db import connection
+
+from cabinet.base_logic.scoring.base import ScoringLogic, ScoringResult
+from cabinet.base_logic.scoring.facts import ScoringFacts
+
+logger = logging.getLogger('scoring')
+
+
+class BatchScoringResult:
+    """ Матрица результатов скоринга заявка x банк """
+
+    def __init__(self, requests, banks, facts: ScoringFacts):
+        self.requests = requests
+        self.banks = banks
+        self.facts = facts
+        self.matrix = {}  # type: Dict[int, Dict[int, ScoringResult]]
+
+    def set_results(self, request_id, results: Dict[int, ScoringResult]):
+        self.matrix[request_id] = results
+
+    def get_result(self, request_id, bank_id) -> ScoringResult:
+        return self.matrix.get(request_id, {}).get(bank_id)
+
+    def get_passed_banks(self, request_id) -> List[int]:
+        return [
+            bank_id for bank_id, result in self.matrix.get(request_id, {}).items()
+            if result.is_success
+        ]
+
+    def to_dict(self):
+        return {
+            'banks': [
+                {'id': bank.id, 'short_name': bank.short_name}
+                for bank in self.banks
+            ],
+            'requests': [{
+                'id': request.id,
+                'results': [{
+                    'bank': bank.id,
+                    'result': self.get_result(request.id, bank.id).is_success,
+                    'errors': self.get_result(request.id, bank.id).get_errors(),
+                } for bank in self.banks]
+            } for request in self.requests],
+            'facts': self.facts.get_stats(),
+        }
+
+
+class BatchScoring:
+    """
+    Скоринг "что если": проверяет N заявок в M банках без отправки.
+    Заявки обрабатываются на пуле потоков, внешние данные (контракты,
+    заключения) общие для всей матрицы.
+    Правила проверяются независимо от включенности скоринга в банке
+    """
+    workers = 8
+
+    def __init__(self, requests, banks, use_common_rules=True, fail_fast=False,
+                 workers=None):
+        self.requests = list(requests)
+        self.banks = list(banks)
+        self.use_common_rules = use_common_rules
+        self.fail_fast = fail_fast
+        self.workers = workers or self.workers
+        self.facts = ScoringFacts()
+
+    def check_request(self, request) -> Dict[int, ScoringResult]:
+        results = {}
+        for bank in self.banks:
+            logic = ScoringLogic(bank=bank, request=request, facts=self.facts)
+            scoring_plan = logic.get_scoring_plan(
+                use_common_rules=self.use_common_rules
+            )
+            results[bank.id] = logic.validate_rules(
+                scoring_plan, fail_fast=self.fail_fast
+            )
+        return results
+
+    def check_request_in_thread(self, request):
+        try:
+            return self.check_request(request)
+        finally:
+            # у каждого потока свое соединение с БД
+            connection.close()
+
+    def run(self) -> BatchScoringResult:
+        result = BatchScoringResult(self.requests, self.banks, self.facts)
+        if not self.requests or not self.banks:
+            return result
+        workers = min(self.workers, len(self.requests))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for request, results in zip(self.requests, executor.map(
+                    self.check_request_in_thread, self.requests)):
+                result.set_results(request.id, results)
+        logger.info('Пакетный скоринг %s x %s, кеш фактов: %s' % (
+            len(self.requests), len(self.banks), self.facts.get_stats()
+        ))
+        return result
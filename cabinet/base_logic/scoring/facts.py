@@ -0,0 +1,93 @@
+import threading
+
+from cabinet.base_logic.contracts.base import ContractsLogic
+from cabinet.base_logic.scoring.stop_lists import StopListIndex
+
+
+class ScoringFacts:
+    """
+    Хранилище фактов для одного прогона скоринга (например одной отправки
+    заявки в несколько банков). Внешние данные (контракты, заключения)
+    вычисляются один раз и переиспользуются всеми правилами во всех банках
+    """
+
+    def __init__(self):
+        self._facts = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key, compute):
+        """
+        Возвращает факт по ключу, при отсутствии вычисляет его через compute.
+        Исключения из compute не кешируются
+        """
+        if key in self._facts:
+            self._add_hit()
+            return self._facts[key]
+        with self._get_key_lock(key):
+            if key in self._facts:
+                self._add_hit()
+                return self._facts[key]
+            value = compute()
+            with self._lock:
+                self.misses += 1
+                self._facts[key] = value
+            self._local.misses = getattr(self._local, 'misses', 0) + 1
+            return value
+
+    def _add_hit(self):
+        with self._lock:
+            self.hits += 1
+        self._local.hits = getattr(self._local, 'hits', 0) + 1
+
+    def has(self, key):
+        return key in self._facts
+
+    def get_stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def get_thread_stats(self):
+        """ Попадания и промахи в текущем потоке (для профилировщика) """
+        return (
+            getattr(self._local, 'hits', 0),
+            getattr(self._local, 'misses', 0),
+        )
+
+    @staticmethod
+    def _client_key(client):
+        return client.pk or id(client)
+
+    def finished_contracts(self, client):
+        """ Исполненные контракты клиента """
+        return self.get(
+            ('finished_contracts', client.inn),
+            lambda: ContractsLogic(client).get_finished_contracts()
+        )
+
+    def conclusion_result(self, client, conclusion):
+        """ Результат заключения ConclusionsLogic.get_conclusion_result """
+        from conclusions_app.conclusions_logic import ConclusionsLogic
+        return self.get(
+            ('conclusion', conclusion.__name__, self._client_key(client)),
+            lambda: ConclusionsLogic.get_conclusion_result(
+                client=client, conclusion=conclusion
+            )
+        )
+
+    def blocked_inns(self, inns):
+        """
+        Стоп-листы всех банков по набору ИНН: {id банка: заблокированные ИНН}.
+        Считается один раз на прогон, правила банков берут из него свою строку
+        """
+        inns = tuple(sorted({str(inn).strip() for inn in inns if inn}))
+        return self.get(('blocked_inns', inns), lambda: StopListIndex.get_blocked(inns))
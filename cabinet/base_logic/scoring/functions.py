@@ -18,7 +18,6 @@ from bank_guarantee.bank_integrations.spb_bank.helpers import (
 from bank_guarantee.models import Request, ContractType
 from cabinet.base_logic.bank_conclusions.rib import RIBConclusionForTH
 from cabinet.base_logic.conclusions.check_passport import check_passport
-from cabinet.base_logic.contracts.base import ContractsLogic
 from cabinet.base_logic.helpers.check_data import check_in_regions
 from cabinet.base_logic.scoring.base import ScoringItem, ScoringResult, ScoringLogic
 from cabinet.constants.constants import TaxationType, Target, FederalLaw, OrganizationForm
@@ -29,7 +28,6 @@ from conclusions_app.conclusions.common import (
     RMSPConclusion, InTerroristListConclusion, DisqualifiedPersonConclusion,
     AddressOfManyRegistrationsConclusion, CheckPassportConclusion, IsBankrotConclusion
 )
-from conclusions_app.conclusions_logic import ConclusionsLogic
 from external_api.clearspending_api import ClearsSpendingApi
 from external_api.nalogru_api import NalogRu
 from external_api.parsers_tenderhelp import ParsersApi
@@ -75,6 +73,7 @@ def add_scoring(cls):
 
 @add_scoring
 class TrueScoring(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     full_name = 'Скоринг пройден'
 
     def validate(self):
@@ -83,6 +82,7 @@ class TrueScoring(ScoringItem):
 
 @add_scoring
 class FailScoring(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     full_name = 'Скоринг не пройден'
 
     def validate(self):
@@ -92,6 +92,7 @@ class FailScoring(ScoringItem):
 @add_scoring
 class AllowedTenderLawsScoring(ScoringItem):
     """ проверка допустимых законов конкурса (Поле «ФЗ/ПП» в Заявке) """
+    cost = ScoringItem.COST_CHEAP
     full_name = 'проверка допустимых законов конкурса (Поле «ФЗ/ПП» в Заявке)'
     laws = []
     laws_choices = generate_choices(
@@ -112,6 +113,7 @@ class AllowedTenderLawsScoring(ScoringItem):
 @add_scoring
 class FieldEqualScoring(ScoringItem):
     """ Универсальный скоринг проверки соответствия поля в заявке/анкете условию """
+    cost = ScoringItem.COST_CHEAP
     full_name = 'Универсальный скоринг проверки соответствия поля в заявке/анкете условию'
     field = None
     value = None
@@ -217,6 +219,7 @@ class FieldEqualScoring(ScoringItem):
 
 @add_scoring
 class BeneficiarsAgeScoring(FieldEqualScoring):
+    cost = ScoringItem.COST_DATABASE
     full_name = 'Проверка возраста участников'
     value = None
     operation = '='
@@ -259,6 +262,7 @@ class BeneficiarsAgeScoring(FieldEqualScoring):
 
 @add_scoring
 class BGSumLessContractSum(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     disable_for_loans = True
     full_name = 'BGSumLessContractSum'
 
@@ -272,6 +276,7 @@ class BGSumLessContractSum(ScoringItem):
 
 @add_scoring
 class CleanActiveLessThenBG(ScoringItem):
+    cost = ScoringItem.COST_DATABASE
     full_name = "Величина чистых активов БО 1300 меньше суммы банковской гарантии."
     error_message = "Величина чистых активов БО 1300 меньше суммы банковской гарантии."
 
@@ -297,16 +302,27 @@ class ConditionalScoring(ScoringItem):
     error_message = "Ошибка условного скоринга"
     scoring_params = ['if_conditionals', 'then_conditionals', 'else_conditionals']
 
+    @classmethod
+    def get_cost(cls, settings: dict) -> int:
+        rules = []
+        for param in cls.scoring_params:
+            rules.extend(settings.get(param) or [])
+        costs = [
+            ScoringLogic.load_class(rule.get('class')).get_cost(rule)
+            for rule in rules
+        ]
+        return max(costs, default=ScoringItem.COST_CHEAP)
+
     def validate(self) -> ScoringResult:
         if_conditionals = self.if_conditionals if self.if_conditionals else []
         result = ScoringLogic(
-            bank=self.bank, request=self.request
+            bank=self.bank, request=self.request, facts=self.facts
         ).validate_rules(if_conditionals)
 
         if result.is_success:
             then_conditionals = self.then_conditionals if self.then_conditionals else []
             result = ScoringLogic(
-                bank=self.bank, request=self.request
+                bank=self.bank, request=self.request, facts=self.facts
             ).validate_rules(then_conditionals)
             if result.is_success:
                 return ScoringResult()
@@ -316,7 +332,7 @@ class ConditionalScoring(ScoringItem):
         else:
             if self.else_conditionals:
                 result = ScoringLogic(
-                    bank=self.bank, request=self.request
+                    bank=self.bank, request=self.request, facts=self.facts
                 ).validate_rules(self.else_conditionals)
                 if result.is_success:
                     return ScoringResult()
@@ -329,6 +345,7 @@ class ConditionalScoring(ScoringItem):
 
 @add_scoring
 class CountContractsScoring(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     full_name = "Проверка количества контрактов"
     min = 1
     scoring_params = ['min']
@@ -340,9 +357,9 @@ class CountContractsScoring(ScoringItem):
         return self.error_message
 
     def validate(self) -> ScoringResult:
-        finished_contracts = ContractsLogic(
-            self.request.client
-        ).get_finished_contracts_count()
+        finished_contracts = len(
+            self.facts.finished_contracts(self.request.client)
+        )
 
         if finished_contracts == 0:
             if self.request.experience_general_contractor:
@@ -356,13 +373,13 @@ class CountContractsScoring(ScoringItem):
 
 @add_scoring
 class DecisionSuspendScoring(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     error_message = "У компании имеются приостановленные счета"
     full_name = "У компании имеются приостановленные счета"
 
     def validate(self) -> ScoringResult:
-        result = ConclusionsLogic.get_conclusion_result(
-            client=self.request.client,
-            conclusion=DecisionToSuspendConclusion
+        result = self.facts.conclusion_result(
+            self.request.client, DecisionToSuspendConclusion
         )
         if not result.result:
             return ScoringResult(self.get_error_message())
@@ -382,6 +399,7 @@ class ExperienceScoring(CountContractsScoring):
 
 @add_scoring
 class FinanceScoring(ScoringItem):
+    cost = ScoringItem.COST_DATABASE
     error_message = 'Величина чистых активов за последний завершенный квартал меньше ' \
                     'уставного капитала или отрицательная величина.'
     full_name = 'Величина чистых активов за последний завершенный квартал ' \
@@ -403,6 +421,7 @@ class FitLimitScoring(ScoringItem):
     """
     Проверка, лимита по сумме банковских гарантий в указаном банке
     """
+    cost = ScoringItem.COST_DATABASE
     full_name = "Проверка, лимита по сумме банковских гарантий в указаном банке"
     disable_for_loans = True
     error_message = 'Превышен лимит по сумме банковских гарантий в данном банке'
@@ -431,6 +450,7 @@ class FitLimitScoring(ScoringItem):
 
 @add_scoring
 class FizDolScoring(ScoringItem):
+    cost = ScoringItem.COST_DATABASE
     error_message = 'Физическое лицо в участниках (акционерах) ' \
                     'без российского гражданства'
     full_name = 'Физическое лицо в участниках (акционерах) без российского гражданства'
@@ -448,6 +468,7 @@ class FizDolScoring(ScoringItem):
 
 @add_scoring
 class GuaranteeTargetScoring(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     full_name = 'Недопустимый вид банковской гарантии'
     exclude = True
     targets = []
@@ -485,6 +506,7 @@ class GuaranteeTargetScoring(ScoringItem):
 
 @add_scoring
 class HasClearActivesScoring(ScoringItem):
+    cost = ScoringItem.COST_DATABASE
     full_name = 'Чистые активы меньше 0'
     only_yearly = False
     scoring_params = ['only_yearly']
@@ -514,6 +536,7 @@ class HasNalogDebts(ScoringItem):
     """
     Проверка что отсутствует задолженоость и вовремя предоставлялась отчетность
     """
+    cost = ScoringItem.COST_EXTERNAL
     full_name = 'Проверка что отсутствует задолженоость и вовремя предоставлялась ' \
                 'отчетность'
     error_message = 'Имеет задолженность по налогам и/или не предоставлял налоговую ' \
@@ -528,6 +551,7 @@ class HasNalogDebts(ScoringItem):
 
 @add_scoring
 class HasSimilarContracts(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     full_name = 'Отсутствие опыта выполнения сопоставимых по сумме контрактов'
     error_message = 'Отсутствие опыта выполнения сопоставимых по сумме контрактов'
     percent = 60
@@ -538,7 +562,7 @@ class HasSimilarContracts(ScoringItem):
     date_format = '%Y-%m-%dT%H:%M:%S'
 
     def get_finished_contracts(self):
-        contracts = ContractsLogic(self.request.client).get_finished_contracts()
+        contracts = self.facts.finished_contracts(self.request.client)
         if self.last_contracts:
             time_point = timezone.now() - datetime.timedelta(days=1095)
             contracts = list(filter(
@@ -608,6 +632,7 @@ class InBankBlackList(ScoringItem):
     Проверка, что ИНН Заказчика (Поле «ИНН заказчика» в заявке) и ИНН исполнителя
     (Поле «ИНН» в Анкете клиента) в заявке не находятся в черном списке банка
     """
+    cost = ScoringItem.COST_DATABASE
     full_name = 'Проверка, что ИНН Заказчика в заявке не находятся в черном списке банка'
     error_message = 'Значение ИНН находится в стоп-листе банка'
 
@@ -615,7 +640,7 @@ class InBankBlackList(ScoringItem):
         return System.get_setting('global_stop_inn')
 
     def inns_in_stop_lists(self, inns):
-        self.bank.black_list.filter(inn__in=inns).exists()
+        return self.bank.id in self.facts.blocked_inns(inns)
 
     def validate(self) -> ScoringResult:
         if not self.banks_stop_list_enabled():
@@ -635,6 +660,7 @@ class InBlackListScoring(ScoringItem):
     """
     Проверка на отсутствие в черном списке банка
     """
+    cost = ScoringItem.COST_DATABASE
     full_name = 'Проверка на отсутствие в черном списке банка'
     error_message = 'Отказ Службы Безопасности'
 
@@ -642,8 +668,7 @@ class InBlackListScoring(ScoringItem):
         inn = [
             self.request.client.inn,
         ]
-        count = self.bank.black_list.filter(inn__in=inn).count()
-        if count > 0:
+        if self.bank.id in self.facts.blocked_inns(inn):
             return ScoringResult(self.get_error_message())
         else:
             return ScoringResult()
@@ -653,14 +678,14 @@ class InBlackListScoring(ScoringItem):
 class InMSPRegistryScoring(ScoringItem):
     """ Компания не входит в реестр малого и среднего
     предпринимательства - это стоп-фактор """
+    cost = ScoringItem.COST_EXTERNAL
     full_name = 'Компания не входит в реестр малого и среднего предпринимательства '
     error_message = "Отсутсвует в едином реестре субъетов малого и среднего " \
                     "предпренимательства"
 
     def validate(self) -> ScoringResult:
-        result = ConclusionsLogic.get_conclusion_result(
-            client=self.request.client,
-            conclusion=RMSPConclusion
+        result = self.facts.conclusion_result(
+            self.request.client, RMSPConclusion
         )
         if not result.result:
             return ScoringResult(self.get_error_message())
@@ -668,6 +693,7 @@ class InMSPRegistryScoring(ScoringItem):
 
 
 class InterPromBankScoring(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     disable_for_loans = True
 
     def validate(self) -> ScoringResult:
@@ -677,15 +703,15 @@ class InterPromBankScoring(ScoringItem):
 
 @add_scoring
 class InTerroristListScoring(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     full_name = 'Генеральный директор найден в перечне террористов и ' \
                 'экстремистов (действующие)'
     error_message = 'Генеральный директор найден в перечне террористов и ' \
                     'экстремистов (действующие)'
 
     def validate(self) -> ScoringResult:
-        result = ConclusionsLogic.get_conclusion_result(
-            client=self.request.client,
-            conclusion=InTerroristListConclusion
+        result = self.facts.conclusion_result(
+            self.request.client, InTerroristListConclusion
         )
         if not result.result:
             return ScoringResult(self.get_error_message())
@@ -695,13 +721,13 @@ class InTerroristListScoring(ScoringItem):
 @add_scoring
 class IsBankrotScoring(ScoringItem):
     """ К организации применяется процедура банкротства. """
+    cost = ScoringItem.COST_EXTERNAL
     full_name = 'К организации применяется процедура банкротства'
     error_message = 'К организации применяется процедура банкротства'
 
     def validate(self) -> ScoringResult:
-        result = ConclusionsLogic.get_conclusion_result(
-            client=self.request.client,
-            conclusion=IsBankrotConclusion
+        result = self.facts.conclusion_result(
+            self.request.client, IsBankrotConclusion
         )
         if not result.result:
             return ScoringResult(self.get_error_message())
@@ -711,13 +737,13 @@ class IsBankrotScoring(ScoringItem):
 @add_scoring
 class IsDisqualifiedPerson(ScoringItem):
     """ Проверка по списку "Дисквалифицированных лиц" """
+    cost = ScoringItem.COST_EXTERNAL
     full_name = 'Проверка по списку "Дисквалифицированных лиц"'
     error_message = "Компания находится в реестре дисквалифицированных лиц"
 
     def validate(self) -> ScoringResult:
-        result = ConclusionsLogic.get_conclusion_result(
-            client=self.request.client,
-            conclusion=DisqualifiedPersonConclusion
+        result = self.facts.conclusion_result(
+            self.request.client, DisqualifiedPersonConclusion
         )
         if not result.result:
             return ScoringResult(self.get_error_message())
@@ -727,6 +753,7 @@ class IsDisqualifiedPerson(ScoringItem):
 @add_scoring
 class IsUnfairSupplierScoring(ScoringItem):
     """ Проверка по реестру недобросовестных поставщиков """
+    cost = ScoringItem.COST_EXTERNAL
     full_name = 'Проверка по реестру недобросовестных поставщиков'
     error_message = 'Компания находится в реестре недобросовестных поставщиков'
 
@@ -753,6 +780,7 @@ class IsUnfairSupplierScoring(ScoringItem):
 
 @add_scoring
 class NalogDebtScoring(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     full_name = 'Компания имеет задолженность по уплате налогов'
     error_message = 'Компания имеет задолженность по уплате налогов ' \
                     '(свыше 1000 р) и/или не представляющая налоговую ' \
@@ -763,9 +791,8 @@ class NalogDebtScoring(ScoringItem):
         if len(self.request.client.profile.reg_inn) != 10:
             return ScoringResult()
 
-        result = ConclusionsLogic.get_conclusion_result(
-            client=self.request.client,
-            conclusion=HasArrearsOnPaymentOfTaxesConclusion
+        result = self.facts.conclusion_result(
+            self.request.client, HasArrearsOnPaymentOfTaxesConclusion
         )
 
         if result.result:
@@ -775,13 +802,13 @@ class NalogDebtScoring(ScoringItem):
 
 @add_scoring
 class NalogStatusScoring(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     full_name = 'у генерального директора имеются приостановленные счета'
     error_message = 'у генерального директора имеются приостановленные счета'
 
     def validate(self) -> ScoringResult:
-        result = ConclusionsLogic.get_conclusion_result(
-            client=self.request.client,
-            conclusion=DecisionToSuspendConclusion
+        result = self.facts.conclusion_result(
+            self.request.client, DecisionToSuspendConclusion
         )
         if not result.result:
             return ScoringResult(self.get_error_message())
@@ -791,6 +818,7 @@ class NalogStatusScoring(ScoringItem):
 @add_scoring
 class NationalityNaturalPersonsScoring(ScoringItem):
     """ Проверка что у бенефициара имеется российское гражданство """
+    cost = ScoringItem.COST_DATABASE
     full_name = 'Проверка что у бенефициара имеется российское гражданство'
     error_message = 'Бенефициар не имеет российское гражданство'
 
@@ -807,6 +835,7 @@ class NationalityNaturalPersonsScoring(ScoringItem):
 @add_scoring
 class NegativeQuartersValueScoring(ScoringItem):
     """ Проверка что указанные коды имеют положительное значение """
+    cost = ScoringItem.COST_DATABASE
     full_name = 'Проверка что указанные коды имеют положительное значение'
     codes = [2400]
     quarters = ['last', 'last_year']
@@ -837,13 +866,13 @@ class NegativeQuartersValueScoring(ScoringItem):
 
 @add_scoring
 class NotActivePassportScoring(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     full_name = 'у генерального директора недействительный паспорт'
     error_message = 'у генерального директора недействительный паспорт'
 
     def validate(self) -> ScoringResult:
-        result = ConclusionsLogic.get_conclusion_result(
-            client=self.request.client,
-            conclusion=CheckPassportConclusion
+        result = self.facts.conclusion_result(
+            self.request.client, CheckPassportConclusion
         )
         if not result.result:
             return ScoringResult(self.get_error_message())
@@ -852,6 +881,7 @@ class NotActivePassportScoring(ScoringItem):
 
 @add_scoring
 class OgrnScoring(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     full_name = 'С даты регистрации в ЕГРЮЛ качестве юридического лица ' \
                 'должно пройти не менее'
     value = 0
@@ -874,6 +904,7 @@ class OgrnScoring(ScoringItem):
 
 @add_scoring
 class OKPD2Scoring(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     full_name = 'Банк не принимает конкурсы с указанным ОКПД2'
     codes = []
     scoring_params = ['codes']
@@ -888,6 +919,7 @@ class OKPD2Scoring(ScoringItem):
 
 @add_scoring
 class OKVEDScoring(FieldEqualScoring):
+    cost = ScoringItem.COST_DATABASE
     full_name = 'Недопустимые виды деятельности'
     pattern = ''
     scoring_params = ['pattern']
@@ -914,6 +946,7 @@ class PassportScoring(NotActivePassportScoring):
 
 @add_scoring
 class QuartersValueScoring(ScoringItem):
+    cost = ScoringItem.COST_DATABASE
     full_name = 'QuartersValueScoring'
     code = None
     quarter = None
@@ -988,6 +1021,7 @@ class RegexFieldsNotMatch(FieldEqualScoring):
 
 @add_scoring
 class RIBTHScoring(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     full_name = 'RIBTHScoring'
     scoring_params = ['minimal_scoring']
     minimal_scoring = 15
@@ -1007,6 +1041,7 @@ class RIBTHScoring(ScoringItem):
 
 @add_scoring
 class SFAllowedPlacementsScoring(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     full_name = 'Площадка, с которой сотрудничает МФО, не из списка'
     error_message = 'Площадка, с которой сотрудничает МФО, не из списка ' \
                     '(Сбербанк-АСТ - 44ФЗ и 223ФЗ, АО «ЕЭТП» – 44ФЗ, ' \
@@ -1029,6 +1064,7 @@ class SFAllowedPlacementsScoring(ScoringItem):
 
 @add_scoring
 class SFSumProfit(ScoringItem):
+    cost = ScoringItem.COST_DATABASE
     full_name = 'Сумма займа превышает 20% от суммы выручки за последний ' \
                 'отчетный год'
     error_message = 'Сумма займа превышает 20% от суммы выручки за последний ' \
@@ -1045,6 +1081,7 @@ class SFSumProfit(ScoringItem):
 
 @add_scoring
 class SGBFinanceScoring(ScoringItem):
+    cost = ScoringItem.COST_DATABASE
     disable_for_loans = True
     full_name = 'Величина чистых активов за последний завершенный квартал ' \
                 'меньше уставного капитала'
@@ -1082,6 +1119,7 @@ class SGBHasContractsScoring(HasContractsScoring):
 @add_scoring
 class SumBGScoring(ScoringItem):
     """ Проверка размера требуемой суммы БГ меньше, чем лимит банка """
+    cost = ScoringItem.COST_DATABASE
     full_name = 'Проверка размера требуемой суммы БГ меньше, чем лимит банка'
     error_message = 'Требуемая сумма БГ превышает допустимый размер'
     error_message_limit_for_client = 'Сумма выданных БГ на клиента превышена'
@@ -1100,6 +1138,7 @@ class SumBGScoring(ScoringItem):
 
 @add_scoring
 class SumScoring(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     full_name = 'SumScoring'
     amount = 0
     limit = 0
@@ -1116,6 +1155,7 @@ class SumScoring(ScoringItem):
 
 @add_scoring
 class TenderHasStopWords(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     full_name = 'TenderHasStopWords'
     stop_words = []
     scoring_params = ['stop_words']
@@ -1129,6 +1169,7 @@ class TenderHasStopWords(ScoringItem):
 
 @add_scoring
 class YearBOScoring(ScoringItem):
+    cost = ScoringItem.COST_DATABASE
     full_name = 'Отсутствует годовая бухгалтерская отчетность'
     error_message = 'Отсутствует годовая бухгалтерская отчетность'
     value = 365
@@ -1146,6 +1187,7 @@ class YearBOScoring(ScoringItem):
 @add_scoring
 class ActualCompanyStateScoring(ScoringItem):
     """ Проверка текущего состояния компания"""
+    cost = ScoringItem.COST_EXTERNAL
 
     def validate(self) -> ScoringResult:
         egrul_data = EgrulData.get_info(self.request.client.inn)
@@ -1160,6 +1202,7 @@ class ActualCompanyStateScoring(ScoringItem):
 @add_scoring
 class SPBExperienceScoring(ScoringItem):
     """ Проверка опыта компании """
+    cost = ScoringItem.COST_DATABASE
     error_message = 'Опыт клиента не удовлетворяет требованиям'
 
     def check_in_bank_regions(self, inn, kpp, regions):
@@ -1203,6 +1246,7 @@ class SPBExperienceScoring(ScoringItem):
 
 @add_scoring
 class StopRegionsScoring(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     regions = ['91', '05', '20', '06', '15', '07', '92', '09', '26']
     scoring_params = ['regions']
 
@@ -1219,6 +1263,7 @@ class StopRegionsScoring(ScoringItem):
 
 @add_scoring
 class SPBValidatePassportsScoring(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
 
     def validate(self) -> ScoringResult:
         passports = self.get_passports()
@@ -1244,6 +1289,7 @@ class SPBValidatePassportsScoring(ScoringItem):
 
 @add_scoring
 class SPBClientRatingScoring(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     scoring_params = [
         'finance_state', 'risk_level', 'category', 'score1', 'score2',
         'score_operator'
@@ -1322,6 +1368,7 @@ class SPBClientRatingScoring(ScoringItem):
 
 @add_scoring
 class IsIndividualEntrepreneur(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     error_message = 'Является Индивидуальным предпринимателем'
 
     def validate(self) -> ScoringResult:
@@ -1333,6 +1380,7 @@ class IsIndividualEntrepreneur(ScoringItem):
 
 @add_scoring
 class CountContractsForLaw(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     error_message = 'Отсутствует опыт исполненных гос. контрактов'
     laws = []
     laws_choices = generate_choices((('44', '44-ФЗ'), ('223', '223-ФЗ')))
@@ -1363,6 +1411,7 @@ class CountContractsForLaw(ScoringItem):
 
 @add_scoring
 class OrganizationFormScoring(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     error_message = 'Форма правления не удовлетворяет требованиям'
     organization_forms = []
     organization_forms_choices = generate_choices(
@@ -1385,6 +1434,7 @@ class OrganizationFormScoring(ScoringItem):
 
 @add_scoring
 class SPBResidentScoring(ScoringItem):
+    cost = ScoringItem.COST_DATABASE
     error_message = 'Директор или учередители с долей более 25% не являются ' \
                     'резидентами РФ'
 
@@ -1400,6 +1450,7 @@ class SPBResidentScoring(ScoringItem):
 
 @add_scoring
 class SPBNegativeNetAssetsLastQuarter(ScoringItem):
+    cost = ScoringItem.COST_DATABASE
     error_message = 'Убыток за последнюю дату или год'
 
     @cached_property
@@ -1424,12 +1475,12 @@ class SPBNegativeNetAssetsLastQuarter(ScoringItem):
 
 @add_scoring
 class ManyRegistrationAddressScoring(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     error_message = 'Юридический адрес является адресом массовой регистрации'
 
     def validate(self) -> ScoringResult:
-        result = ConclusionsLogic.get_conclusion_result(
-            client=self.request.client,
-            conclusion=AddressOfManyRegistrationsConclusion
+        result = self.facts.conclusion_result(
+            self.request.client, AddressOfManyRegistrationsConclusion
         )
         if not result.result:
             return ScoringResult(self.get_error_message())
@@ -1438,6 +1489,7 @@ class ManyRegistrationAddressScoring(ScoringItem):
 
 @add_scoring
 class SPBCheckBalance(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     error_message = 'Наличия арбитражных производств на дату рассмотрения заявки ' \
                     'Принципала в общей сумме, превышающей 25% от валюты баланса ' \
                     'Принципала на последнюю отчетную дату '
@@ -1466,6 +1518,7 @@ class SPBCheckBalance(ScoringItem):
 
 
 class CheckCourtBalance(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     percent = 25
     scoring_params = ['percent']
 
@@ -1499,6 +1552,7 @@ class CheckCourtBalance(ScoringItem):
 
 @add_scoring
 class FSSPScoring(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     limit = 300000
     scoring_params = ['limit']
 
@@ -1528,6 +1582,7 @@ class FSSPScoring(ScoringItem):
 
 @add_scoring
 class CheckCommission(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     operator = '>'
     value = 0
     scoring_params = ['operator', 'value']
@@ -1584,6 +1639,7 @@ class CheckCommission(ScoringItem):
 
 @add_scoring
 class InbankSumScoring(ScoringItem):
+    cost = ScoringItem.COST_DATABASE
     error_message = 'Сумма БГ превышает допустимую'
     YEAR_DAYS = 366
 
@@ -1630,6 +1686,7 @@ class InbankSumScoring(ScoringItem):
 
 @add_scoring
 class AlfaSumScoring(ScoringItem):
+    cost = ScoringItem.COST_DATABASE
     error_message = 'Сумма БГ превышает допустимую'
     YEAR_DAYS = 366
 
@@ -1667,6 +1724,7 @@ class AlfaSumScoring(ScoringItem):
 
 @add_scoring
 class SPBSimilarContracts(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     full_name = "Проверка количества контрактов для СПБ"
     min = 1
     scoring_params = ['min']
@@ -1681,6 +1739,7 @@ class SPBSimilarContracts(ScoringItem):
 
 @add_scoring
 class CheckRZDCustomer(ScoringItem):
+    cost = ScoringItem.COST_CHEAP
     full_name = 'Бенефициар закупки не относится к РЖД'
     inns = [
         '1435073060', '2221055435', '7606028688', '3808218300', '5047066172',
@@ -1717,6 +1776,7 @@ class CheckRZDCustomer(ScoringItem):
 
 @add_scoring
 class IsOrgReorganization(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     full_name = "Организация находится на стадии реорганизации"
 
     def is_organization_on_reorganization(self):
@@ -1739,6 +1799,7 @@ class IsOrgReorganization(ScoringItem):
 
 @add_scoring
 class HasPersonsBankrupt(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     error_message = "Учредитель банкрот"
 
     def validate(self) -> ScoringResult:
@@ -1753,6 +1814,7 @@ class HasPersonsBankrupt(ScoringItem):
 
 @add_scoring
 class IsLiquidationScoring(ScoringItem):
+    cost = ScoringItem.COST_EXTERNAL
     error_message = 'Компания в стадии ликвидации'
 
     def validate(self) -> ScoringResult:
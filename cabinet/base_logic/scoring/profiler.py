@@ -0,0 +1,155 @@
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+
+class RuleStats:
+    """ Статистика выполнения одного правила скоринга """
+    # границы корзин гистограммы, секунды
+    BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+    # последние замеры для расчета перцентилей
+    SAMPLES_SIZE = 1000
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.fails = 0
+        self.from_cache = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * (len(self.BUCKETS) + 1)
+        self.samples = deque(maxlen=self.SAMPLES_SIZE)
+        self.banks = {}
+
+    def add(self, elapsed, bank_code=None, passed=True, from_cache=False):
+        self.count += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.histogram[bisect.bisect_left(self.BUCKETS, elapsed)] += 1
+        self.samples.append(elapsed)
+        if not passed:
+            self.fails += 1
+        if from_cache:
+            self.from_cache += 1
+        if bank_code:
+            self.banks[bank_code] = self.banks.get(bank_code, 0) + elapsed
+
+    def percentile(self, percent):
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        index = min(len(samples) - 1, int(round(percent / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def to_dict(self, scoring_time=0.0):
+        return {
+            'name': self.name,
+            'count': self.count,
+            'fails': self.fails,
+            'from_cache': self.from_cache,
+            'total_time': round(self.total_time, 4),
+            'avg_time': round(self.total_time / self.count, 4) if self.count else 0,
+            'max_time': round(self.max_time, 4),
+            'p50': round(self.percentile(50), 4),
+            'p95': round(self.percentile(95), 4),
+            'share': round(self.total_time / scoring_time * 100, 1)
+            if scoring_time else 0,
+            'histogram': dict(zip(
+                ['<=%s' % bucket for bucket in self.BUCKETS] + ['>%s' % self.BUCKETS[-1]],
+                self.histogram
+            )),
+            'banks': {
+                bank: round(value, 4) for bank, value in self.banks.items()
+            },
+        }
+
+
+class ScoringProfiler:
+    """
+    Профилировщик скоринга: время выполнения каждого правила по банкам,
+    результат и использование кеша фактов. Данные хранятся в памяти процесса,
+    включается флагом в общем кеше (см. enable/disable)
+    """
+    ENABLED_CACHE_KEY = 'scoring_profiler_enabled'
+    # как часто перечитывать флаг из кеша, секунды
+    ENABLED_CHECK_INTERVAL = 30
+    TOTAL = 'total'
+
+    _lock = threading.Lock()
+    _local = threading.local()
+    _stats = {}
+    _enabled = None
+    _enabled_checked = 0
+
+    @classmethod
+    def is_enabled(cls):
+        now = time.monotonic()
+        if cls._enabled is None or now - cls._enabled_checked > cls.ENABLED_CHECK_INTERVAL:
+            cls._enabled = bool(cache.get(cls.ENABLED_CACHE_KEY, False))
+            cls._enabled_checked = now
+        return cls._enabled
+
+    @classmethod
+    def enable(cls):
+        cache.set(cls.ENABLED_CACHE_KEY, True, None)
+        cls._enabled = None
+
+    @classmethod
+    def disable(cls):
+        cache.set(cls.ENABLED_CACHE_KEY, False, None)
+        cls._enabled = None
+
+    @classmethod
+    def record(cls, name, elapsed, bank_code=None, passed=True, from_cache=False):
+        with cls._lock:
+            stats = cls._stats.get(name)
+            if stats is None:
+                stats = cls._stats[name] = RuleStats(name)
+            stats.add(
+                elapsed, bank_code=bank_code, passed=passed, from_cache=from_cache
+            )
+
+    @classmethod
+    @contextmanager
+    def measure_rules(cls, bank_code):
+        """
+        Замер общего времени проверки правил банка. Вложенные проверки
+        (ConditionalScoring) в общее время повторно не учитываются
+        """
+        depth = getattr(cls._local, 'depth', 0)
+        cls._local.depth = depth + 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            cls._local.depth = depth
+            if depth == 0:
+                cls.record(cls.TOTAL, time.monotonic() - start, bank_code=bank_code)
+
+    @classmethod
+    def get_report(cls):
+        with cls._lock:
+            total = cls._stats.get(cls.TOTAL)
+            scoring_time = total.total_time if total else 0.0
+            rules = sorted(
+                [
+                    stats.to_dict(scoring_time) for name, stats in cls._stats.items()
+                    if name != cls.TOTAL
+                ],
+                key=lambda item: item['total_time'],
+                reverse=True
+            )
+            return {
+                'enabled': cls.is_enabled(),
+                'total': total.to_dict(scoring_time) if total else None,
+                'rules': rules,
+            }
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._stats.clear()
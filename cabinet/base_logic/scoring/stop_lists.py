@@ -0,0 +1,75 @@
+import threading
+import uuid
+from typing import Dict, Iterable, Set
+
+from django.core.cache import cache
+
+from clients.models import BankStopInn
+
+
+class StopListIndex:
+    """
+    Стоп-листы ИНН всех банков в памяти процесса: {id банка: множество ИНН}.
+    Индекс загружается одним запросом и перечитывается при смене версии
+    в общем кеше (меняется при изменении BankStopInn, см. cabinet.signal_handlers)
+    """
+    VERSION_KEY = 'scoring_stop_list_version'
+
+    _index = None  # type: Dict[int, frozenset]
+    _version = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_version(cls):
+        version = cache.get(cls.VERSION_KEY)
+        if version is None:
+            cache.add(cls.VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(cls.VERSION_KEY)
+        return version
+
+    @classmethod
+    def load(cls) -> Dict[int, frozenset]:
+        index = {}
+        rows = BankStopInn.objects.values_list('credit_organization_id', 'inn')
+        for bank_id, inn in rows.iterator():
+            index.setdefault(bank_id, set()).add(inn.strip())
+        return {bank_id: frozenset(inns) for bank_id, inns in index.items()}
+
+    @classmethod
+    def get_index(cls) -> Dict[int, frozenset]:
+        version = cls.get_version()
+        if cls._index is not None and cls._version == version:
+            return cls._index
+        with cls._lock:
+            if cls._index is None or cls._version != version:
+                cls._index = cls.load()
+                cls._version = version
+            return cls._index
+
+    @classmethod
+    def get_blocked(cls, inns: Iterable[str], bank_ids: Iterable[int] = None
+                    ) -> Dict[int, Set[str]]:
+        """
+        Какие из ИНН находятся в стоп-листах каких банков,
+        возвращает {id банка: заблокированные ИНН} только для банков с совпадениями
+        """
+        inns = {str(inn).strip() for inn in inns if inn}
+        index = cls.get_index()
+        if bank_ids is not None:
+            index = {bank_id: index[bank_id] for bank_id in bank_ids if bank_id in index}
+        result = {}
+        for bank_id, stop_inns in index.items():
+            blocked = inns & stop_inns
+            if blocked:
+                result[bank_id] = blocked
+        return result
+
+    @classmethod
+    def is_blocked(cls, bank_id, inns: Iterable[str]) -> bool:
+        return bool(cls.get_blocked(inns, [bank_id]))
+
+    @classmethod
+    def invalidate(cls):
+        cache.set(cls.VERSION_KEY, uuid.uuid4().hex, None)
+        with cls._lock:
+            cls._index = None
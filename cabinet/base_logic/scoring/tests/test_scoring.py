@@ -5,11 +5,18 @@ from django.core.cache import cache
 
 from bank_guarantee.models import Request
 from base_request.models import RequestTender
-from cabinet.base_logic.scoring.base import ScoringLogic, ScoringResult
+from cabinet.base_logic.scoring.base import (
+    ScoringLogic, ScoringResult, ScoringPlan, ScoringPlanCache, ScoringItem
+)
+from cabinet.base_logic.scoring.batch import BatchScoring
+from cabinet.base_logic.scoring.facts import ScoringFacts
+from cabinet.base_logic.scoring.profiler import ScoringProfiler
+from cabinet.base_logic.scoring.stop_lists import StopListIndex
 from cabinet.base_logic.scoring.functions import (
     FailScoring, BGSumLessContractSum, ConditionalScoring,
     CountContractsScoring, RegexFieldsMatch, FieldEqualScoring,
-    AllowedTenderLawsScoring, TrueScoring, HasSimilarContracts, InBankBlackList
+    AllowedTenderLawsScoring, TrueScoring, HasSimilarContracts, InBankBlackList,
+    HasNalogDebts, SPBExperienceScoring
 )
 from cabinet.constants.constants import FederalLaw, Target
 from clients.models import Bank, BankSettings, Client
@@ -408,3 +415,150 @@ def test_in_global_black_list(mocker, default_request):
     func.banks_stop_list_enabled.return_value = True
     func.inns_in_stop_lists.return_value = False
     assert func.validate().is_success is True
+
+
+def test_scoring_plan_compile():
+    plan = ScoringPlan.compile([
+        {'class': 'TrueScoring'},
+        {'class': 'FailScoring', 'active': False},
+        {'class': 'FailScoring'},
+    ], is_active=lambda item: item.get('active', True))
+    assert plan.size == 3
+    assert [(index, cls) for index, cls, item in plan] == [
+        (1, TrueScoring), (3, FailScoring)
+    ]
+
+    plan += ScoringPlan.compile([{'class': 'FailScoring'}])
+    assert [index for index, cls, item in plan] == [1, 3, 4]
+
+    result = ScoringLogic(Bank(), Request()).validate_rules(plan)
+    assert result.errors_index == [3, 4]
+
+
+def test_scoring_plan_cache():
+    bank = Bank(id=100500, settings=BankSettings(
+        scoring_settings='[{"class": "FailScoring"}]'
+    ))
+    ScoringPlanCache.invalidate_bank(bank.id)
+    plan = ScoringLogic(bank, Request()).get_scoring_plan()
+    assert ScoringLogic(bank, Request()).get_scoring_plan() is plan
+
+    bank.settings.scoring_settings = '[{"class": "TrueScoring"}]'
+    assert ScoringLogic(bank, Request()).get_scoring_plan() is plan
+
+    ScoringPlanCache.invalidate_bank(bank.id)
+    new_plan = ScoringLogic(bank, Request()).get_scoring_plan()
+    assert new_plan is not plan
+    assert [cls for index, cls, item in new_plan] == [TrueScoring]
+
+
+def test_scoring_facts():
+    facts = ScoringFacts()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 'value'
+
+    assert facts.get('key', compute) == 'value'
+    assert facts.get('key', compute) == 'value'
+    assert len(calls) == 1
+    assert facts.get_stats() == {'hits': 1, 'misses': 1}
+
+
+def test_scoring_facts_shared_between_rules(mocker, default_request):
+    get_contracts = mocker.patch(
+        'cabinet.base_logic.scoring.facts.ContractsLogic.get_finished_contracts',
+        return_value=[]
+    )
+    facts = ScoringFacts()
+    for _ in range(3):
+        ScoringLogic(Bank(), default_request, facts=facts).validate_rules([
+            {'class': 'CountContractsScoring'},
+            {'class': 'HasSimilarContracts'},
+        ])
+    assert get_contracts.call_count == 1
+    assert facts.get_stats() == {'hits': 5, 'misses': 1}
+
+
+def test_fail_fast_cost_ordered(mocker):
+    validate = mocker.patch.object(HasSimilarContracts, 'validate')
+    rules = [
+        {'class': 'HasSimilarContracts'},
+        {'class': 'ConditionalScoring', 'if_conditionals': [{'class': 'TrueScoring'}],
+         'then_conditionals': [{'class': 'FailScoring', 'error_message': 'then'}]},
+        {'class': 'FailScoring', 'error_message': 'cheap'},
+    ]
+    result = ScoringLogic(Bank(), Request()).validate_rules(rules, fail_fast=True)
+    assert result.errors == ['cheap']
+    assert result.errors_index == [3]
+    assert validate.call_count == 0
+
+    result = ScoringLogic(Bank(), Request()).validate_rules(rules[:2], fail_fast=True)
+    assert result.errors == ['then']
+    assert validate.call_count == 0
+
+
+def test_rule_costs():
+    assert HasNalogDebts.cost == ScoringItem.COST_EXTERNAL
+    assert 'cost' in vars(SPBExperienceScoring)
+    assert 'cost' in vars(InBankBlackList)
+    assert TrueScoring.cost == ScoringItem.COST_CHEAP
+
+
+def test_batch_scoring():
+    banks = [
+        Bank(id=100501, settings=BankSettings(
+            scoring_settings='[{"class": "TrueScoring"}]'
+        )),
+        Bank(id=100502, settings=BankSettings(
+            scoring_settings='[{"class": "FailScoring", "error_message": "fail"}]'
+        )),
+    ]
+    for bank in banks:
+        ScoringPlanCache.invalidate_bank(bank.id)
+    requests = [Request(id=1), Request(id=2)]
+    result = BatchScoring(
+        requests, banks, use_common_rules=False, workers=2
+    ).run()
+    for request in requests:
+        assert result.get_passed_banks(request.id) == [100501]
+        assert result.get_result(request.id, 100502).errors == ['fail']
+
+
+def test_scoring_profiler(mocker):
+    mocker.patch.object(ScoringProfiler, 'is_enabled', return_value=True)
+    ScoringProfiler.reset()
+    ScoringLogic(Bank(code='test_bank'), Request()).validate_rules([
+        {'class': 'TrueScoring'},
+        {'class': 'ConditionalScoring', 'if_conditionals': [{'class': 'TrueScoring'}],
+         'then_conditionals': [{'class': 'FailScoring'}]},
+    ])
+    report = ScoringProfiler.get_report()
+    rules = {rule['name']: rule for rule in report['rules']}
+    assert report['total']['count'] == 1
+    assert rules['TrueScoring']['count'] == 2
+    assert rules['FailScoring']['fails'] == 1
+    assert rules['ConditionalScoring']['fails'] == 1
+    assert 'test_bank' in rules['TrueScoring']['banks']
+    ScoringProfiler.reset()
+
+
+def test_stop_list_index(mocker):
+    load = mocker.patch.object(StopListIndex, 'load', return_value={
+        1: frozenset(['111', '222']),
+        2: frozenset(['222']),
+    })
+    StopListIndex.invalidate()
+    assert StopListIndex.get_blocked(['222', '333']) == {1: {'222'}, 2: {'222'}}
+    assert StopListIndex.get_blocked(['111', '333'], [2, 3]) == {}
+    assert StopListIndex.is_blocked(1, ['111'])
+    assert load.call_count == 1
+
+    facts = ScoringFacts()
+    func = InBankBlackList(Bank(id=2), Request(), {})
+    func.facts = facts
+    assert func.inns_in_stop_lists(['222', '']) is True
+    assert func.inns_in_stop_lists(['222']) is True
+    assert facts.get_stats() == {'hits': 1, 'misses': 1}
+    StopListIndex.invalidate()
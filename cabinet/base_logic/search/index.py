@@ -0,0 +1,185 @@
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, Value, When
+
+from cabinet.models import SearchDocument
+
+logger = logging.getLogger('django')
+
+# разделитель полей, чтобы подстрока не склеивала соседние поля
+SEPARATOR = ' | '
+
+REQUEST_FIELDS = [
+    'request_number', 'tender__notification_id',
+    'client__inn', 'client__short_name', 'client__full_name',
+]
+CLIENT_FIELDS = [
+    'inn', 'short_name', 'full_name', 'profile__short_name', 'profile__full_name',
+]
+# собственные поля заявки, от которых зависит ее документ
+REQUEST_SOURCE_FIELDS = ['request_number', 'tender_id', 'client_id']
+
+
+def normalize(value) -> str:
+    return ' '.join(str(value).upper().replace('Ё', 'Е').split())
+
+
+class SearchIndex:
+    """
+    Поисковые документы заявок БГ, займов и клиентов (SearchDocument).
+    Обновляются после фиксации транзакции при сохранении заявки, тендера,
+    клиента и анкеты, поиск подстроки идет по триграммному индексу.
+    Пока документы типа не построены (rebuild_search_index), поиск идет
+    по полям объектов через icontains
+    """
+    chunk_size = 2000
+    _built_types = set()
+
+    @staticmethod
+    def get_model(object_type):
+        from bank_guarantee.models import Request
+        from clients.models import Client
+        from tender_loans.models import LoanRequest
+        return {
+            SearchDocument.TYPE_BG: Request,
+            SearchDocument.TYPE_LOAN: LoanRequest,
+            SearchDocument.TYPE_CLIENT: Client,
+        }[object_type]
+
+    @staticmethod
+    def get_type(model) -> str:
+        if model._meta.label == 'clients.Client':
+            return SearchDocument.TYPE_CLIENT
+        if model._meta.label == 'tender_loans.LoanRequest':
+            return SearchDocument.TYPE_LOAN
+        return SearchDocument.TYPE_BG
+
+    @staticmethod
+    def get_fields(object_type) -> list:
+        if object_type == SearchDocument.TYPE_CLIENT:
+            return CLIENT_FIELDS
+        return REQUEST_FIELDS
+
+    @classmethod
+    def is_built(cls, object_type) -> bool:
+        """ Построены ли документы типа, положительный ответ запоминается в процессе """
+        if object_type not in cls._built_types:
+            if SearchDocument.objects.filter(object_type=object_type).exists():
+                cls._built_types.add(object_type)
+        return object_type in cls._built_types
+
+    @classmethod
+    def get_texts(cls, object_type, queryset) -> dict:
+        """ {id: текст документа}, значения без повторов в порядке полей """
+        fields = cls.get_fields(object_type)
+        values = defaultdict(list)
+        for row in queryset.values('id', *fields).order_by('id').iterator():
+            for field in fields:
+                value = normalize(row[field] or '')
+                if value and value not in values[row['id']]:
+                    values[row['id']].append(value)
+        return {pk: SEPARATOR.join(parts) for pk, parts in values.items()}
+
+    @classmethod
+    def update(cls, object_type, ids):
+        """ Пересчет документов объектов ids, документы удаленных объектов удаляются """
+        ids = list(ids)
+        model = cls.get_model(object_type)
+        texts = cls.get_texts(object_type, model.objects.filter(id__in=ids))
+        with transaction.atomic():
+            SearchDocument.objects.filter(
+                object_type=object_type, object_id__in=ids
+            ).delete()
+            SearchDocument.objects.bulk_create([
+                SearchDocument(object_type=object_type, object_id=pk, text=text)
+                for pk, text in texts.items()
+            ])
+
+    @classmethod
+    def on_changed(cls, object_type, ids):
+        """ Обновление документов после фиксации транзакции """
+        if not ids:
+            return
+
+        def update():
+            try:
+                cls.update(object_type, ids)
+            except Exception as error:
+                logger.exception(error)
+        transaction.on_commit(update)
+
+    @classmethod
+    def on_client_changed(cls, client_id):
+        """ Документ клиента и документы его заявок """
+        cls.on_changed(SearchDocument.TYPE_CLIENT, [client_id])
+        for object_type in [SearchDocument.TYPE_BG, SearchDocument.TYPE_LOAN]:
+            model = cls.get_model(object_type)
+            cls.on_changed(object_type, list(model.objects.filter(
+                client_id=client_id
+            ).values_list('id', flat=True)))
+
+    @classmethod
+    def on_tender_changed(cls, tender_id):
+        for object_type in [SearchDocument.TYPE_BG, SearchDocument.TYPE_LOAN]:
+            model = cls.get_model(object_type)
+            cls.on_changed(object_type, list(model.objects.filter(
+                tender_id=tender_id
+            ).values_list('id', flat=True)))
+
+    @classmethod
+    def rebuild(cls, object_type, stdout=None) -> int:
+        """ Полное построение документов типа пачками по chunk_size """
+        model = cls.get_model(object_type)
+        ids = list(model.objects.order_by('id').values_list('id', flat=True))
+        with transaction.atomic():
+            SearchDocument.objects.filter(object_type=object_type).delete()
+            for start in range(0, len(ids), cls.chunk_size):
+                texts = cls.get_texts(object_type, model.objects.filter(
+                    id__in=ids[start:start + cls.chunk_size]
+                ))
+                SearchDocument.objects.bulk_create([
+                    SearchDocument(object_type=object_type, object_id=pk, text=text)
+                    for pk, text in texts.items()
+                ])
+                if stdout:
+                    stdout.write('%s: %s' % (object_type, start + len(texts)))
+        return len(ids)
+
+    @classmethod
+    def search(cls, object_type, term):
+        """ id объектов, в документе которых есть подстрока term """
+        if not cls.is_built(object_type):
+            condition = Q()
+            for field in cls.get_fields(object_type):
+                condition |= Q(**{field + '__icontains': term.strip()})
+            return cls.get_model(object_type).objects.filter(condition).values('id')
+        return SearchDocument.objects.filter(
+            object_type=object_type, text__contains=normalize(term)
+        ).values('object_id')
+
+    @classmethod
+    def filter(cls, queryset, term):
+        return queryset.filter(id__in=cls.search(cls.get_type(queryset.model), term))
+
+    @classmethod
+    def annotate_rank(cls, queryset, term):
+        """
+        search_rank: 3 - документ начинается с term (ИНН, номер заявки),
+        2 - с term начинается слово, 1 - остальные совпадения
+        """
+        if not cls.is_built(cls.get_type(queryset.model)):
+            return queryset.annotate(search_rank=Value(1, output_field=IntegerField()))
+        term = normalize(term)
+        rank = SearchDocument.objects.filter(
+            object_type=cls.get_type(queryset.model), object_id=OuterRef('id')
+        ).annotate(rank=Case(
+            When(text__startswith=term, then=Value(3)),
+            When(text__contains=' ' + term, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField()
+        )).values('rank')[:1]
+        return queryset.annotate(
+            search_rank=Subquery(rank, output_field=IntegerField())
+        )
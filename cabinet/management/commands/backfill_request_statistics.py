@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand
+
+from bank_guarantee.models import Request
+from cabinet.base_logic.reports.rollup import RequestRollup
+
+
+class Command(BaseCommand):
+    help = 'Пересчет дневной сводки по заявкам для отчетов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from', dest='date_from', default=None,
+            help='Пересчитать только заявки со сменой статуса с даты ГГГГ-ММ-ДД'
+        )
+
+    def handle(self, *args, **options):
+        if options['date_from']:
+            requests = Request.objects.filter(
+                status_changed_date__gte=options['date_from']
+            )
+            for request_id in requests.values_list('id', flat=True).iterator():
+                RequestRollup.update_request(request_id)
+            total = requests.count()
+        else:
+            total = RequestRollup.backfill(stdout=self.stdout)
+        self.stdout.write('Сводка пересчитана, заявок: %s' % total)
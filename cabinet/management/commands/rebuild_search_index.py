@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand
+
+from cabinet.base_logic.search.index import SearchIndex
+from cabinet.models import SearchDocument
+
+
+class Command(BaseCommand):
+    help = 'Построение поисковых документов заявок и клиентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type', dest='object_type', default=None,
+            choices=[
+                SearchDocument.TYPE_BG, SearchDocument.TYPE_LOAN,
+                SearchDocument.TYPE_CLIENT,
+            ],
+            help='Пересчитать только документы типа'
+        )
+
+    def handle(self, *args, **options):
+        object_types = [options['object_type']] if options['object_type'] else [
+            SearchDocument.TYPE_BG, SearchDocument.TYPE_LOAN, SearchDocument.TYPE_CLIENT,
+        ]
+        for object_type in object_types:
+            total = SearchIndex.rebuild(object_type, stdout=self.stdout)
+            self.stdout.write('Документы %s построены: %s' % (object_type, total))
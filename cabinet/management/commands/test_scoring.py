@@ -1,17 +1,60 @@
+import json
+
 from django.core.management import BaseCommand
 
 from bank_guarantee.models import Request
-from cabinet.base_logic.scoring.functions import FieldEqualScoring
+from cabinet.base_logic.scoring.batch import BatchScoring
+from clients.models import Bank
+from tender_loans.models import LoanRequest
 
 
 class Command(BaseCommand):
-    help = 'Тест оповещения об ошибке скоринга'
+    help = 'Пакетный скоринг заявок в банках без отправки (матрица заявка x банк)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('request_id', nargs='+', type=int)
+        parser.add_argument(
+            '--banks', nargs='+', type=int, default=None,
+            help='id банков, по умолчанию все банки, принимающие заявки'
+        )
+        parser.add_argument('--loans', action='store_true',
+                            help='Проверять заявки на тендерные займы')
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--fail-fast', action='store_true',
+                            help='Останавливать проверку на первой ошибке')
+        parser.add_argument('--output', default=None,
+                            help='Сохранить результат в json файл')
 
     def handle(self, *args, **options):
-        request = Request(required_amount=1000)
-        FieldEqualScoring(None, request, {
-            "error_message": "Ошибка",
-            "field": "request.required_amount",
-            "operation": "!=",
-            "value": 'gdf'
-        }).get_result()
+        model = LoanRequest if options['loans'] else Request
+        requests = model.objects.filter(
+            id__in=options['request_id']
+        ).select_related('client__profile', 'tender').order_by('id')
+
+        banks = Bank.objects.select_related('settings').order_by('id')
+        if options['banks']:
+            banks = banks.filter(id__in=options['banks'])
+        else:
+            banks = banks.filter(settings__enable=True)
+
+        result = BatchScoring(
+            requests, banks,
+            fail_fast=options['fail_fast'],
+            workers=options['workers'],
+        ).run()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result.to_dict(), f, ensure_ascii=False, indent=2)
+
+        for request in result.requests:
+            self.stdout.write('Заявка %s' % request.id)
+            for bank in result.banks:
+                scoring_result = result.get_result(request.id, bank.id)
+                if scoring_result.is_success:
+                    self.stdout.write('  %s: пройден' % bank.short_name)
+                else:
+                    self.stdout.write('  %s: не пройден (%s)' % (
+                        bank.short_name, '; '.join(scoring_result.get_errors())
+                    ))
+        self.stdout.write('Кеш фактов: %s' % result.facts.get_stats())
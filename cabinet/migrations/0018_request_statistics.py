@@ -0,0 +1,57 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cabinet', '0017_auto_20200416_1154'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='system',
+            name='reports_use_rollup',
+            field=models.BooleanField(default=False, verbose_name='Отчеты: использовать дневную сводку по заявкам'),
+        ),
+        migrations.CreateModel(
+            name='RequestDailyStatistics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('product', models.CharField(max_length=10)),
+                ('bank_id', models.IntegerField(default=0)),
+                ('agent_id', models.IntegerField(default=0)),
+                ('manager_id', models.IntegerField(default=0)),
+                ('status_id', models.IntegerField(default=0)),
+                ('is_unique', models.BooleanField(default=False)),
+                ('count', models.IntegerField(default=0)),
+                ('required_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('offer_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('commission', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'unique_together': {('day', 'product', 'bank_id', 'agent_id', 'manager_id', 'status_id', 'is_unique')},
+                'index_together': {('day', 'product')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RequestStatisticsFact',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('product', models.CharField(max_length=10)),
+                ('bank_id', models.IntegerField(default=0)),
+                ('agent_id', models.IntegerField(default=0)),
+                ('manager_id', models.IntegerField(default=0)),
+                ('status_id', models.IntegerField(default=0)),
+                ('is_unique', models.BooleanField(default=False)),
+                ('request_id', models.IntegerField()),
+                ('required_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('offer_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('commission', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'unique_together': {('product', 'request_id')},
+            },
+        ),
+    ]
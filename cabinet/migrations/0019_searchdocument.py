@@ -0,0 +1,30 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cabinet', '0018_request_statistics'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(max_length=10)),
+                ('object_id', models.IntegerField()),
+                ('text', models.TextField()),
+            ],
+            options={
+                'unique_together': {('object_type', 'object_id')},
+            },
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX cabinet_searchdocument_text_trgm '
+            'ON cabinet_searchdocument USING gin (text gin_trgm_ops)',
+            'DROP INDEX cabinet_searchdocument_text_trgm',
+        ),
+    ]
@@ -7,6 +7,7 @@ from django.db import models
 from django.db.models.query_utils import Q
 from django.utils import timezone
 from requests import Session
+from requests.exceptions import RequestException
 from sentry_sdk import capture_exception
 
 from cabinet.constants.constants import Target
@@ -206,10 +207,27 @@ class EgrulData(models.Model):
     def _get_version(cls):
         return VERSION
 
+    # повторить попытку загрузки выписки
+    RETRY = object()
+    DOWNLOAD_TIMEOUT = (5, 30)
+
+    @classmethod
+    def _download_pdf(cls, inn, retries=5):
+        for _ in range(retries + 1):
+            try:
+                result = cls._try_download_pdf(inn)
+            except RequestException as e:
+                capture_exception(e)
+                result = cls.RETRY
+            except JSONDecodeError:
+                result = cls.RETRY
+            if result is not cls.RETRY:
+                return result
+            sleep(2)
+        return None
+
     @classmethod
-    def _download_pdf(cls, inn, retries=0):
-        if retries > 5:
-            return None
+    def _try_download_pdf(cls, inn):
         form_data = {
             "vyp3CaptchaToken": "",
             "query": inn,
@@ -217,44 +235,33 @@ class EgrulData(models.Model):
             "PreventChromeAutocomplete": "",
         }
         client = Session()
-        try:
-            response = client.post('https://egrul.nalog.ru', data=form_data)
-        except ConnectionError as e:
-            sleep(2)
-            capture_exception(e)
-            return cls._download_pdf(inn, retries=retries + 1)
-        if response.status_code == 200:
-            response = response.json()
-        else:
-            return cls._download_pdf(inn, retries=retries + 1)
+        timeout = cls.DOWNLOAD_TIMEOUT
+        response = client.post('https://egrul.nalog.ru', data=form_data, timeout=timeout)
+        if response.status_code != 200:
+            return cls.RETRY
+        response = response.json()
         if not response.get('captchaRequired', False):
-            try:
-                token = response.get('t')
-                if token:
+            token = response.get('t')
+            if not token:
+                return cls.RETRY
+            response = client.get(
+                'https://egrul.nalog.ru/search-result/' + token, timeout=timeout
+            ).json()
+            tokens = response.get('rows') or [{'t': None}]
+            token = tokens[0].get('t', None) or token
+            if token:
+                client.get('https://egrul.nalog.ru/vyp-request/' + token, timeout=timeout)
+                for _ in range(4):
+                    sleep(2)
                     response = client.get(
-                        'https://egrul.nalog.ru/search-result/' + token
+                        'https://egrul.nalog.ru/vyp-status/' + token, timeout=timeout
                     ).json()
-                    tokens = response.get('rows') or [{'t': None}]
-                    token = tokens[0].get('t', None) or token
-                    if token:
-                        client.get('https://egrul.nalog.ru/vyp-request/' + token)
-                        for _ in range(4):
-                            sleep(2)
-                            response = client.get(
-                                'https://egrul.nalog.ru/vyp-status/' + token
-                            ).json()
-                            if response.get('status') == 'ready':
-                                download_url = 'https://egrul.nalog.ru/vyp-download/' + \
-                                               token
-                                return download_file(download_url)
-
-                else:
-                    return cls._download_pdf(inn, retries=retries + 1)
-            except JSONDecodeError:
-                return cls._download_pdf(inn, retries=retries + 1)
+                    if response.get('status') == 'ready':
+                        download_url = 'https://egrul.nalog.ru/vyp-download/' + token
+                        return download_file(download_url)
 
         if response.get('ERRORS', {}).get('captcha', [None])[0]:
-            return cls._download_pdf(inn, retries=retries + 1)
+            return cls.RETRY
 
         return None
 
@@ -415,6 +422,10 @@ class System(models.Model):
                      '(Инбак/СимлФинанс)'
     )
     default_scoring_rules = models.TextField(default='[]')
+    reports_use_rollup = models.BooleanField(
+        default=False,
+        verbose_name='Отчеты: использовать дневную сводку по заявкам'
+    )
 
     @classmethod
     def get_setting(cls, name, for_update=False, default=None):
@@ -429,3 +440,69 @@ class System(models.Model):
     def set_settings(cls, name, value):
         System.objects.get_or_create(id=1)
         System.objects.filter(id=1).update(**{name: value})
+        if name == 'default_scoring_rules':
+            from cabinet.base_logic.scoring.base import ScoringPlanCache
+            ScoringPlanCache.invalidate_common()
+
+
+class RequestStatisticsKey(models.Model):
+    """ Разрез дневной сводки по заявкам, 0 - значение не задано """
+    day = models.DateField()
+    product = models.CharField(max_length=10)
+    bank_id = models.IntegerField(default=0)
+    agent_id = models.IntegerField(default=0)
+    manager_id = models.IntegerField(default=0)
+    status_id = models.IntegerField(default=0)
+    is_unique = models.BooleanField(default=False)
+
+    KEY_FIELDS = [
+        'day', 'product', 'bank_id', 'agent_id', 'manager_id', 'status_id',
+        'is_unique'
+    ]
+
+    class Meta:
+        abstract = True
+
+
+class RequestStatisticsFact(RequestStatisticsKey):
+    """ Текущий вклад заявки в дневную сводку RequestDailyStatistics """
+    request_id = models.IntegerField()
+    required_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    offer_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    commission = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('product', 'request_id')
+
+
+class RequestDailyStatistics(RequestStatisticsKey):
+    """
+    Сводка по заявкам за день в разрезе банк/агент/менеджер/статус/продукт
+    по дате последней смены статуса заявки
+    """
+    count = models.IntegerField(default=0)
+    required_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    offer_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    commission = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = RequestStatisticsKey.KEY_FIELDS
+        index_together = [('day', 'product')]
+
+
+class SearchDocument(models.Model):
+    """
+    Поисковый документ заявки или клиента: номер заявки, извещение,
+    ИНН и наименования клиента одной строкой в верхнем регистре.
+    По text построен триграммный GIN индекс (pg_trgm), см. SearchIndex
+    """
+    TYPE_BG = 'bg'
+    TYPE_LOAN = 'loan'
+    TYPE_CLIENT = 'client'
+
+    object_type = models.CharField(max_length=10)
+    object_id = models.IntegerField()
+    text = models.TextField()
+
+    class Meta:
+        unique_together = ('object_type', 'object_id')
@@ -1,11 +1,77 @@
 from django.db.models.expressions import F
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_save
 from django.dispatch.dispatcher import receiver
 
-from cabinet.models import WorkRule
+from cabinet.base_logic.helpers.access_scope import AccessScope
+from cabinet.base_logic.helpers.previous import forget_previous, is_changed, track_fields
+from cabinet.base_logic.package.base import PackageCache
+from cabinet.base_logic.scoring.base import ScoringPlanCache
+from cabinet.base_logic.search.index import REQUEST_SOURCE_FIELDS, SearchIndex
+from cabinet.base_logic.scoring.stop_lists import StopListIndex
+from cabinet.models import SearchDocument, WorkRule, System
+from clients.models import (
+    BankPackage, BankSettings, BankStopInn, MFOPackage, MFOSettings
+)
+from tender_loans.models import LoanRequest
+from users.models import User
+
+track_fields(LoanRequest, REQUEST_SOURCE_FIELDS)
 
 
 @receiver(post_save, sender=WorkRule)
 def add_work_rule(sender, instance, **kwargs):
     from clients.models import Agent
     Agent.objects.all().update(work_rules=F('work_rules') + 1)
+
+
+@receiver(post_save, sender=BankSettings)
+def reset_bank_scoring_plan(sender, instance, **kwargs):
+    ScoringPlanCache.invalidate_bank(instance.credit_organization_id)
+
+
+@receiver(post_save, sender=System)
+def reset_common_scoring_plan(sender, instance, **kwargs):
+    ScoringPlanCache.invalidate_common()
+
+
+@receiver(post_save, sender=BankStopInn)
+@receiver(post_delete, sender=BankStopInn)
+def reset_stop_list_index(sender, instance, **kwargs):
+    StopListIndex.invalidate()
+
+
+@receiver(post_save, sender=BankPackage)
+@receiver(post_delete, sender=BankPackage)
+@receiver(post_save, sender=MFOPackage)
+@receiver(post_delete, sender=MFOPackage)
+@receiver(post_save, sender=BankSettings)
+@receiver(post_save, sender=MFOSettings)
+@receiver(post_save, sender=System)
+def reset_package_cache(sender, instance, **kwargs):
+    PackageCache.invalidate()
+
+
+@receiver(pre_save, sender=LoanRequest)
+def check_loan_request_search_fields_changed(sender, instance, **kwargs):
+    instance.search_fields_changed = is_changed(instance, REQUEST_SOURCE_FIELDS)
+
+
+@receiver(post_save, sender=LoanRequest)
+def forget_previous_loan_request(sender, instance, **kwargs):
+    forget_previous(instance)
+
+
+@receiver(post_save, sender=LoanRequest)
+def update_loan_request_search_document(sender, instance, **kwargs):
+    if getattr(instance, 'search_fields_changed', True):
+        SearchIndex.on_changed(SearchDocument.TYPE_LOAN, [instance.id])
+
+
+@receiver(post_delete, sender=LoanRequest)
+def delete_loan_request_search_document(sender, instance, **kwargs):
+    SearchIndex.on_changed(SearchDocument.TYPE_LOAN, [instance.id])
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+def reset_access_scope(sender, **kwargs):
+    AccessScope.invalidate()
@@ -0,0 +1,16 @@
+import logging
+
+from django_rq import job
+
+from cabinet.base_logic.reports.jobs import ReportJob
+
+logger = logging.getLogger('django')
+
+
+@job
+def task_generate_report(job_id):
+    """ Построение отчета в фоне """
+    report_job = ReportJob.get(job_id)
+    if report_job:
+        logger.info("Построение отчета %s, задача %s" % (report_job.report, job_id))
+        report_job.run()
@@ -0,0 +1,74 @@
+import pytest
+
+from bank_guarantee.models import Request
+from cabinet.base_logic.helpers.access_scope import AccessScope
+from permissions.logic.bank_guarantee import GetUserAllowedRequests
+from tests.conf.load_db.load_request import create_bg_request
+from users.models import Role, User
+
+
+class QuerySet:
+
+    def __init__(self):
+        self.filters = []
+
+    def filter(self, **kwargs):
+        self.filters.append(kwargs)
+        return self
+
+
+def test_access_scope_cached_until_invalidate(mocker):
+    user = User(id=100500)
+    load = mocker.patch.object(
+        AccessScope, 'load', return_value={'client_ids': [1, 2]}
+    )
+
+    assert AccessScope.get(user) == {'client_ids': [1, 2]}
+    assert AccessScope.get(user) == {'client_ids': [1, 2]}
+    assert load.call_count == 1
+
+    AccessScope.invalidate_user(user.id)
+    requests = AccessScope.filter_requests(user, QuerySet())
+    assert requests.filters == [{'client_id__in': [1, 2]}]
+    assert load.call_count == 2
+
+    AccessScope.invalidate()
+    AccessScope.get(user)
+    assert load.call_count == 3
+
+
+def test_access_scope_all():
+    requests = QuerySet()
+    assert AccessScope.apply({'all': True}, requests) is requests
+    assert requests.filters == []
+
+
+def create_user(email, roles, client=None):
+    user = User.objects.create_user(email, password='password')
+    user.client = client
+    user.roles.set(Role.objects.filter(name__in=roles))
+    user.save()
+    return user
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('roles', [
+    [Role.MANAGER],
+    [Role.SUPER_AGENT],
+    [Role.AGENT],
+    [Role.CLIENT],
+    [Role.MANAGER, Role.AGENT],
+])
+def test_access_scope_matches_permissions(setup_db, roles):
+    client = setup_db['client']
+    user = create_user('scope@test.ru', roles, client=client.agent_company)
+    client.manager = user
+    client.save()
+    create_bg_request(client)
+    AccessScope.invalidate()
+
+    expected = GetUserAllowedRequests().execute(user, requests=Request.objects.all())
+    result = AccessScope.filter_requests(user, Request.objects.all())
+    assert set(result.values_list('id', flat=True)) == set(
+        expected.values_list('id', flat=True)
+    )
@@ -0,0 +1,65 @@
+from cabinet.base_logic.helpers import files
+
+
+class Manager:
+    queries = 0
+
+    def __init__(self, count):
+        self.count_value = count
+
+    def filter(self, **kwargs):
+        return self
+
+    def values_list(self, *fields, flat=False):
+        return self
+
+    def union(self, *others, all=False):
+        assert all
+        return Manager(self.count_value + sum(other.count_value for other in others))
+
+    def count(self):
+        Manager.queries += 1
+        return self.count_value
+
+
+class Relation:
+
+    def __init__(self, model_name, count, many_to_many=False):
+        self.many_to_many = many_to_many
+        self.field = type('Field', (), {'name': 'file'})
+        self.related_model = type('Model', (), {
+            '_meta': type('Meta', (), {'model_name': model_name}),
+            '_base_manager': Manager(count),
+        })
+
+
+class File:
+    deleted = False
+
+    def __init__(self, *relations):
+        self._meta = type('Meta', (), {'related_objects': relations})
+
+    def delete(self):
+        self.deleted = True
+
+
+def test_file_references_skip_signatures():
+    base_file = File(
+        Relation('requestdocument', 2), Relation('offerdocument', 1),
+        Relation('sign', 5), Relation('separatedsignature', 1),
+    )
+    Manager.queries = 0
+    assert files.get_file_references(base_file) == 3
+    assert Manager.queries == 1
+    assert files.delete_file_if_unused(base_file) is False
+    assert base_file.deleted is False
+
+
+def test_delete_unused_file():
+    base_file = File(Relation('requestdocument', 0), Relation('sign', 1))
+    assert files.delete_file_if_unused(base_file) is True
+    assert base_file.deleted is True
+
+
+def test_file_without_references():
+    assert files.get_file_references(File(Relation('sign', 1))) == 0
@@ -1,6 +1,6 @@
 import pytest
 
-from cabinet.base_logic.helpers.check_data import check_in_regions
+from cabinet.base_logic.helpers.check_data import check_in_regions, find_in_regions
 
 
 @pytest.mark.parametrize('inn, kpp, regions, result', [
@@ -12,3 +12,9 @@ from cabinet.base_logic.helpers.check_data import check_in_regions
 ])
 def test_check_in_regions(inn, kpp, regions, result):
     assert check_in_regions(inn, regions, kpp) == result
+
+
+def test_find_in_regions():
+    assert find_in_regions(
+        [('12345', '67890'), ('12345', '12890'), ('99345', None)], ['67', '99']
+    ) == [True, False, True]
@@ -0,0 +1,44 @@
+import datetime
+
+import pytest
+
+from cabinet.base_logic.helpers.pagination import (
+    InvalidCursor, InvalidLimit, decode_cursor, encode_cursor, get_limit, get_page
+)
+
+
+def test_cursor_round_trip():
+    date = datetime.datetime(2020, 5, 17, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(date, 42)) == (date, 42)
+
+
+def test_invalid_cursor():
+    with pytest.raises(InvalidCursor):
+        decode_cursor('not a cursor')
+
+
+@pytest.mark.parametrize('value,result', [
+    (None, 50), ('', 50), ('10', 10), ('0', 1), ('-5', 1), ('1000', 200),
+])
+def test_get_limit(value, result):
+    assert get_limit(value) == result
+
+
+def test_invalid_limit():
+    with pytest.raises(InvalidLimit):
+        get_limit('abc')
+
+
+def test_get_page():
+    date = datetime.datetime(2020, 5, 17)
+    rows = [
+        {'id': pk, 'status_changed_date': date - datetime.timedelta(days=pk)}
+        for pk in range(1, 4)
+    ]
+    page, next_cursor = get_page(iter(rows), 2)
+    assert [row['id'] for row in page] == [1, 2]
+    assert decode_cursor(next_cursor) == (rows[1]['status_changed_date'], 2)
+
+    page, next_cursor = get_page(iter(rows), 3)
+    assert len(page) == 3
+    assert next_cursor is None
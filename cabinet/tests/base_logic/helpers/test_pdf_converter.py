@@ -0,0 +1,87 @@
+import signal
+
+import pytest
+
+from cabinet.base_logic.helpers.pdf_converter import (
+    ConverterWorker, PdfConversionError, PdfConverter
+)
+
+
+def test_soffice_command_uses_own_profile():
+    worker = ConverterWorker(1, path_soffice='soffice')
+    command = worker.get_command('/tmp/report.xlsx', '/tmp/job')
+    assert command[0] == 'soffice'
+    assert '-env:UserInstallation=%s' % worker.profile_url in command
+    assert command[-3:] == ['--outdir', '/tmp/job', '/tmp/report.xlsx']
+    assert ConverterWorker(2, path_soffice='soffice').profile_dir != worker.profile_dir
+
+
+def test_unoconvert_command():
+    worker = ConverterWorker(
+        0, path_soffice='soffice', path_unoserver='unoserver',
+        path_unoconvert='unoconvert', port=3000
+    )
+    assert worker.get_command('/tmp/form.docx', '/tmp/job') == [
+        'unoconvert', '--host', '127.0.0.1', '--port', '3000',
+        '--convert-to', 'pdf', '/tmp/form.docx', '/tmp/job/form.pdf',
+    ]
+
+
+def test_unoserver_start_waits_ready(mocker):
+    popen = mocker.patch('subprocess.Popen')
+    popen.return_value.poll.return_value = None
+    is_ready = mocker.patch.object(
+        ConverterWorker, 'is_ready', side_effect=[False, True]
+    )
+    mocker.patch('time.sleep')
+    worker = ConverterWorker(
+        0, path_soffice='soffice', path_unoserver='unoserver',
+        path_unoconvert='unoconvert'
+    )
+    worker.start()
+    command = popen.call_args[0][0]
+    assert command[command.index('--port') + 1] == str(worker.port)
+    assert command[command.index('--uno-port') + 1] == str(worker.uno_port)
+    assert worker.port != worker.uno_port
+    assert is_ready.call_count == 2
+
+
+def test_unoserver_start_fails(mocker):
+    popen = mocker.patch('subprocess.Popen')
+    popen.return_value.poll.return_value = 1
+    killpg = mocker.patch('os.killpg')
+    worker = ConverterWorker(
+        0, path_soffice='soffice', path_unoserver='unoserver',
+        path_unoconvert='unoconvert'
+    )
+    with pytest.raises(PdfConversionError):
+        worker.start()
+    assert worker.process is None
+    killpg.assert_called_once_with(popen.return_value.pid, signal.SIGTERM)
+
+
+def test_unoserver_found_without_setting(mocker, monkeypatch):
+    monkeypatch.delenv('PATH_UNOSERVER', raising=False)
+    monkeypatch.delenv('PATH_UNOCONVERT', raising=False)
+    mocker.patch('shutil.which', side_effect=lambda name: '/usr/bin/%s' % name)
+    assert PdfConverter.get_unoserver() == '/usr/bin/unoserver'
+    assert PdfConverter.get_unoconvert() == '/usr/bin/unoconvert'
+
+
+def test_shutdown_stops_workers(mocker, monkeypatch):
+    monkeypatch.setenv('PATH_SOFFICE', 'soffice')
+    monkeypatch.setenv('PATH_UNOSERVER', 'unoserver')
+    close = mocker.patch.object(ConverterWorker, 'close')
+    PdfConverter.shutdown()
+    workers = PdfConverter.get_workers()
+    assert workers.qsize() == PdfConverter.get_size()
+    assert PdfConverter.get_workers() is workers
+    PdfConverter.shutdown()
+    assert close.call_count == PdfConverter.get_size()
+    assert PdfConverter._workers is None
+
+
+def test_convert_without_soffice(monkeypatch):
+    monkeypatch.delenv('PATH_SOFFICE', raising=False)
+    with pytest.raises(PdfConversionError):
+        PdfConverter.convert('/tmp/report.xlsx')
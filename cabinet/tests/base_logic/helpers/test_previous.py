@@ -0,0 +1,54 @@
+from cabinet.base_logic.helpers.previous import (
+    TRACKED_FIELDS, forget_previous, get_previous, is_changed, track_fields
+)
+
+
+class Manager:
+
+    def __init__(self, row):
+        self.row = row
+        self.queries = []
+
+    def filter(self, **kwargs):
+        return self
+
+    def values(self, *fields):
+        self.queries.append(set(fields))
+        return self
+
+    def first(self):
+        return self.row
+
+
+class Meta:
+    label = 'tests.Tracked'
+
+
+class Tracked:
+    _meta = Meta
+    _base_manager = Manager({'a': 1, 'b': 2})
+
+    def __init__(self, pk, a, b):
+        self.pk = pk
+        self.a = a
+        self.b = b
+
+
+def test_previous_loaded_once_per_save():
+    track_fields(Tracked, ['a'])
+    track_fields(Tracked, ['b'])
+    instance = Tracked(1, 1, 3)
+    assert is_changed(instance, ['a']) is False
+    assert is_changed(instance, ['b']) is True
+    assert Tracked._base_manager.queries == [{'a', 'b'}]
+
+    forget_previous(instance)
+    get_previous(instance)
+    assert len(Tracked._base_manager.queries) == 2
+    TRACKED_FIELDS.pop(Meta.label)
+
+
+def test_new_instance_changed():
+    instance = Tracked(None, 1, 2)
+    assert get_previous(instance) is None
+    assert is_changed(instance, ['a']) is True
@@ -66,3 +66,18 @@ def test_sumNotInRange():
         required_amount=13
     ), Bank())
     assert result_false is True
+
+
+def test_compiled_conditional_block():
+    from cabinet.base_logic.package.base import CompiledConditionalBlock
+    block = CompiledConditionalBlock.from_json(
+        '{"operator": "AND", "blocks": ['
+        '{"class": "sumInRange", "params": [10, 12]},'
+        '{"operator": "OR", "blocks": [{"class": "hasPoA", "params": null},'
+        '{"class": "unknownBlock", "params": null}]}]}'
+    )
+    assert block.validate(Request(required_amount=11, power_of_attorney=True), Bank())
+    assert not block.validate(Request(required_amount=11, power_of_attorney=False), Bank())
+    assert block.get_dependencies(
+        Request(required_amount=11, power_of_attorney=True)
+    ) == [['11'], [['True'], None]]
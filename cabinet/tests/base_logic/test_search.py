@@ -0,0 +1,47 @@
+from cabinet.base_logic.search.index import SEPARATOR, SearchIndex, normalize
+from cabinet.models import SearchDocument
+
+
+class QuerySet:
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def values(self, *fields):
+        return self
+
+    def order_by(self, *fields):
+        return self
+
+    def iterator(self):
+        return iter(self.rows)
+
+
+def test_normalize():
+    assert normalize('  ооо  "Ёлка"\n') == 'ООО "ЕЛКА"'
+
+
+def test_get_texts():
+    rows = [
+        {'id': 1, 'inn': '7700000000', 'short_name': 'ООО Ромашка',
+         'full_name': None, 'profile__short_name': 'ооо ромашка',
+         'profile__full_name': 'Общество Ромашка'},
+        {'id': 2, 'inn': '', 'short_name': None, 'full_name': None,
+         'profile__short_name': None, 'profile__full_name': None},
+    ]
+    texts = SearchIndex.get_texts(SearchDocument.TYPE_CLIENT, QuerySet(rows))
+    assert texts == {
+        1: SEPARATOR.join(['7700000000', 'ООО РОМАШКА', 'ОБЩЕСТВО РОМАШКА'])
+    }
+
+
+def test_search_fallback_while_index_empty(mocker):
+    mocker.patch.object(SearchIndex, 'is_built', return_value=False)
+    model = mocker.Mock()
+    mocker.patch.object(SearchIndex, 'get_model', return_value=model)
+    SearchIndex.search(SearchDocument.TYPE_CLIENT, ' ромашка ')
+    condition = model.objects.filter.call_args[0][0]
+    assert ('inn__icontains', 'ромашка') in condition.children
+    assert len(condition.children) == len(SearchIndex.get_fields(
+        SearchDocument.TYPE_CLIENT
+    ))
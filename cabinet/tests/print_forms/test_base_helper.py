@@ -15,3 +15,22 @@ def test_base_helper():
     )
     helper = BaseHelper(request=request, bank=None)
     assert helper.print_required_amount == 'девяносто шесть тысяч триста девяносто семь рублей 83 копейки'
+
+
+def test_base_helper_memoizes_lookups(monkeypatch):
+    from cabinet.base_logic.printing_forms.helpers import base
+
+    calls = []
+
+    def get_info(inn):
+        calls.append(inn)
+        return {'section-ur-lico': {'full-name-ur-lico': 'ООО Ромашка'}}
+
+    monkeypatch.setattr(base.EgrulData, 'get_info', get_info)
+    request = Request(client=Client(profile=Profile(reg_inn='7700000000')))
+    helper = BaseHelper(request=request, bank=None)
+    helper._addresses['г Москва'] = '101000, г Москва'
+    assert helper.get_company_full_name() == 'ООО Ромашка'
+    assert helper.get_company_full_name() == 'ООО Ромашка'
+    assert calls == ['7700000000']
+    assert helper.format_address('г Москва') == '101000, г Москва'
@@ -1,10 +1,13 @@
+import datetime
 import os
 
 import pytest
 import requests_mock
 from django.conf import settings
 
-from cabinet.base_logic.conclusions.check_terror import CheckInTerroristsList
+from cabinet.base_logic.conclusions.check_terror import (
+    CheckInTerroristsList, TerroristsIndex
+)
 from clients.models import Client
 from conclusions_app.conclusions.base import ConclusionResult
 from conclusions_app.conclusions.common import GosContractsConclusion
@@ -39,6 +42,40 @@ def test_check_terror_fl(data, result):
         assert helper.check(**data) == result
 
 
+def test_check_terror_fl_many():
+    helper = CheckInTerroristsList()
+    with requests_mock.mock() as m:
+        m.get('http://fedsfm.ru/documents/terrorists-catalog-portal-act',
+              text=open(os.path.join(os.path.dirname(__file__),
+                                     'files/terrorists_list.html'), 'r').read())
+
+        assert helper.check_many([
+            {'last_name': 'Алексеев', 'first_name': 'Кирилл',
+             'middle_name': 'Михайлович',
+             'date_of_birth': datetime.date(1999, 12, 18),
+             'place_of_birth': 'г. Липецк'},
+            {'last_name': 'АРТЕМОВ', 'first_name': 'ИГОРЬ', 'middle_name': '',
+             'date_of_birth': '', 'place_of_birth': ''},
+            {'last_name': 'АРХАГОВ', 'first_name': 'РУСТАМЭЛО',
+             'middle_name': 'РУСЛАНОВИЧ', 'date_of_birth': '07.01.1966',
+             'place_of_birth': 'Г. ГРОЗНЫЙ'},
+        ]) == ['FOUND', 'FOUND_ONLY_FIO', 'NOT_FOUND']
+
+
+def test_terrorists_index_parse_entry():
+    record = TerroristsIndex.parse_entry(
+        '57. АБДУКАРИМОВ МАГОМЕД МАГОМЕДОВИЧ*,  (АБДУКЕРИМОВ МАГОМЕД МАГОМЕДОВИЧ; '
+        'АБДУЛКЕРИМОВ МАГОМЕД МАГОМЕДОВИЧ), 03.05.1964 г.р. , С. ЭЧЕДА '
+        'ЦУМАДИНСКОГО РАЙОНА РЕСПУБЛИКИ ДАГЕСТАН;'
+    )
+    assert record.names == (
+        'АБДУКАРИМОВ МАГОМЕД МАГОМЕДОВИЧ', 'АБДУКЕРИМОВ МАГОМЕД МАГОМЕДОВИЧ',
+        'АБДУЛКЕРИМОВ МАГОМЕД МАГОМЕДОВИЧ'
+    )
+    assert record.date_of_birth == '03.05.1964'
+    assert record.place_of_birth == 'С. ЭЧЕДА ЦУМАДИНСКОГО РАЙОНА РЕСПУБЛИКИ ДАГЕСТАН'
+
+
 def test_get_contracts_count_common_variant():
     inn = '6670278073'
     kpp = '667001001'
@@ -18,3 +18,27 @@ def test_print_form():
             doc = Document(path)
             os.remove(path)
             assert doc.paragraphs[0].text == context['test']
+
+
+def test_template_cache(tmpdir):
+    from cabinet.base_logic.printing_forms.adapters.doc import TemplateCache
+    path = tmpdir.join('template.docx')
+    path.write_binary(b'first')
+    assert TemplateCache.get_content(str(path)) == b'first'
+    path.write_binary(b'second')
+    os.utime(str(path), (1, 1))
+    assert TemplateCache.get_content(str(path)) == b'second'
+    TemplateCache.clear()
+
+
+def test_shared_print_form_context():
+    from cabinet.base_logic.printing_forms.adapters.mixins import RequestPrintFormMixin
+
+    class Request:
+        _print_form_context = {'client': 'client', 'values': {'date': '01.01.2020'}}
+
+    request = Request()
+    context = RequestPrintFormMixin()._get_context(request)
+    context['values']['ben'] = 'beneficiar'
+    assert context['client'] == 'client'
+    assert request._print_form_context['values'] == {'date': '01.01.2020'}
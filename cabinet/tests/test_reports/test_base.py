@@ -0,0 +1,104 @@
+from cabinet.base_logic.reports.generate.base import BaseReport, ExcelCellData
+
+
+def test_sheet_layout():
+    rows, merges = BaseReport.get_sheet_layout([
+        ExcelCellData(cell='B2', value='=SUM(B3:B4)'),
+        ExcelCellData(row=2, column=2, color='FFC000'),
+        ExcelCellData(row=3, column=1, value=100, format='money'),
+        ExcelCellData(merge='A3:A4'),
+    ])
+    assert merges == ['A3:A4']
+    assert sorted(rows) == [2, 3]
+    cell = rows[2][2]
+    assert (cell.value, cell.color) == ('=SUM(B3:B4)', 'FFC000')
+    assert rows[3][1].format == 'money'
+
+
+def test_writer():
+    report = BaseReport()
+    assert report.get_writer() == BaseReport.WRITER_FAST
+    report.template_name = 'template.xlsx'
+    assert report.get_writer() == BaseReport.WRITER_TEMPLATE
+    report.writer = BaseReport.WRITER_FAST
+    assert report.get_writer() == BaseReport.WRITER_FAST
+
+
+class TemplateReport(BaseReport):
+
+    def get_data(self):
+        self.add_insert_rows(2, 2)
+        self.delete_col(2)
+        self.add_sheet_for_remove('requests')
+        data = [ExcelCellData(row=row, column=1, value='№%s' % row) for row in [2, 3, 4]]
+        data += [
+            ExcelCellData(row=2, column=2, value=1000, format='money'),
+            ExcelCellData(row=3, column=2, value=2000, color='FFC000'),
+            ExcelCellData(cell='B5', value='=SUM(B2:B4)'),
+            ExcelCellData(merge='A6:B6'),
+        ]
+        return {('Заявки', 'requests'): data}
+
+
+def create_template(path):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'requests'
+    for column, name in enumerate(['Номер', 'Удаляемая', 'Сумма'], 1):
+        cell = ws.cell(1, column, name)
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill(start_color='DDDDDD', end_color='DDDDDD', fill_type='solid')
+    ws.cell(2, 1).font = Font(italic=True)
+    ws.cell(2, 3).number_format = '0.00'
+    ws.cell(3, 1, 'Итог')
+    ws.column_dimensions['A'].width = 30
+    ws.row_dimensions[2].height = 25
+    info = wb.create_sheet('Справка')
+    info['A1'] = 'Описание отчета'
+    wb.save(path)
+
+
+def get_workbook_snapshot(path):
+    from openpyxl import load_workbook
+    wb = load_workbook(path)
+    snapshot = {}
+    for ws in wb.worksheets:
+        cells = {}
+        for row_cells in ws.iter_rows(min_row=1, max_row=8, max_col=4):
+            for cell in row_cells:
+                cells[cell.coordinate] = (
+                    cell.value, cell.font.b, cell.font.i, cell.fill.fgColor.rgb,
+                    cell.number_format,
+                )
+        snapshot[ws.title] = {
+            'cells': cells,
+            'merges': sorted(str(merge) for merge in ws.merged_cells.ranges),
+            'width': ws.column_dimensions['A'].width,
+            'heights': {row: ws.row_dimensions[row].height for row in range(1, 8)},
+        }
+    return snapshot
+
+
+def test_fast_writer_matches_template_writer(tmp_path, monkeypatch):
+    from cabinet.base_logic.reports.generate import base
+    monkeypatch.setattr(base, 'MEDIA_ROOT', str(tmp_path))
+    template = str(tmp_path / 'template.xlsx')
+    create_template(template)
+
+    snapshots = {}
+    for writer in [BaseReport.WRITER_TEMPLATE, BaseReport.WRITER_FAST]:
+        report = TemplateReport()
+        report.template_name = template
+        report.writer = writer
+        report.generate()
+        snapshots[writer] = get_workbook_snapshot(
+            report.get_output_path(report.get_output_filename())[0]
+        )
+
+    fast = snapshots[BaseReport.WRITER_FAST]
+    assert list(fast) == ['Справка', 'Заявки']
+    assert fast['Заявки']['cells']['B1'][0] == 'Сумма'
+    assert fast['Заявки']['cells']['B2'][0] == 1000
+    assert fast == snapshots[BaseReport.WRITER_TEMPLATE]
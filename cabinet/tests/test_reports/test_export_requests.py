@@ -0,0 +1,106 @@
+import csv
+import datetime
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from bank_guarantee.models import Request
+from base_request.models import RequestTender
+from cabinet.base_logic.reports.generate.base import ExcelCellData
+from cabinet.base_logic.reports.generate.export_requests import ExportRequests
+from users.models import Role
+
+
+def test_stream_columns():
+    columns = [column for column, name in ExportRequests(
+        role=[Role.BANK]
+    ).get_stream_columns()]
+    assert 21 not in columns
+    assert len(columns) == len(ExportRequests.columns) - 1
+
+    report = ExportRequests(role=[Role.AGENT], extension='csv')
+    assert report.stream is True
+    assert len(report.get_stream_columns()) == len(ExportRequests.columns)
+
+
+def test_format_csv_value():
+    assert ExportRequests.format_csv_value(None) == ''
+    assert ExportRequests.format_csv_value(
+        ExcelCellData(row=1, column=1, value=None)
+    ) == ''
+    assert ExportRequests.format_csv_value(
+        ExcelCellData(row=1, column=1, value=datetime.date(2020, 1, 25))
+    ) == '25.01.2020'
+    assert ExportRequests.format_csv_value(
+        ExcelCellData(row=1, column=1, value=100)
+    ) == 100
+
+
+
+def test_prefetch_revenues(mocker):
+    quarter_model = mocker.patch(
+        'cabinet.base_logic.reports.generate.export_requests.Quarter'
+    )
+    quarter_model.objects.filter.return_value = [
+        mocker.Mock(client_id=1, get_value=lambda code: 5),
+    ]
+    first = mocker.Mock(client_id=1)
+    second = mocker.Mock(client_id=2)
+    second.client.id = 2
+    second.client.accounting_report.get_year_quarter.return_value.get_value \
+        .return_value = 7
+    report = ExportRequests(role=[Role.AGENT])
+    report.prefetch_revenues([first, second, first])
+
+    assert quarter_model.objects.filter.call_count == 1
+    assert set(
+        quarter_model.objects.filter.call_args[1]['client_id__in']
+    ) == {1, 2}
+    assert report.get_revenue(mocker.Mock(id=1)) == 5000
+    # клиент без годовой отчетности считается через AccountingReport
+    assert report.get_revenue(second.client) == 7000
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('extension', ['xlsx', 'csv'])
+def test_export_requests_stream(setup_db, mocker, tmpdir, extension):
+    """ Потоковая выгрузка нескольких заявок пачками """
+    client = setup_db['client']
+    for amount in [100000, 200000, 300000]:
+        Request.objects.create(
+            client=client,
+            required_amount=amount,
+            tender=RequestTender.objects.create(),
+            interval_from=timezone.now().date()
+        )
+    requests = Request.objects.filter(client=client).order_by('id')
+    path = str(tmpdir.join('export_requests.%s' % extension))
+    mocker.patch.object(
+        ExportRequests, 'get_output_path', return_value=(path, '/media/export')
+    )
+    report = ExportRequests(
+        requests=requests, role=[Role.AGENT], stream=True, extension=extension
+    )
+    report.chunk_size = 2
+    report.generate()
+
+    names = [name for column, name in ExportRequests.columns]
+    revenue = client.accounting_report.get_year_quarter().get_value(2110) * 1000
+    if extension == 'csv':
+        with open(path, encoding='utf-8-sig') as f:
+            rows = list(csv.reader(f, delimiter=';'))
+        assert rows[0] == ['Банковские гарантии']
+        assert rows[1] == names
+        rows = rows[2:]
+    else:
+        rows = list(load_workbook(path)['Банковские гарантии'].values)
+        assert list(rows[0]) == names
+        assert rows[-1][0] == 'Итог: 3'
+        rows = rows[1:-1]
+
+    assert len(rows) == 3
+    for row, request in zip(rows, requests):
+        assert (row[0] or '') == (request.request_number or '')
+        assert Decimal(str(row[9])) == request.required_amount
+        assert Decimal(str(row[12])) == Decimal(str(revenue))
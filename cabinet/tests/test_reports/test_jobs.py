@@ -0,0 +1,78 @@
+from cabinet.base_logic.reports.generate.base import BaseReportResult
+from cabinet.base_logic.reports.jobs import ReportJob
+from users.models import User
+
+
+class FakeReport:
+    progress_callback = None
+
+    def generate(self):
+        self.progress_callback(50)
+        return BaseReportResult(file_path='/media/reports/1/test.xlsx',
+                                output_name='test.xlsx')
+
+
+def test_report_job_result_cache(mocker):
+    ReportJob.register('test_report')(lambda params, user: FakeReport())
+    delay = mocker.patch('cabinet.tasks.task_generate_report.delay')
+    mocker.patch.object(ReportJob, 'build_report', return_value=FakeReport())
+    mocker.patch.object(ReportJob, 'cleanup_files')
+    user = User(id=100500)
+    params = {'date': '2020-01'}
+
+    job = ReportJob.submit('test_report', params, user)
+    assert job.status == ReportJob.STATUS_QUEUED
+    assert delay.call_count == 1
+
+    # повторная постановка пока задача в очереди возвращает ту же задачу
+    assert ReportJob.submit('test_report', params, user).id == job.id
+    assert delay.call_count == 1
+
+    ReportJob.get(job.id).run()
+    job = ReportJob.get(job.id)
+    assert job.status == ReportJob.STATUS_DONE
+    assert job.result == {'report': '/media/reports/1/test.xlsx', 'name': 'test.xlsx'}
+
+    cached = ReportJob.submit('test_report', params, user)
+    assert cached.id != job.id
+    assert cached.from_cache is True
+    assert cached.result == job.result
+    assert delay.call_count == 1
+    ReportJob.reports.pop('test_report')
+    ReportJob.params_rules.pop('test_report')
+
+
+def test_report_job_shared_between_users(mocker):
+    ReportJob.register('test_shared_report')(lambda params, user: FakeReport())
+    delay = mocker.patch('cabinet.tasks.task_generate_report.delay')
+    params = {'date': '2020-02'}
+
+    job = ReportJob.submit('test_shared_report', params, User(id=100501))
+    other = ReportJob.submit('test_shared_report', params, User(id=100502))
+    assert other.id == job.id
+    assert other.is_available_for(User(id=100502))
+    assert delay.call_count == 1
+
+    # упавшая задача не блокирует новую постановку
+    job.status = ReportJob.STATUS_FAILED
+    job.save()
+    retry = ReportJob.submit('test_shared_report', params, User(id=100502))
+    assert retry.id != job.id
+    assert delay.call_count == 2
+    ReportJob.reports.pop('test_shared_report')
+    ReportJob.params_rules.pop('test_shared_report')
+
+
+def test_report_job_validate():
+    assert ReportJob.validate('unknown_report', {}) == ['Неизвестный отчет']
+    assert ReportJob.validate('manager_statistics', {}) == [
+        'Заполните поле "Месяц"'
+    ]
+    assert ReportJob.validate('manager_statistics', {'date': '2020-13'}) == [
+        'Неверный формат поля "Месяц"'
+    ]
+    assert ReportJob.validate('manager_statistics', {'date': '2020-12'}) == []
+    assert ReportJob.validate('load_on_manager', {
+        'date_from': '2020-01-01', 'date_to': '2020-01-31', 'product': 'BG',
+        'manager': 1,
+    }) == ['Заполните поле "Агент"']
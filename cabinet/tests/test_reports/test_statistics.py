@@ -0,0 +1,111 @@
+import datetime
+
+from bank_guarantee.models import Request
+from cabinet.base_logic.reports.rollup import RequestRollup
+from cabinet.base_logic.reports.statistics import (
+    RequestStatistics, Totals, month_range
+)
+from clients.models import Client
+
+
+def test_month_range():
+    date_from, date_to = month_range('2020-12')
+    assert (date_from.year, date_from.month, date_from.day) == (2020, 12, 1)
+    assert (date_to.year, date_to.month, date_to.day) == (2021, 1, 1)
+
+
+def test_request_statistics_get():
+    statistics = RequestStatistics(
+        datetime.datetime(2020, 1, 1), datetime.datetime(2020, 2, 1), requests=[]
+    )
+    statistics.cells = {
+        (1, 12, True): Totals(2, 200, 20),
+        (1, 12, False): Totals(1, 100, 10),
+        (1, 26, False): Totals(5, 0, 0),
+        (2, 9, True): Totals(3, 300, 30),
+    }
+    assert statistics.get() == Totals(11, 600, 60)
+    assert statistics.get(exclude_statuses=[26]) == Totals(6, 600, 60)
+    assert statistics.get(statuses=[12], bank_id=1) == Totals(3, 300, 30)
+    assert statistics.get(statuses=[12], bank_id=1, unique=True) == Totals(2, 200, 20)
+    assert statistics.get(bank_id=3) == Totals(0, 0, 0)
+
+
+def test_rollup_get_fact():
+    request = Request(
+        id=1, bank_id=2, agent_id=3, status_id=12, base_request_id=1,
+        required_amount=1000,
+        status_changed_date=datetime.datetime(2020, 1, 31, 12, 0),
+        client=Client(manager_id=4),
+    )
+    fact = RequestRollup.get_fact(request)
+    assert fact['day'] == datetime.date(2020, 1, 31)
+    assert (fact['bank_id'], fact['agent_id'], fact['manager_id'], fact['status_id']) == (
+        2, 3, 4, 12
+    )
+    assert fact['is_unique'] is True
+    assert fact['required_amount'] == 1000
+    assert (fact['offer_amount'], fact['commission']) == (0, 0)
+
+
+def test_rollup_request_changed_once_per_transaction(mocker):
+    connection = mocker.Mock(in_atomic_block=True, run_on_commit=[], rollup_pending=None)
+    mocker.patch('django.db.transaction.get_connection', return_value=connection)
+    mocker.patch(
+        'django.db.transaction.on_commit',
+        lambda func: connection.run_on_commit.append((set(), func))
+    )
+    update_request = mocker.patch.object(RequestRollup, 'update_request')
+
+    RequestRollup.on_request_changed(1)
+    RequestRollup.on_request_changed(1)
+    RequestRollup.on_request_changed(2)
+    assert len(connection.run_on_commit) == 1
+    connection.run_on_commit[0][1]()
+    assert [call[0][0] for call in update_request.call_args_list] == [1, 2]
+
+    # откат: отложенный вызов снят, следующее изменение ставит новый
+    connection.run_on_commit.clear()
+    connection.rollup_pending = {'keys': {(3, 'BG')}, 'flush': lambda: None}
+    RequestRollup.on_request_changed(4)
+    assert len(connection.run_on_commit) == 1
+
+
+def test_agent_status_matrix_get():
+    from cabinet.base_logic.reports.matrix import AgentStatusMatrix
+    matrix = AgentStatusMatrix()
+    matrix.cells.update({(1, 'Выдана'): 2, (1, 'Займ выдан'): 3, (2, 'Выдана'): 1})
+    matrix.totals[1].update(count=5, unique=4, amount=500)
+    assert matrix.get(1, 'Выдана') == 2
+    assert matrix.get(1, ['Выдана', 'Займ выдан']) == 5
+    assert matrix.get(3, 'Выдана') == 0
+    assert (matrix.get_count(1), matrix.get_unique(1), matrix.get_amount(1)) == (5, 4, 500)
+    assert matrix.get_count(2) == 0
+
+
+def test_manager_statistics_dataset():
+    from cabinet.base_logic.reports.manager_statistics import (
+        ManagerStatistics, PERIOD_CURRENT, Row
+    )
+    dataset = ManagerStatistics('2020-01')
+    dataset.rows = [
+        Row(1, 10, 100, 5, 12, True, PERIOD_CURRENT, 0, 2, 1000, 100, 60),
+        Row(1, 10, 100, 5, 26, True, None, None, 1, 0, 0, 30),
+        Row(2, 20, 100, None, 9, False, PERIOD_CURRENT, 3, 1, 20000000, 50, 0),
+    ]
+    assert dataset.get() == Totals(4, 20001000, 150)
+    assert dataset.get(with_bank=True, exclude_statuses=[26]) == Totals(2, 1000, 100)
+    assert dataset.distinct('client_id') == 2
+    assert dataset.distinct('agent_id', statuses=[12]) == 1
+    assert dataset.get_amounts_by_bucket([9, 12]) == {
+        'to_1_mln': 1000, '1-5_mln': 0, '5-15_mln': 0, 'from_15_mln': 20000000,
+    }
+    assert dataset.get_requests_by_period(PERIOD_CURRENT) == {
+        'unique_request': 2, 'unique_request_exc_blank': 2,
+    }
+    totals = dataset.get_agent_totals()[10]
+    assert totals['unique_request'] == 3
+    assert totals['num_required_amount_done'] == 2
+    assert totals['interval'] == 90
+    statistics = dataset.get_request_statistics()
+    assert statistics.get(bank_id=5, unique=True) == Totals(3, 1000, 100)
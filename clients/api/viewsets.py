@@ -7,13 +7,13 @@ import dateutil
 from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator, PageNotAnInteger
 from django.db import transaction
-from django.db.models import Q
 from rest_framework import viewsets
 from rest_framework.decorators import action as drf_action
 from rest_framework.response import Response
 
 from bank_guarantee.models import Request
 from cabinet.base_logic.printing_forms.adapters.doc import DocBasePrintFormGenerator
+from cabinet.base_logic.search.index import SearchIndex
 from cabinet.models import EgrulData, WorkRule
 from cabinet.serializers import ProfileSerializer, FileSerializer
 from clients.helpers import ChangeAgentValidator
@@ -107,13 +107,9 @@ class ClientsViewSet(viewsets.ViewSet):
         regions = clients.values_list('region', flat=True).distinct()
         if request.GET.get('inn_or_name'):
             name = request.GET.get('inn_or_name')
-            if not name.isnumeric():
-                name = name.upper()
-            clients = clients.filter(
-                Q(profile__full_name__icontains=name) |
-                Q(profile__short_name__icontains=name) |
-                Q(inn__icontains=name)
-            )
+            clients = SearchIndex.annotate_rank(
+                SearchIndex.filter(clients, name), name
+            ).order_by('-search_rank', 'id')
         if request.GET.get('region'):
             clients = clients.filter(region=request.GET.get('region'))
         if request.GET.get('date_to'):
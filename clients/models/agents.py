@@ -360,7 +360,18 @@ class AgentManager(models.Model):
         if not record:
             record = AgentManager.objects.create(agent=agent, manager=manager)
         from clients.models import Client
-        Client.objects.filter(agent_company=agent).update(manager=manager)
+        clients = Client.objects.filter(agent_company=agent).exclude(manager=manager)
+        changed = list(clients.values_list('id', 'manager_id'))
+        clients.update(manager=manager)
+        if changed:
+            # update() не вызывает сигналы Client, зависимые данные
+            # обновляются явно
+            from cabinet.base_logic.helpers.access_scope import AccessScope
+            from cabinet.base_logic.reports.rollup import RequestRollup
+            AccessScope.on_managers_changed(
+                [manager_id for _, manager_id in changed] + [manager.id]
+            )
+            RequestRollup.on_clients_changed([client_id for client_id, _ in changed])
 
         from notification.base import Notification
         for user in agent.user_set.all():
@@ -4,6 +4,12 @@ from django.db.models.signals import post_save, pre_save
 from django.dispatch.dispatcher import receiver
 from django.utils.timezone import now
 
+from cabinet.base_logic.helpers.access_scope import AccessScope
+from cabinet.base_logic.helpers.previous import (
+    forget_previous, get_previous, is_changed, track_fields
+)
+from cabinet.base_logic.search.index import SearchIndex
+from cabinet.models import SearchDocument
 from clients.models import (
     Agent, MFO, MFOSettings, Bank, BankSettings, Client, ClientChangeAgentHistory
 )
@@ -11,6 +17,9 @@ from clients.models.common import InternalNews
 from questionnaire.models import Profile
 from users.models import User, Role
 
+CLIENT_SEARCH_FIELDS = ['inn', 'short_name', 'full_name']
+track_fields(Client, CLIENT_SEARCH_FIELDS + ['manager_id'])
+
 
 @receiver(post_save, sender=Agent)
 def post_save_agent_add_documents(sender, instance=None, created=False, **kwargs):
@@ -104,6 +113,48 @@ def set_manager(sender, instance, *args, **kwargs):
         instance.manager = manager
 
 
+@receiver(pre_save, sender=Client)
+def check_manager_changed(sender, instance, *args, **kwargs):
+    previous = get_previous(instance)
+    instance.old_manager_id = previous['manager_id'] if previous else None
+    instance.manager_changed = instance.old_manager_id != instance.manager_id
+
+
+@receiver(post_save, sender=Client)
+def update_manager_request_statistics(sender, instance, created, **kwargs):
+    if getattr(instance, 'manager_changed', False) and not created:
+        from cabinet.base_logic.reports.rollup import RequestRollup
+        RequestRollup.on_client_changed(instance.id)
+
+
+@receiver(post_save, sender=Client)
+def reset_manager_access_scope(sender, instance, **kwargs):
+    if getattr(instance, 'manager_changed', False):
+        AccessScope.on_managers_changed([instance.old_manager_id, instance.manager_id])
+
+
+@receiver(pre_save, sender=Client)
+def check_search_fields_changed(sender, instance, *args, **kwargs):
+    instance.search_fields_changed = is_changed(instance, CLIENT_SEARCH_FIELDS)
+
+
+@receiver(post_save, sender=Client)
+def forget_previous_client(sender, instance, **kwargs):
+    forget_previous(instance)
+
+
+@receiver(post_save, sender=Client)
+def update_client_search_documents(sender, instance, **kwargs):
+    if getattr(instance, 'search_fields_changed', True):
+        SearchIndex.on_client_changed(instance.id)
+
+
+@receiver(post_save, sender=Profile)
+def update_profile_search_documents(sender, instance, **kwargs):
+    if instance.client_id:
+        SearchIndex.on_changed(SearchDocument.TYPE_CLIENT, [instance.client_id])
+
+
 @receiver(user_logged_in, sender=User)
 def update_date_last_action(sender, user, request, **kwargs):
     if user.client and user.client.get_role() == 'Client':
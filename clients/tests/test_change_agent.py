@@ -1,7 +1,10 @@
 import pytest
 
+from bank_guarantee.models import Request
+from cabinet.base_logic.helpers.access_scope import AccessScope
 from clients.models import AgentManager
-from users.models import User
+from tests.conf.load_db.load_request import create_bg_request
+from users.models import Role, User
 from utils.functions_for_tests import create_client, create_agent
 
 
@@ -24,4 +27,26 @@ def test_change_agent(initial_data_db):
     AgentManager.set_manager_to_agent(manager=manager, agent=another_agent)
     assert AgentManager.get_manager_by_agent(another_agent) == manager
     client.refresh_from_db()
-    assert client.manager == manager
\ No newline at end of file
+    assert client.manager == manager
+
+@pytest.mark.django_db(transaction=True)
+def test_set_manager_to_agent_resets_access_scope(initial_data_db):
+    agent = create_agent()
+    client = create_client(agent=agent)
+    request = create_bg_request(client)
+    old_manager = client.manager
+    new_manager = User.objects.create_user('new_manager@test.ru', password='password')
+    new_manager.roles.set(Role.objects.filter(name=Role.MANAGER))
+
+    def get_visible(user):
+        return set(AccessScope.filter_requests(
+            user, Request.objects.all()
+        ).values_list('id', flat=True))
+
+    assert request.id in get_visible(old_manager)
+    assert request.id not in get_visible(new_manager)
+
+    AgentManager.set_manager_to_agent(manager=new_manager, agent=agent)
+
+    assert request.id not in get_visible(old_manager)
+    assert request.id in get_visible(new_manager)